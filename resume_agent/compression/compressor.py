@@ -1,25 +1,27 @@
+import logging
+from typing import Optional
+
 try:
-    from scaledown import ScaleDownCompressor
+    from scaledown import ScaleDownCompressor, get_api_key
 except ImportError:
-    print("WARNING: ScaleDown not found. Compression disabled.")
     ScaleDownCompressor = None
 
-from typing import Optional
+logger = logging.getLogger(__name__)
 
 class ContextCompressor:
     def __init__(self, api_key: Optional[str] = None):
-        if ScaleDownCompressor:
-            self.compressor = ScaleDownCompressor(target_model="gpt-4o", rate="auto")
+        self.compressor = None
+        if ScaleDownCompressor is None:
+            logger.warning("ScaleDown not found. Compression disabled.")
+        elif not (api_key or get_api_key()):
+            logger.warning("No ScaleDown API key configured. Compression disabled.")
         else:
-            self.compressor = None
-            
+            # API failures and an open circuit breaker return the context uncompressed
+            self.compressor = ScaleDownCompressor(
+                target_model="gpt-4o", rate="auto", api_key=api_key, fallback="passthrough"
+            )
+
     def compress(self, context: str, prompt: str) -> str:
         if not self.compressor:
             return context
-            
-        try:
-            result = self.compressor.compress(context=context, prompt=prompt)
-            return result.content
-        except Exception as e:
-            print(f"Compression failed: {e}")
-            return context
+        return self.compressor.compress(context=context, prompt=prompt).content
@@ -2,12 +2,15 @@ import os
 from typing import Optional
 
 # Configuration
-from scaledown.config import set_api_key, get_api_key
+from scaledown.config import set_api_key, get_api_key, set_metrics_mode, get_metrics_mode
 
 # Core Components
 from scaledown.pipeline import Pipeline, make_pipeline
+from scaledown.dag import DAGPipeline, MergeStep, Node
 # HasteOptimizer is optional, import from scaledown.optimizer if needed
 from scaledown.compressor.scaledown_compressor import ScaleDownCompressor
+from scaledown.cache import LRUCache, SQLiteCache, TieredCache
+from scaledown.tracing import Tracer
 
 # Types & Exceptions
 from scaledown.types import (
@@ -20,7 +23,10 @@ from scaledown.types import (
 from scaledown.exceptions import (
     ScaleDownError,
     AuthenticationError,
-    APIError
+    APIError,
+    RateLimitError,
+    CircuitOpenError,
+    DeadlineExceededError
 )
 
 # Initialize global state if env var exists
@@ -29,14 +35,26 @@ _API_KEY: Optional[str] = os.environ.get("SCALEDOWN_API_KEY")
 __all__ = [
     "Pipeline",
     "make_pipeline",
+    "DAGPipeline",
+    "MergeStep",
+    "Node",
     "ScaleDownCompressor",
+    "LRUCache",
+    "SQLiteCache",
+    "TieredCache",
+    "Tracer",
     "set_api_key",
     "get_api_key",
+    "set_metrics_mode",
+    "get_metrics_mode",
     "PipelineResult",
     "StepMetadata",
     "CompressedPrompt",
     "OptimizedContext",
     "ScaleDownError",
     "AuthenticationError",
-    "APIError"
+    "APIError",
+    "RateLimitError",
+    "CircuitOpenError",
+    "DeadlineExceededError"
 ]
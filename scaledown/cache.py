@@ -0,0 +1,314 @@
+"""
+Result caches used by compressors and pipelines.
+
+Three interchangeable backends share the same ``get``/``set``/``stats``
+interface:
+
+- ``LRUCache``: bounded, thread-safe, in-process.
+- ``SQLiteCache``: persistent on-disk store that several worker processes
+  can share.
+- ``TieredCache``: an ``LRUCache`` in front of a ``SQLiteCache``.
+"""
+import hashlib
+import json
+import os
+import pickle
+import sqlite3
+import sys
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Callable, Optional, Tuple
+
+
+def hash_key(*parts: Any) -> str:
+    """Content-addressed key: SHA-256 of the JSON encoding of ``parts``."""
+    encoded = json.dumps(parts, sort_keys=True, default=str, ensure_ascii=False)
+    return hashlib.sha256(encoded.encode("utf-8")).hexdigest()
+
+
+@dataclass
+class CacheStats:
+    """Counters describing cache effectiveness."""
+    hits: int = 0
+    misses: int = 0
+    evictions: int = 0
+    expirations: int = 0
+
+    @property
+    def hit_rate(self) -> float:
+        total = self.hits + self.misses
+        if total == 0: return 0.0
+        return self.hits / total
+
+
+class LRUCache:
+    """
+    Bounded in-memory cache with least-recently-used eviction.
+
+    Parameters
+    ----------
+    max_entries : int, default=1024
+        Maximum number of entries kept before evicting the oldest.
+    ttl : float, optional
+        Seconds after which an entry expires. ``None`` never expires.
+    max_bytes : int, optional
+        Also evict the oldest entries while the total size of the values
+        exceeds this budget. Sizes come from ``sizeof``.
+    sizeof : callable, optional
+        Estimated size in bytes of a value; defaults to ``sys.getsizeof``.
+        Only used with ``max_bytes``.
+    """
+
+    def __init__(self, max_entries: int = 1024, ttl: Optional[float] = None,
+                 max_bytes: Optional[int] = None, sizeof: Optional[Callable[[Any], int]] = None):
+        if max_entries < 1:
+            raise ValueError("max_entries must be at least 1")
+        if max_bytes is not None and max_bytes < 1:
+            raise ValueError("max_bytes must be at least 1")
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self._sizeof = sizeof or sys.getsizeof
+        self._data: "OrderedDict[str, tuple]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._stats = CacheStats()
+
+    def get(self, key: str) -> Optional[Any]:
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                self._stats.misses += 1
+                return None
+            value, expires_at, _ = entry
+            if expires_at is not None and expires_at <= time.time():
+                self._remove(key)
+                self._stats.expirations += 1
+                self._stats.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self._stats.hits += 1
+            return value
+
+    def set(self, key: str, value: Any, ttl: Optional[float] = None) -> None:
+        ttl = self.ttl if ttl is None else ttl
+        expires_at = time.time() + ttl if ttl is not None else None
+        size = self._sizeof(value) if self.max_bytes is not None else 0
+        with self._lock:
+            self._remove(key)
+            self._data[key] = (value, expires_at, size)
+            self._bytes += size
+            while len(self._data) > self.max_entries or (
+                self.max_bytes is not None and self._bytes > self.max_bytes and len(self._data) > 1
+            ):
+                _, (_, _, evicted) = self._data.popitem(last=False)
+                self._bytes -= evicted
+                self._stats.evictions += 1
+
+    def delete(self, key: str) -> None:
+        with self._lock:
+            self._remove(key)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+            self._bytes = 0
+
+    def stats(self) -> CacheStats:
+        with self._lock:
+            return CacheStats(**vars(self._stats))
+
+    @property
+    def size_bytes(self) -> int:
+        """Estimated size of the cached values; 0 unless ``max_bytes`` is set."""
+        return self._bytes
+
+    def _remove(self, key: str) -> None:
+        entry = self._data.pop(key, None)
+        if entry is not None:
+            self._bytes -= entry[2]
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def __repr__(self) -> str:
+        return f"LRUCache(max_entries={self.max_entries}, ttl={self.ttl}, max_bytes={self.max_bytes})"
+
+
+class SQLiteCache:
+    """
+    Persistent cache stored in a SQLite database.
+
+    The database runs in WAL mode so several processes can read and write
+    the same file concurrently. Values are pickled.
+
+    Parameters
+    ----------
+    path : str
+        Location of the database file. Parent directories are created.
+    ttl : float, optional
+        Seconds after which an entry expires. ``None`` never expires.
+    max_entries : int, optional
+        If set, the oldest entries beyond this count are evicted on write.
+    """
+
+    def __init__(self, path: str, ttl: Optional[float] = None, max_entries: Optional[int] = None):
+        self.path = path
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._stats = CacheStats()
+
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        conn = self._conn()
+        with conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS cache ("
+                "key TEXT PRIMARY KEY, value BLOB NOT NULL, "
+                "created_at REAL NOT NULL, expires_at REAL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS cache_created ON cache(created_at)")
+
+    def _conn(self) -> sqlite3.Connection:
+        # sqlite3 connections must not be shared between threads
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def _count(self, field: str, n: int = 1) -> None:
+        with self._lock:
+            setattr(self._stats, field, getattr(self._stats, field) + n)
+
+    def get(self, key: str) -> Optional[Any]:
+        return self.get_with_expiry(key)[0]
+
+    def get_with_expiry(self, key: str) -> Tuple[Optional[Any], Optional[float]]:
+        """Value and expiry (a ``time.time()`` timestamp, None if it never expires)."""
+        row = self._conn().execute(
+            "SELECT value, expires_at FROM cache WHERE key = ?", (key,)
+        ).fetchone()
+        if row is None:
+            self._count("misses")
+            return None, None
+        value, expires_at = row
+        if expires_at is not None and expires_at <= time.time():
+            self.delete(key)
+            self._count("expirations")
+            self._count("misses")
+            return None, None
+        self._count("hits")
+        return pickle.loads(value), expires_at
+
+    def set(self, key: str, value: Any, ttl: Optional[float] = None) -> None:
+        ttl = self.ttl if ttl is None else ttl
+        now = time.time()
+        expires_at = now + ttl if ttl is not None else None
+        conn = self._conn()
+        with conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO cache (key, value, created_at, expires_at) VALUES (?, ?, ?, ?)",
+                (key, pickle.dumps(value), now, expires_at),
+            )
+            if self.max_entries is not None:
+                evicted = conn.execute(
+                    "DELETE FROM cache WHERE key IN ("
+                    "SELECT key FROM cache ORDER BY created_at DESC LIMIT -1 OFFSET ?)",
+                    (self.max_entries,),
+                ).rowcount
+                if evicted > 0:
+                    self._count("evictions", evicted)
+
+    def delete(self, key: str) -> None:
+        conn = self._conn()
+        with conn:
+            conn.execute("DELETE FROM cache WHERE key = ?", (key,))
+
+    def purge_expired(self) -> int:
+        """Delete all expired entries and return how many were removed."""
+        conn = self._conn()
+        with conn:
+            removed = conn.execute(
+                "DELETE FROM cache WHERE expires_at IS NOT NULL AND expires_at <= ?", (time.time(),)
+            ).rowcount
+        self._count("expirations", removed)
+        return removed
+
+    def clear(self) -> None:
+        conn = self._conn()
+        with conn:
+            conn.execute("DELETE FROM cache")
+
+    def stats(self) -> CacheStats:
+        with self._lock:
+            return CacheStats(**vars(self._stats))
+
+    def __len__(self) -> int:
+        return self._conn().execute("SELECT COUNT(*) FROM cache").fetchone()[0]
+
+    def __repr__(self) -> str:
+        return f"SQLiteCache(path={self.path!r}, ttl={self.ttl})"
+
+
+class TieredCache:
+    """
+    In-memory ``LRUCache`` in front of a persistent ``SQLiteCache``.
+
+    Disk hits are promoted into memory, keeping their expiry. Stats combine both tiers: a lookup
+    counts as a hit if either tier served it.
+
+    Parameters
+    ----------
+    path : str
+        Location of the SQLite database.
+    max_entries : int, default=1024
+        Size of the in-memory tier.
+    ttl : float, optional
+        Expiry in seconds, applied to both tiers.
+    """
+
+    def __init__(self, path: str, max_entries: int = 1024, ttl: Optional[float] = None):
+        self.memory = LRUCache(max_entries=max_entries, ttl=ttl)
+        self.disk = SQLiteCache(path, ttl=ttl)
+
+    def get(self, key: str) -> Optional[Any]:
+        value = self.memory.get(key)
+        if value is not None:
+            return value
+        value, expires_at = self.disk.get_with_expiry(key)
+        if value is not None:
+            # Keep the entry's own expiry rather than starting a fresh TTL
+            ttl = expires_at - time.time() if expires_at is not None else None
+            self.memory.set(key, value, ttl=ttl)
+        return value
+
+    def set(self, key: str, value: Any, ttl: Optional[float] = None) -> None:
+        self.memory.set(key, value, ttl=ttl)
+        self.disk.set(key, value, ttl=ttl)
+
+    def delete(self, key: str) -> None:
+        self.memory.delete(key)
+        self.disk.delete(key)
+
+    def clear(self) -> None:
+        self.memory.clear()
+        self.disk.clear()
+
+    def stats(self) -> CacheStats:
+        mem, disk = self.memory.stats(), self.disk.stats()
+        return CacheStats(
+            hits=mem.hits + disk.hits,
+            misses=disk.misses,
+            evictions=mem.evictions + disk.evictions,
+            expirations=mem.expirations + disk.expirations,
+        )
+
+    def __repr__(self) -> str:
+        return f"TieredCache(memory={self.memory!r}, disk={self.disk!r})"
@@ -1,3 +1,37 @@
+from typing import TYPE_CHECKING
+
 from .scaledown_compressor import ScaleDownCompressor
+from .session import SessionPool, AsyncSessionPool, get_shared_pool
+from .throttle import Throttle, RetryPolicy, get_shared_throttle, configure_throttle
+from .singleflight import SingleFlight, get_shared_singleflight
+from .breaker import CircuitBreaker
+
+__all__ = [
+    "ScaleDownCompressor",
+    "SessionPool",
+    "AsyncSessionPool",
+    "get_shared_pool",
+    "Throttle",
+    "RetryPolicy",
+    "get_shared_throttle",
+    "configure_throttle",
+    "SingleFlight",
+    "get_shared_singleflight",
+    "CircuitBreaker",
+    "ExtractiveCompressor",
+]
+
+def __getattr__(name):
+    if name == "ExtractiveCompressor":
+        try:
+            from .extractive import ExtractiveCompressor
+            return ExtractiveCompressor
+        except ImportError as e:
+            raise ImportError(
+                "ExtractiveCompressor requires 'numpy'. Install with `pip install scaledown[local]`"
+            ) from e
+
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
-__all__ = ["ScaleDownCompressor"]
+if TYPE_CHECKING:
+    from .extractive import ExtractiveCompressor
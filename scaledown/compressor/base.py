@@ -1,3 +1,4 @@
+import asyncio
 from abc import ABC, abstractmethod
 import scaledown
 
@@ -21,3 +22,55 @@ class BaseCompressor(ABC):
             Access metadata via .metrics property.
         """
         pass
+
+    def warmup(self) -> None:
+        """
+        Initialize resources (connections, tokenizers) ahead of the first call.
+
+        Called by ``Pipeline.warmup``; the default does nothing.
+        """
+
+    async def aclose(self) -> None:
+        """
+        Release resources bound to the running event loop (async HTTP
+        clients). Also called on leaving ``async with compressor:``; the
+        default does nothing.
+        """
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        await self.aclose()
+
+    async def acompress(self, context, prompt, max_tokens=None, **kwargs):
+        """
+        Asynchronous version of ``compress``.
+
+        The default implementation runs ``compress`` in a worker thread;
+        network-bound compressors should override it with native async I/O.
+        """
+        return await asyncio.to_thread(self.compress, context, prompt, max_tokens=max_tokens, **kwargs)
+
+    def compress_batch(self, contexts, prompts, max_tokens=None, return_exceptions=False, **kwargs):
+        """
+        Compress several contexts; returns one result per context, in order.
+
+        ``prompts`` is a list with one prompt per context, or a single prompt
+        for all of them. With ``return_exceptions=True``, an item that fails
+        yields its exception instead of aborting the batch.
+        """
+        if isinstance(prompts, str):
+            prompts = [prompts] * len(contexts)
+        if len(contexts) != len(prompts):
+            raise ValueError("Context list and prompt list must have the same length.")
+
+        results = []
+        for context, prompt in zip(contexts, prompts):
+            try:
+                results.append(self.compress(context, prompt, max_tokens=max_tokens, **kwargs))
+            except Exception as e:
+                if not return_exceptions:
+                    raise
+                results.append(e)
+        return results
@@ -0,0 +1,188 @@
+"""
+Circuit breaker for the ScaleDown API.
+
+The breaker watches the outcome of recent requests. When too many of them
+fail (connection errors, HTTP 5xx) or are too slow, it opens and rejects
+calls immediately for ``reset_timeout`` seconds. After that it lets a few
+probe requests through (half-open): if they succeed the circuit closes,
+otherwise it opens again.
+"""
+import logging
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass
+from typing import Callable, List, Optional
+
+logger = logging.getLogger(__name__)
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+@dataclass
+class BreakerStats:
+    """Current state and counters of a CircuitBreaker."""
+    state: str
+    calls: int = 0
+    failures: int = 0
+    slow_calls: int = 0
+    rejected: int = 0
+    times_opened: int = 0
+
+
+class CircuitBreaker:
+    """
+    Closed / open / half-open circuit breaker over a sliding window of calls.
+
+    Parameters
+    ----------
+    failure_rate_threshold : float, default=0.5
+        Fraction of failed calls in the window that opens the circuit.
+    slow_call_threshold : float, optional
+        Calls slower than this many seconds count as slow. ``None`` disables
+        the latency check.
+    slow_call_rate_threshold : float, default=0.8
+        Fraction of slow calls in the window that opens the circuit.
+    window : int, default=50
+        Number of most recent calls considered.
+    min_calls : int, default=10
+        Calls needed in the window before the rates are evaluated.
+    reset_timeout : float, default=30.0
+        Seconds the circuit stays open before probing.
+    half_open_max_calls : int, default=1
+        Probe calls allowed while half-open; all must succeed to close.
+    """
+
+    def __init__(self, failure_rate_threshold: float = 0.5,
+                 slow_call_threshold: Optional[float] = None,
+                 slow_call_rate_threshold: float = 0.8, window: int = 50,
+                 min_calls: int = 10, reset_timeout: float = 30.0,
+                 half_open_max_calls: int = 1):
+        self.failure_rate_threshold = failure_rate_threshold
+        self.slow_call_threshold = slow_call_threshold
+        self.slow_call_rate_threshold = slow_call_rate_threshold
+        self.min_calls = min_calls
+        self.reset_timeout = reset_timeout
+        self.half_open_max_calls = half_open_max_calls
+        self._outcomes = deque(maxlen=window)  # (failed, slow)
+        self._state = CLOSED
+        self._changed_at = 0.0
+        self._probes = 0
+        self._probe_successes = 0
+        self._stats = BreakerStats(state=CLOSED)
+        self._listeners: List[Callable[[str, str], None]] = []
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            changes = []
+            state = self._current_state(changes)
+        self._notify(changes)
+        return state
+
+    def add_listener(self, callback: Callable[[str, str], None]) -> None:
+        """Call ``callback(old_state, new_state)`` on every state change."""
+        self._listeners.append(callback)
+
+    def allow(self) -> bool:
+        """Return True if a call may proceed; False if it should be rejected."""
+        with self._lock:
+            changes = []
+            state = self._current_state(changes)
+            if state == CLOSED:
+                allowed = True
+            elif state == HALF_OPEN and self._probe_available():
+                self._probes += 1
+                allowed = True
+            else:
+                self._stats.rejected += 1
+                allowed = False
+        self._notify(changes)
+        return allowed
+
+    def record(self, failed: bool, latency: float = 0.0) -> None:
+        """Record the outcome of a call that ``allow`` let through."""
+        slow = self.slow_call_threshold is not None and latency > self.slow_call_threshold
+        with self._lock:
+            changes = []
+            self._stats.calls += 1
+            self._stats.failures += failed
+            self._stats.slow_calls += slow
+
+            if self._state == HALF_OPEN:
+                if failed or slow:
+                    self._transition(OPEN, changes)
+                else:
+                    self._probe_successes += 1
+                    if self._probe_successes >= self.half_open_max_calls:
+                        self._transition(CLOSED, changes)
+            elif self._state == CLOSED:
+                self._outcomes.append((failed, slow))
+                if self._should_open():
+                    self._transition(OPEN, changes)
+        self._notify(changes)
+
+    def reset(self) -> None:
+        """Force the circuit closed and forget recent outcomes."""
+        with self._lock:
+            changes = []
+            self._transition(CLOSED, changes)
+        self._notify(changes)
+
+    def stats(self) -> BreakerStats:
+        with self._lock:
+            changes = []
+            self._stats.state = self._current_state(changes)
+            stats = BreakerStats(**vars(self._stats))
+        self._notify(changes)
+        return stats
+
+    def _current_state(self, changes: list) -> str:
+        if self._state == OPEN and time.monotonic() - self._changed_at >= self.reset_timeout:
+            self._transition(HALF_OPEN, changes)
+        return self._state
+
+    def _probe_available(self) -> bool:
+        if self._probes < self.half_open_max_calls:
+            return True
+        # A probe that never reported back (e.g. a cancelled call) must not wedge the circuit
+        if time.monotonic() - self._changed_at >= self.reset_timeout:
+            self._probes = self._probe_successes = 0
+            self._changed_at = time.monotonic()
+            return True
+        return False
+
+    def _should_open(self) -> bool:
+        n = len(self._outcomes)
+        if n < self.min_calls:
+            return False
+        failures = sum(f for f, _ in self._outcomes)
+        slow = sum(s for _, s in self._outcomes)
+        return (failures / n >= self.failure_rate_threshold
+                or (self.slow_call_threshold is not None and slow / n >= self.slow_call_rate_threshold))
+
+    def _transition(self, new_state: str, changes: list) -> None:
+        old_state = self._state
+        self._state = new_state
+        self._probes = self._probe_successes = 0
+        self._changed_at = time.monotonic()
+        if new_state == OPEN:
+            self._stats.times_opened += 1
+        if new_state == CLOSED:
+            self._outcomes.clear()
+        if old_state != new_state:
+            changes.append((old_state, new_state))
+
+    def _notify(self, changes) -> None:
+        # Listeners run outside the lock so they may query the breaker
+        for old_state, new_state in changes:
+            level = logging.WARNING if new_state == OPEN else logging.INFO
+            logger.log(level, "ScaleDown circuit breaker %s -> %s", old_state, new_state)
+            for callback in list(self._listeners):
+                callback(old_state, new_state)
+
+    def __repr__(self) -> str:
+        return f"CircuitBreaker(state={self.state!r})"
@@ -0,0 +1,175 @@
+"""
+Offline extractive compression.
+
+``ExtractiveCompressor`` keeps the sentences (or lines) of a context that
+are most relevant to the prompt, scored with BM25, until the token budget
+is used up. Everything runs in-process, so it works without network
+access and typically takes a few milliseconds.
+"""
+import math
+import re
+import time
+from itertools import chain
+from typing import List, Union
+
+import numpy as np
+
+from .base import BaseCompressor
+from ..types import CompressedPrompt
+from ..types.metrics import get_encoding
+
+_SENTENCE = re.compile(r".+?(?:[.!?](?=\s)|\n|$)\s*", re.S)
+_WORD = re.compile(r"\w+")
+
+
+class ExtractiveCompressor(BaseCompressor):
+    """
+    Local compressor that selects the units most relevant to the prompt.
+
+    The context is split into sentences (prose) or lines (code), each unit
+    is scored against the prompt with BM25, and the best units are kept, in
+    their original order, within ``max_tokens`` or ``rate`` of the original
+    token count. Token counts are exact (tiktoken).
+
+    Parameters
+    ----------
+    target_model : str, default='gpt-4o'
+        Model whose tokenizer is used for counting.
+    rate : float or 'auto', default='auto'
+        Fraction of the original tokens to keep when ``max_tokens`` is not
+        given. ``'auto'`` keeps half.
+    granularity : {'auto', 'sentence', 'line'}, default='auto'
+        Unit of extraction. ``'auto'`` uses lines for multi-line text that
+        looks like code and sentences otherwise.
+    k1, b : float
+        BM25 term-frequency saturation and length normalization.
+
+    Requires ``numpy`` and ``tiktoken`` (``pip install scaledown[local]``).
+    """
+
+    def __init__(self, target_model='gpt-4o', rate='auto', granularity='auto',
+                 k1: float = 1.5, b: float = 0.75):
+        super().__init__(rate=rate, api_key=None)
+        if granularity not in ("auto", "sentence", "line"):
+            raise ValueError("granularity must be 'auto', 'sentence' or 'line'")
+        self.target_model = target_model
+        self.granularity = granularity
+        self.k1 = k1
+        self.b = b
+
+    def compress(self, context: Union[str, List[str]], prompt: Union[str, List[str]],
+                 max_tokens: int = None, **kwargs) -> Union[CompressedPrompt, List[CompressedPrompt]]:
+        """
+        Compress context locally by extracting the units most relevant to ``prompt``.
+        """
+        if isinstance(context, str) and isinstance(prompt, str):
+            return self._compress_one(context, prompt, max_tokens)
+
+        elif isinstance(context, list) and isinstance(prompt, list):
+            if len(context) != len(prompt):
+                raise ValueError("Context list and prompt list must have the same length.")
+            return [self._compress_one(c, p, max_tokens) for c, p in zip(context, prompt)]
+
+        elif isinstance(context, list) and isinstance(prompt, str):
+            return [self._compress_one(c, prompt, max_tokens) for c in context]
+
+        else:
+            raise ValueError("Invalid combination of context and prompt types.")
+
+    def warmup(self) -> None:
+        """Load the tokenizer."""
+        get_encoding(self.target_model)
+
+    def _compress_one(self, context: str, prompt: str, max_tokens=None) -> CompressedPrompt:
+        start = time.perf_counter()
+        encoding = get_encoding(self.target_model)
+
+        units = self._split(context)
+        unit_tokens = np.array(_encode_lengths(encoding, units), dtype=np.int64)
+        original_tokens = len(encoding.encode(context, disallowed_special=()))
+        budget = self._budget(original_tokens, max_tokens)
+
+        if original_tokens <= budget:
+            content, compressed_tokens = context, original_tokens
+        else:
+            scores = self._score(units, prompt)
+            keep = _select(scores, unit_tokens, budget)
+            content = "".join(units[i] for i in keep).rstrip()
+            compressed_tokens = len(encoding.encode(content, disallowed_special=()))
+            # Tokens can merge differently across joined units; drop the weakest until it fits
+            while compressed_tokens > budget and keep:
+                keep.remove(min(keep, key=lambda i: scores[i]))
+                content = "".join(units[i] for i in keep).rstrip()
+                compressed_tokens = len(encoding.encode(content, disallowed_special=()))
+
+        return CompressedPrompt(
+            content=content,
+            original_prompt=prompt,
+            tokens=(original_tokens, compressed_tokens),
+            latency=(time.perf_counter() - start) * 1000,
+            model=self.target_model,
+        )
+
+    def _split(self, text: str) -> List[str]:
+        granularity = self.granularity
+        if granularity == "auto":
+            granularity = "line" if _looks_like_code(text) else "sentence"
+        if granularity == "line":
+            return text.splitlines(keepends=True)
+        return _SENTENCE.findall(text)
+
+    def _budget(self, original_tokens: int, max_tokens=None) -> int:
+        if max_tokens is not None:
+            return max_tokens
+        rate = 0.5 if self.rate == "auto" else float(self.rate)
+        return math.ceil(original_tokens * rate)
+
+    def _score(self, units: List[str], prompt: str) -> np.ndarray:
+        """BM25 score of every unit against the prompt terms."""
+        query = {term: i for i, term in enumerate(dict.fromkeys(_WORD.findall(prompt.lower())))}
+        n = len(units)
+        # Prefer earlier units when relevance ties (e.g. no overlap with the prompt)
+        prior = np.linspace(1e-6, 0.0, n)
+        if not query or n == 0:
+            return prior
+
+        unit_words = [_WORD.findall(u.lower()) for u in units]
+        lengths = np.fromiter(map(len, unit_words), dtype=np.int64, count=n)
+        words = chain.from_iterable(unit_words)
+        terms = np.fromiter((query.get(w, -1) for w in words), dtype=np.int64, count=int(lengths.sum()))
+        word_units = np.repeat(np.arange(n), lengths)
+        hit = terms >= 0
+        tf = np.bincount(word_units[hit] * len(query) + terms[hit],
+                         minlength=n * len(query)).reshape(n, len(query)).astype(float)
+        df = np.count_nonzero(tf, axis=0)
+        idf = np.log1p((n - df + 0.5) / (df + 0.5))
+        norm = self.k1 * (1 - self.b + self.b * lengths / max(lengths.mean(), 1e-9))
+        return (tf * (self.k1 + 1) / (tf + norm[:, None])) @ idf + prior
+
+
+def _encode_lengths(encoding, texts: List[str]) -> List[int]:
+    if hasattr(encoding, "encode_ordinary_batch"):
+        return [len(ids) for ids in encoding.encode_ordinary_batch(texts)]
+    return [len(encoding.encode(t, disallowed_special=())) for t in texts]
+
+
+def _select(scores: np.ndarray, unit_tokens: np.ndarray, budget: int) -> List[int]:
+    """Greedily take the best-scoring units that fit; return them in text order."""
+    keep, used = [], 0
+    for i in np.argsort(-scores, kind="stable"):
+        n = int(unit_tokens[i])
+        if used + n <= budget:
+            keep.append(int(i))
+            used += n
+    return sorted(keep)
+
+
+def _looks_like_code(text: str) -> bool:
+    lines = [line for line in text.splitlines() if line.strip()]
+    if len(lines) < 3:
+        return False
+    code_like = sum(
+        line.startswith((" ", "\t")) or line.rstrip().endswith((":", "{", "}", ";", ")"))
+        for line in lines
+    )
+    return code_like / len(lines) >= 0.3
@@ -0,0 +1,163 @@
+"""
+Hedged requests: if a call is slower than the recent p95 latency, send a
+duplicate and use whichever response arrives first.
+
+Duplicates are sent only when the caller admits them (see ``hedged_call``),
+so they can be charged against the same flow control as primary requests.
+"""
+import asyncio
+import math
+import threading
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor, wait, FIRST_COMPLETED
+from typing import Any, Awaitable, Callable, Optional, Tuple
+
+
+class LatencyTracker:
+    """
+    Sliding window of recent call latencies (seconds).
+
+    Parameters
+    ----------
+    window : int, default=200
+        Number of most recent samples kept.
+    """
+
+    def __init__(self, window: int = 200):
+        self._samples = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def record(self, seconds: float) -> None:
+        with self._lock:
+            self._samples.append(seconds)
+
+    def quantile(self, q: float) -> Optional[float]:
+        """Nearest-rank quantile of the window, or None if it is empty."""
+        with self._lock:
+            if not self._samples:
+                return None
+            ordered = sorted(self._samples)
+        rank = min(max(math.ceil(q * len(ordered)) - 1, 0), len(ordered) - 1)
+        return ordered[rank]
+
+    def __len__(self) -> int:
+        return len(self._samples)
+
+
+_MAX_THREADS = 32
+_executor: Optional[ThreadPoolExecutor] = None
+_executor_lock = threading.Lock()
+# One permit per executor thread: calls never queue behind running (or losing) ones
+_thread_permits = threading.BoundedSemaphore(_MAX_THREADS)
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=_MAX_THREADS, thread_name_prefix="scaledown-hedge")
+        return _executor
+
+
+def _submit(fn: Callable[[], Any]) -> Optional[Future]:
+    """Run ``fn`` on a free hedging thread, or return None when all are busy."""
+    if not _thread_permits.acquire(blocking=False):
+        return None
+    future = _get_executor().submit(fn)
+    future.add_done_callback(lambda _: _thread_permits.release())
+    return future
+
+
+def _when_all_done(futures, callback: Callable[[], None]) -> None:
+    remaining = [len(futures)]
+    lock = threading.Lock()
+
+    def done(_):
+        with lock:
+            remaining[0] -= 1
+            last = remaining[0] == 0
+        if last:
+            callback()
+
+    for future in futures:
+        future.add_done_callback(done)
+
+
+Admit = Callable[[], Optional[Callable[[], None]]]
+
+
+def hedged_call(fn: Callable[[], Any], hedge_after: float,
+                admit: Optional[Admit] = None) -> Tuple[Any, bool]:
+    """
+    Run ``fn``; if it has not finished after ``hedge_after`` seconds, run it
+    again and return the first successful result.
+
+    ``admit`` is called before the duplicate is sent. It returns None to
+    skip hedging (e.g. no concurrency headroom), or a callback run once
+    both calls have finished, to release what it reserved. Returns
+    ``(result, hedged)``.
+
+    Calls run on a bounded pool of threads. When none is free, ``fn`` runs
+    in the calling thread without hedging, and no duplicate is sent. A
+    losing call therefore always occupies one of those threads until it
+    finishes (bounded by its request timeouts), and its result is
+    discarded.
+    """
+    primary = _submit(fn)
+    if primary is None:
+        return fn(), False
+    done, _ = wait([primary], timeout=hedge_after)
+    if done:
+        return primary.result(), False
+
+    settled = admit() if admit is not None else (lambda: None)
+    if settled is None:
+        return primary.result(), False
+    duplicate = _submit(fn)
+    if duplicate is None:
+        settled()
+        return primary.result(), False
+    _when_all_done([primary, duplicate], settled)
+
+    pending = {primary, duplicate}
+    error = None
+    while pending:
+        done, pending = wait(pending, return_when=FIRST_COMPLETED)
+        for future in done:
+            if future.exception() is None:
+                return future.result(), True
+            error = future.exception()
+    raise error
+
+
+async def ahedged_call(fn: Callable[[], Awaitable[Any]], hedge_after: float,
+                       admit: Optional[Admit] = None) -> Tuple[Any, bool]:
+    """Asynchronous version of ``hedged_call``; the losing call is cancelled."""
+    primary = asyncio.ensure_future(fn())
+    try:
+        done, _ = await asyncio.wait({primary}, timeout=hedge_after)
+    except BaseException:
+        primary.cancel()
+        raise
+    if done:
+        return primary.result(), False
+
+    settled = admit() if admit is not None else (lambda: None)
+    if settled is None:
+        return await primary, False
+    duplicate = asyncio.ensure_future(fn())
+    _when_all_done([primary, duplicate], settled)
+
+    pending = {primary, duplicate}
+    error = None
+    try:
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if task.exception() is None:
+                    return task.result(), True
+                error = task.exception()
+        raise error
+    finally:
+        for task in pending:
+            task.cancel()
@@ -1,54 +1,590 @@
+import asyncio
+import contextvars
+import dataclasses
+import logging
+import time
 import requests
-from typing import Union, List, Optional
-from concurrent.futures import ThreadPoolExecutor
+from typing import Union, List, Optional, Iterable, Iterator, AsyncIterator
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
 
 from .base import BaseCompressor
-from ..exceptions import AuthenticationError, APIError
+from ..exceptions import (
+    AuthenticationError, APIError, RateLimitError, DeadlineExceededError, CircuitOpenError
+)
 from ..types import CompressedPrompt
+from ..cache import hash_key
 from .config import get_api_url
+from .session import SessionPool, AsyncSessionPool, import_httpx
+from .throttle import Throttle, get_shared_throttle, parse_retry_after
+from .singleflight import get_shared_singleflight
+from .sharding import split_context, allocate_budgets, combine_results, merge_shards
+from .hedging import LatencyTracker, hedged_call, ahedged_call
+from .breaker import CircuitBreaker
+from ..tracing import record_bytes
+from ..types.metrics import count_tokens, get_encoding
+
+logger = logging.getLogger(__name__)
 
 class ScaleDownCompressor(BaseCompressor):
     """
     Standard ScaleDown compressor using the hosted model on API.
+
+    Requests are sent over a keep-alive ``SessionPool``. Pass the same pool
+    (e.g. ``scaledown.compressor.session.get_shared_pool()``) to several
+    compressors to share connections between them.
+
+    Pass a ``cache`` (``LRUCache``, ``SQLiteCache`` or ``TieredCache`` from
+    ``scaledown.cache``) to reuse results for repeated requests. Cache hits
+    are returned with ``cached=True`` and never reach the API.
+
+    Requests pass through a ``Throttle`` (adaptive concurrency, rate limits,
+    retry with backoff). Unless one is given, the process-wide throttle from
+    ``scaledown.compressor.throttle.get_shared_throttle()`` is used, so all
+    compressors share the same quota. ``max_workers`` caps the parallelism
+    of a single batch.
+
+    With ``coalesce=True`` (default), concurrent calls with identical
+    requests, from threads, coroutines or the same batch, share a single
+    in-flight API call. See ``coalesce_stats()``.
+
+    Set ``shard_tokens`` to split contexts longer than that many tokens at
+    paragraph/code-block boundaries. Shards are compressed in parallel, the
+    ``max_tokens`` budget is divided between them, and the results are
+    joined back in order.
+
+    Every request uses ``connect_timeout``/``read_timeout`` (seconds). A
+    ``deadline`` (a ``time.monotonic()`` timestamp) can be passed to
+    ``compress``/``acompress`` to bound the whole call including retries.
+    With ``hedge=True``, a request still pending after the observed
+    ``hedge_quantile`` latency is duplicated and the first response wins.
+    The duplicate takes its own throttle slot and rate budget, and is not
+    sent when either would have to be waited for.
+
+    A ``CircuitBreaker`` (one per compressor unless ``breaker`` is given;
+    ``breaker=False`` disables it) stops sending requests while the API is
+    failing. Calls then raise ``CircuitOpenError`` immediately. With
+    ``fallback="passthrough"``, an open circuit, an API or connection error
+    (after retries) or an exceeded deadline instead returns the context
+    unchanged with ``passthrough=True`` and logs a warning; a missing API
+    key still raises.
     """
-    def __init__(self, target_model='gpt-4o', rate='auto', api_key=None, 
-                 temperature=None, preserve_keywords=False, preserve_words=None):
+    def __init__(self, target_model='gpt-4o', rate='auto', api_key=None,
+                 temperature=None, preserve_keywords=False, preserve_words=None,
+                 max_workers=5, session: Optional[SessionPool] = None,
+                 async_session: Optional[AsyncSessionPool] = None, cache=None,
+                 throttle: Optional[Throttle] = None, coalesce: bool = True,
+                 shard_tokens: Optional[int] = None, connect_timeout: float = 10.0,
+                 read_timeout: Optional[float] = 120.0, hedge: bool = False,
+                 hedge_quantile: float = 0.95, hedge_min_samples: int = 20,
+                 breaker: Optional[CircuitBreaker] = None, fallback: str = "raise"):
         super().__init__(rate=rate, api_key=api_key)
+        if fallback not in ("raise", "passthrough"):
+            raise ValueError("fallback must be 'raise' or 'passthrough'")
         self.api_url = get_api_url()
         self.target_model = target_model
         self.temperature = temperature
         self.preserve_keywords = preserve_keywords
         self.preserve_words = preserve_words or []
+        self.max_workers = max_workers
+        self.session = session or SessionPool(pool_size=max_workers)
+        self.async_session = async_session or AsyncSessionPool(pool_size=max_workers)
+        self.cache = cache
+        self.throttle = throttle
+        self.coalesce = coalesce
+        self.shard_tokens = shard_tokens
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        self.hedge = hedge
+        self.hedge_quantile = hedge_quantile
+        self.hedge_min_samples = hedge_min_samples
+        self._latencies = LatencyTracker()
+        self.breaker = CircuitBreaker() if breaker is None else breaker or None
+        self.fallback = fallback
 
-    def compress(self, context: Union[str, List[str]], prompt: Union[str, List[str]], 
+    def compress(self, context: Union[str, List[str]], prompt: Union[str, List[str]],
                  max_tokens: int = None, **kwargs) -> Union[CompressedPrompt, List[CompressedPrompt]]:
         """
         Compress context using ScaleDown's hosted API.
         """
         if isinstance(context, str) and isinstance(prompt, str):
-            return self._compress_single(context, prompt, max_tokens=max_tokens, **kwargs)
-        
+            return self._compress_one(context, prompt, max_tokens=max_tokens, **kwargs)
+
         elif isinstance(context, list) and isinstance(prompt, list):
             if len(context) != len(prompt):
                 raise ValueError("Context list and prompt list must have the same length.")
             return self._compress_batch(context, prompt, max_tokens=max_tokens, **kwargs)
-            
+
         elif isinstance(context, list) and isinstance(prompt, str):
             # Broadcast prompt to all contexts
             return self._compress_batch(context, [prompt] * len(context), max_tokens=max_tokens, **kwargs)
-        
+
         else:
             raise ValueError("Invalid combination of context and prompt types.")
 
-    def _compress_batch(self, context_list, prompt_list, **kwargs):
-        with ThreadPoolExecutor(max_workers=5) as executor:
-            results = list(executor.map(
-                lambda p: self._compress_single(p[0], p[1], **kwargs), 
-                zip(context_list, prompt_list)
-            ))
+    async def acompress(self, context: Union[str, List[str]], prompt: Union[str, List[str]],
+                        max_tokens: int = None, max_concurrency: Optional[int] = None,
+                        **kwargs) -> Union[CompressedPrompt, List[CompressedPrompt]]:
+        """
+        Asynchronous version of ``compress`` using a non-blocking HTTP client.
+
+        List inputs are fanned out as coroutines, with at most
+        ``max_concurrency`` (default: ``max_workers``) requests in flight.
+        Requires ``httpx`` (``pip install scaledown[async]``).
+        """
+        if isinstance(context, str) and isinstance(prompt, str):
+            return await self._acompress_one(context, prompt, max_tokens=max_tokens, **kwargs)
+
+        elif isinstance(context, list) and isinstance(prompt, list):
+            if len(context) != len(prompt):
+                raise ValueError("Context list and prompt list must have the same length.")
+            return await self._acompress_batch(context, prompt, max_concurrency=max_concurrency,
+                                               max_tokens=max_tokens, **kwargs)
+
+        elif isinstance(context, list) and isinstance(prompt, str):
+            # Broadcast prompt to all contexts
+            return await self._acompress_batch(context, [prompt] * len(context), max_concurrency=max_concurrency,
+                                               max_tokens=max_tokens, **kwargs)
+
+        else:
+            raise ValueError("Invalid combination of context and prompt types.")
+
+    def compress_iter(self, items: Iterable, prompt: Optional[str] = None, max_tokens: int = None,
+                      window: Optional[int] = None, ordered: bool = False,
+                      **kwargs) -> Iterator[CompressedPrompt]:
+        """
+        Compress a stream of inputs, yielding results as they finish.
+
+        Parameters
+        ----------
+        items : iterable
+            ``(context, prompt)`` pairs, or plain contexts if ``prompt`` is given.
+            Consumed lazily.
+        prompt : str, optional
+            Prompt broadcast to every context.
+        window : int, optional
+            Maximum number of requests in flight (plus, when ``ordered``,
+            finished results waiting for earlier ones). Defaults to
+            ``2 * max_workers``.
+        ordered : bool, default=False
+            Yield in input order instead of completion order.
+
+        Yields
+        ------
+        CompressedPrompt
+            With ``index`` set to the position of its input.
+        """
+        window = window or 2 * self.max_workers
+        source = enumerate(_with_prompt(items, prompt))
+        pending = {}
+        finished = {}
+        next_index = 0
+
+        executor = ThreadPoolExecutor(max_workers=min(self.max_workers, window))
+        try:
+            while True:
+                while len(pending) + len(finished) < window:
+                    item = next(source, None)
+                    if item is None:
+                        break
+                    i, (context, item_prompt) = item
+                    future = executor.submit(contextvars.copy_context().run, self._compress_one,
+                                             context, item_prompt, max_tokens=max_tokens, **kwargs)
+                    pending[future] = i
+                if not pending:
+                    break
+
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    result = future.result()
+                    result.index = pending.pop(future)
+                    if ordered:
+                        finished[result.index] = result
+                    else:
+                        yield result
+                while next_index in finished:
+                    yield finished.pop(next_index)
+                    next_index += 1
+        finally:
+            for future in pending:
+                future.cancel()
+            executor.shutdown(wait=False)
+
+    async def acompress_iter(self, items, prompt: Optional[str] = None, max_tokens: int = None,
+                             window: Optional[int] = None, ordered: bool = False,
+                             **kwargs) -> AsyncIterator[CompressedPrompt]:
+        """
+        Asynchronous version of ``compress_iter``.
+
+        ``items`` may be a regular or an async iterable.
+        """
+        window = window or 2 * self.max_workers
+        if hasattr(items, "__aiter__"):
+            source = _aenumerate(_awith_prompt(items, prompt))
+        else:
+            source = _aenumerate(_with_prompt(items, prompt))
+        pending = {}
+        finished = {}
+        next_index = 0
+        exhausted = False
+
+        try:
+            while True:
+                while not exhausted and len(pending) + len(finished) < window:
+                    try:
+                        i, (context, item_prompt) = await source.__anext__()
+                    except StopAsyncIteration:
+                        exhausted = True
+                        break
+                    task = asyncio.ensure_future(self._acompress_one(
+                        context, item_prompt, max_tokens=max_tokens, **kwargs
+                    ))
+                    pending[task] = i
+                if not pending:
+                    break
+
+                done, _ = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    result = task.result()
+                    result.index = pending.pop(task)
+                    if ordered:
+                        finished[result.index] = result
+                    else:
+                        yield result
+                while next_index in finished:
+                    yield finished.pop(next_index)
+                    next_index += 1
+        finally:
+            for task in pending:
+                task.cancel()
+
+    def compress_batch(self, contexts, prompts, max_tokens=None, return_exceptions=False, **kwargs):
+        """
+        Compress several contexts concurrently; one result per context, in order.
+
+        ``prompts`` is a list or a single prompt for all contexts. With
+        ``return_exceptions=True``, failed items yield their exception.
+        """
+        if isinstance(prompts, str):
+            prompts = [prompts] * len(contexts)
+        if len(contexts) != len(prompts):
+            raise ValueError("Context list and prompt list must have the same length.")
+        return self._compress_batch(contexts, prompts, return_exceptions=return_exceptions,
+                                    max_tokens=max_tokens, **kwargs)
+
+    def _compress_batch(self, context_list, prompt_list, return_exceptions=False, **kwargs):
+        def run(pair):
+            try:
+                return self._compress_one(pair[0], pair[1], **kwargs)
+            except Exception as e:
+                if not return_exceptions:
+                    raise
+                return e
+
+        with ThreadPoolExecutor(max_workers=max(min(self.max_workers, len(context_list)), 1)) as executor:
+            results = list(executor.map(run, zip(context_list, prompt_list)))
         return results
 
-    def _compress_single(self, context, prompt, max_tokens=None, **kwargs) -> CompressedPrompt:
+    async def _acompress_batch(self, context_list, prompt_list, max_concurrency=None, **kwargs):
+        semaphore = asyncio.Semaphore(max_concurrency or self.max_workers)
+
+        async def bounded(context, prompt):
+            async with semaphore:
+                return await self._acompress_one(context, prompt, **kwargs)
+
+        return list(await asyncio.gather(*(
+            bounded(c, p) for c, p in zip(context_list, prompt_list)
+        )))
+
+    def _compress_one(self, context, prompt, **kwargs) -> CompressedPrompt:
+        try:
+            return self._compress_context(context, prompt, **kwargs)
+        except (APIError, DeadlineExceededError) as e:
+            return self._fallback(context, prompt, e)
+
+    async def _acompress_one(self, context, prompt, **kwargs) -> CompressedPrompt:
+        try:
+            return await self._acompress_context(context, prompt, **kwargs)
+        except (APIError, DeadlineExceededError) as e:
+            return self._fallback(context, prompt, e)
+
+    def _fallback(self, context, prompt, error: Exception) -> CompressedPrompt:
+        """Re-raise ``error``, or return the context uncompressed."""
+        if self.fallback != "passthrough":
+            raise error
+        logger.warning("Compression failed, passing the context through uncompressed: %s", error)
+        try:
+            tokens = count_tokens(context, model=self.target_model)
+        except Exception:
+            # The tokenizer may be as unreachable as the API; never fail the fallback
+            tokens = count_tokens(context, model=self.target_model, mode="estimate")
+        return CompressedPrompt(
+            content=context,
+            original_prompt=prompt,
+            tokens=(tokens, tokens),
+            latency=0.0,
+            model=self.target_model,
+            passthrough=True,
+        )
+
+    def _compress_context(self, context, prompt, max_tokens=None, **kwargs) -> CompressedPrompt:
+        """Compress one context, sharding it first if it is too large."""
+        shards = self._shard(context)
+        if max_tokens:
+            # Every shard needs at least one token of the budget
+            shards = merge_shards(shards, max_tokens)
+        if len(shards) <= 1:
+            return self._compress_single(context, prompt, max_tokens=max_tokens, **kwargs)
+
+        budgets = allocate_budgets([s.tokens for s in shards], max_tokens) if max_tokens else [None] * len(shards)
+        with ThreadPoolExecutor(max_workers=min(self.max_workers, len(shards))) as executor:
+            # Each shard runs in a copy of the caller's context (trace spans, metrics mode)
+            futures = [
+                executor.submit(contextvars.copy_context().run, self._compress_single,
+                                shard.text, prompt, max_tokens=budget, **kwargs)
+                for shard, budget in zip(shards, budgets)
+            ]
+            results = [future.result() for future in futures]
+        return combine_results(results)
+
+    async def _acompress_context(self, context, prompt, max_tokens=None, **kwargs) -> CompressedPrompt:
+        shards = self._shard(context)
+        if max_tokens:
+            # Every shard needs at least one token of the budget
+            shards = merge_shards(shards, max_tokens)
+        if len(shards) <= 1:
+            return await self._acompress_single(context, prompt, max_tokens=max_tokens, **kwargs)
+
+        budgets = allocate_budgets([s.tokens for s in shards], max_tokens) if max_tokens else [None] * len(shards)
+        semaphore = asyncio.Semaphore(self.max_workers)
+
+        async def bounded(shard, budget):
+            async with semaphore:
+                return await self._acompress_single(shard.text, prompt, max_tokens=budget, **kwargs)
+
+        results = await asyncio.gather(*(bounded(s, b) for s, b in zip(shards, budgets)))
+        return combine_results(list(results))
+
+    def _shard(self, context):
+        if not self.shard_tokens or len(context.encode("utf-8")) <= self.shard_tokens:
+            # Every token covers at least one byte, so short contexts never need splitting
+            return []
+        return split_context(context, self.shard_tokens, model=self.target_model)
+
+    def _compress_single(self, context, prompt, max_tokens=None, deadline=None, **kwargs) -> CompressedPrompt:
+        url, headers, payload = self._build_request(context, prompt, max_tokens=max_tokens, **kwargs)
+        key, cached = self._cache_lookup(payload)
+        if cached is not None:
+            return cached
+
+        if not self.coalesce:
+            return self._fetch(url, headers, payload, key, deadline)
+        result, shared = get_shared_singleflight().do(
+            self._flight_key(url, payload),
+            lambda: self._fetch(url, headers, payload, key, deadline),
+            deadline=deadline,
+        )
+        return dataclasses.replace(result) if shared else result
+
+    async def _acompress_single(self, context, prompt, max_tokens=None, deadline=None, **kwargs) -> CompressedPrompt:
+        url, headers, payload = self._build_request(context, prompt, max_tokens=max_tokens, **kwargs)
+        key, cached = self._cache_lookup(payload)
+        if cached is not None:
+            return cached
+
+        if not self.coalesce:
+            return await self._afetch(url, headers, payload, key, deadline)
+        result, shared = await get_shared_singleflight().ado(
+            self._flight_key(url, payload),
+            lambda: self._afetch(url, headers, payload, key, deadline),
+            deadline=deadline,
+        )
+        return dataclasses.replace(result) if shared else result
+
+    def _fetch(self, url, headers, payload, cache_key=None, deadline=None) -> CompressedPrompt:
+        try:
+            response = self._send(url, headers, payload, deadline)
+            response.raise_for_status()
+            return self._cache_store(cache_key, self._parse_body(response))
+
+        except requests.exceptions.RequestException as e:
+            raise APIError(f"Connection failed: {str(e)}")
+
+    async def _afetch(self, url, headers, payload, cache_key=None, deadline=None) -> CompressedPrompt:
+        httpx = import_httpx()
+        try:
+            response = await self._asend(url, headers, payload, deadline)
+            response.raise_for_status()
+            return self._cache_store(cache_key, self._parse_body(response))
+
+        except httpx.HTTPError as e:
+            raise APIError(f"Connection failed: {str(e)}")
+
+    async def aclose(self) -> None:
+        """
+        Close the async HTTP client used on the running event loop.
+
+        Call it (or use ``async with compressor:``) before the loop ends;
+        a later call on another loop opens a new client.
+        """
+        await self.async_session.aclose()
+
+    def warmup(self) -> None:
+        """
+        Open a keep-alive connection to the API and load the sharding tokenizer.
+
+        An unreachable API is logged rather than raised, since it may be
+        reachable by the time requests are sent.
+        """
+        if self.shard_tokens:
+            get_encoding(self.target_model)
+        try:
+            self.session.warmup(self.api_url, timeout=self.connect_timeout)
+        except requests.exceptions.RequestException as e:
+            logger.warning("Could not pre-connect to the ScaleDown API: %s", e)
+
+    def _flight_key(self, url, payload) -> str:
+        # Identical payloads to the same endpoint with the same key share one request
+        return hash_key("inflight", url, self.api_key, payload)
+
+    def _get_throttle(self) -> Throttle:
+        return self.throttle or get_shared_throttle()
+
+    def _timeouts(self, deadline=None):
+        """(connect, read) timeouts for one attempt, capped by the deadline."""
+        read_timeout = self.read_timeout
+        if deadline is not None:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                raise DeadlineExceededError("Deadline exceeded before the compress request was sent")
+            read_timeout = min(read_timeout, remaining) if read_timeout else remaining
+        return self.connect_timeout, read_timeout
+
+    def _hedge_after(self) -> Optional[float]:
+        if not self.hedge or len(self._latencies) < self.hedge_min_samples:
+            return None
+        return self._latencies.quantile(self.hedge_quantile)
+
+    def _admit_hedge(self, throttle, tokens):
+        """
+        Let a duplicate request through the throttle like any other request,
+        or skip hedging if it would have to wait for a slot or rate budget.
+        """
+        start = throttle.try_acquire(tokens)
+        if start is None:
+            return None
+        # Held until both requests finish, so the loser keeps counting against
+        # the limit; duplicates don't feed the limiter's latency samples
+        return lambda: throttle.release(start, failed=True)
+
+    def _post(self, url, headers, payload, timeout, throttle, tokens):
+        post = lambda: self.session.post(url, headers=headers, json=payload, timeout=timeout)
+        hedge_after = self._hedge_after()
+        if hedge_after is None:
+            return post()
+        response, _ = hedged_call(post, hedge_after, admit=lambda: self._admit_hedge(throttle, tokens))
+        return response
+
+    async def _apost(self, url, headers, payload, timeout, throttle, tokens):
+        httpx = import_httpx()
+        connect, read = timeout
+        post = lambda: self.async_session.post(
+            url, headers=headers, json=payload,
+            timeout=httpx.Timeout(read, connect=connect, pool=None)
+        )
+        hedge_after = self._hedge_after()
+        if hedge_after is None:
+            return await post()
+        response, _ = await ahedged_call(post, hedge_after,
+                                         admit=lambda: self._admit_hedge(throttle, tokens))
+        return response
+
+    def _check_breaker(self):
+        if self.breaker is not None and not self.breaker.allow():
+            raise CircuitOpenError("ScaleDown API circuit breaker is open; request not sent")
+
+    def _record_outcome(self, start, failed):
+        if self.breaker is not None:
+            self.breaker.record(failed, time.monotonic() - start)
+
+    def _send(self, url, headers, payload, deadline=None):
+        """POST through the throttle, retrying 429/5xx and connection errors."""
+        throttle = self._get_throttle()
+        tokens = _estimate_request_tokens(payload)
+        attempt = 0
+        while True:
+            timeout = self._timeouts(deadline)
+            self._check_breaker()
+            start = throttle.acquire(tokens)
+            retry_after = None
+            # The slot goes back exactly once, also on cancellation
+            failed, throttled = True, False
+            try:
+                response = self._post(url, headers, payload, timeout, throttle, tokens)
+            except requests.exceptions.RequestException as e:
+                self._record_outcome(start, failed=True)
+                error = APIError(f"Connection failed: {str(e)}")
+            else:
+                _record_traffic(response)
+                self._record_outcome(start, failed=response.status_code >= 500)
+                failed = False
+                if response.status_code not in throttle.retry.retry_statuses:
+                    self._latencies.record(time.monotonic() - start)
+                    return response
+                throttled = response.status_code == 429
+                retry_after = parse_retry_after(response.headers.get("Retry-After"))
+                error = _status_error(response.status_code, retry_after)
+            finally:
+                throttle.release(start, throttled=throttled, failed=failed)
+
+            delay = throttle.retry.delay(attempt, retry_after)
+            if attempt >= throttle.retry.max_retries:
+                raise error
+            if deadline is not None and time.monotonic() + delay >= deadline:
+                raise DeadlineExceededError(f"Deadline exceeded while retrying: {error}") from error
+            throttle.record_retry()
+            time.sleep(delay)
+            attempt += 1
+
+    async def _asend(self, url, headers, payload, deadline=None):
+        httpx = import_httpx()
+        throttle = self._get_throttle()
+        tokens = _estimate_request_tokens(payload)
+        attempt = 0
+        while True:
+            timeout = self._timeouts(deadline)
+            self._check_breaker()
+            start = await throttle.aacquire(tokens)
+            retry_after = None
+            # The slot goes back exactly once, also on cancellation
+            failed, throttled = True, False
+            try:
+                response = await self._apost(url, headers, payload, timeout, throttle, tokens)
+            except httpx.HTTPError as e:
+                self._record_outcome(start, failed=True)
+                error = APIError(f"Connection failed: {str(e)}")
+            else:
+                _record_traffic(response)
+                self._record_outcome(start, failed=response.status_code >= 500)
+                failed = False
+                if response.status_code not in throttle.retry.retry_statuses:
+                    self._latencies.record(time.monotonic() - start)
+                    return response
+                throttled = response.status_code == 429
+                retry_after = parse_retry_after(response.headers.get("Retry-After"))
+                error = _status_error(response.status_code, retry_after)
+            finally:
+                throttle.release(start, throttled=throttled, failed=failed)
+
+            delay = throttle.retry.delay(attempt, retry_after)
+            if attempt >= throttle.retry.max_retries:
+                raise error
+            if deadline is not None and time.monotonic() + delay >= deadline:
+                raise DeadlineExceededError(f"Deadline exceeded while retrying: {error}") from error
+            throttle.record_retry()
+            await asyncio.sleep(delay)
+            attempt += 1
+
+    def _build_request(self, context, prompt, max_tokens=None, **kwargs):
         if not self.api_key:
             raise AuthenticationError("API key not found. Use scaledown.set_api_key() or pass api_key to constructor.")
 
@@ -71,36 +607,108 @@ class ScaleDownCompressor(BaseCompressor):
                 **kwargs
             }
         }
+        return f"{self.api_url}/compress/raw", headers, payload
 
+    def _parse_body(self, response) -> CompressedPrompt:
+        """Parse a successful response; a malformed body raises ``APIError``."""
         try:
-            full_url=f"{self.api_url}/compress/raw"
-            response = requests.post(
-                 full_url,
-                 headers=headers,
-                 json=payload
-            )
-            response.raise_for_status()
-            data = response.json()
-            
-            # Extract nested data 
-            results = data.get("results", {})
-            
-            # 1. Get content from 'results'
-            content = results.get("compressed_prompt", "")
-            
-            # 2. Map API keys to our internal Metrics names
-            prepared_metrics = {
-                "original_prompt_tokens": data.get("total_original_tokens", results.get("original_prompt_tokens", 0)),
-                "compressed_prompt_tokens": data.get("total_compressed_tokens", results.get("compressed_prompt_tokens", 0)),
-                "latency_ms": data.get("latency_ms", 0),
-                "model_used": data.get("model_used"),
-                "timestamp": data.get("request_metadata", {}).get("timestamp")
-            }
-            
-            return CompressedPrompt.from_api_response(
-                content=content, 
-                raw_response=prepared_metrics 
-            )
+            return self._parse_response(response.json())
+        except (ValueError, TypeError, KeyError, AttributeError) as e:
+            raise APIError(f"Invalid response from the ScaleDown API: {e}") from e
 
-        except requests.exceptions.RequestException as e:
-            raise APIError(f"Connection failed: {str(e)}")
+    def _parse_response(self, data) -> CompressedPrompt:
+        # Extract nested data
+        results = data.get("results", {})
+
+        # 1. Get content from 'results'
+        content = results.get("compressed_prompt", "")
+
+        # 2. Map API keys to our internal Metrics names
+        prepared_metrics = {
+            "original_prompt_tokens": data.get("total_original_tokens", results.get("original_prompt_tokens", 0)),
+            "compressed_prompt_tokens": data.get("total_compressed_tokens", results.get("compressed_prompt_tokens", 0)),
+            "latency_ms": data.get("latency_ms", 0),
+            "model_used": data.get("model_used"),
+            "timestamp": data.get("request_metadata", {}).get("timestamp")
+        }
+
+        return CompressedPrompt.from_api_response(
+            content=content,
+            raw_response=prepared_metrics
+        )
+
+    def _cache_lookup(self, payload):
+        """Return (key, cached result) for a request payload."""
+        if self.cache is None:
+            return None, None
+        # The payload holds context, prompt, model and every compression option
+        key = hash_key("compress", payload)
+        cached = self.cache.get(key)
+        if cached is not None:
+            cached = dataclasses.replace(cached, cached=True)
+        return key, cached
+
+    def _cache_store(self, key, result: CompressedPrompt) -> CompressedPrompt:
+        if key is not None:
+            self.cache.set(key, result)
+        return result
+
+    def cache_stats(self):
+        """Hit/miss/eviction counters of the result cache, if one is set."""
+        return self.cache.stats() if self.cache is not None else None
+
+    def coalesce_stats(self):
+        """Process-wide counters of calls that were coalesced into another in-flight call."""
+        return get_shared_singleflight().stats()
+
+    def breaker_stats(self):
+        """State and counters of the circuit breaker, if one is set."""
+        return self.breaker.stats() if self.breaker is not None else None
+
+    def pool_stats(self):
+        """Connection reuse counters of the underlying session pool."""
+        return self.session.stats()
+
+
+def _with_prompt(items, prompt):
+    if prompt is None:
+        return iter(items)
+    return ((context, prompt) for context in items)
+
+
+async def _awith_prompt(items, prompt):
+    async for item in items:
+        yield item if prompt is None else (item, prompt)
+
+
+async def _aenumerate(items):
+    i = 0
+    if hasattr(items, "__aiter__"):
+        async for item in items:
+            yield i, item
+            i += 1
+    else:
+        for item in items:
+            yield i, item
+            i += 1
+
+
+def _estimate_request_tokens(payload) -> int:
+    """Cheap token estimate (~4 characters per token) for rate limiting."""
+    return (len(payload.get("context") or "") + len(payload.get("prompt") or "")) // 4
+
+
+def _status_error(status_code, retry_after=None) -> APIError:
+    if status_code == 429:
+        return RateLimitError("Rate limited by ScaleDown API (HTTP 429)", retry_after=retry_after)
+    return APIError(f"ScaleDown API error (HTTP {status_code})")
+
+
+def _record_traffic(response) -> None:
+    """Attribute the request and response body sizes to the current trace span."""
+    request = getattr(response, "request", None)
+    body = getattr(request, "body", None)
+    if body is None:
+        # httpx requests keep the encoded body in ``content``
+        body = getattr(request, "content", b"")
+    record_bytes(sent=len(body or b""), received=len(response.content or b""))
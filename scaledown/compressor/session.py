@@ -0,0 +1,165 @@
+"""
+Pooled keep-alive HTTP sessions for the ScaleDown API.
+"""
+import asyncio
+import threading
+import weakref
+from dataclasses import dataclass
+from typing import Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+
+DEFAULT_POOL_SIZE = 5
+
+
+@dataclass
+class PoolStats:
+    """Connection reuse counters for a SessionPool."""
+    requests: int
+    connections: int
+
+    @property
+    def hits(self) -> int:
+        """Requests served on an already-open connection."""
+        return max(self.requests - self.connections, 0)
+
+    @property
+    def misses(self) -> int:
+        """Requests that had to open a new connection."""
+        return self.connections
+
+    @property
+    def hit_rate(self) -> float:
+        if self.requests == 0: return 0.0
+        return self.hits / self.requests
+
+
+class SessionPool:
+    """
+    Thread-safe keep-alive session with a bounded connection pool.
+
+    A single instance can be shared by several compressors so that they
+    reuse the same TCP/TLS connections.
+
+    Parameters
+    ----------
+    pool_size : int, default=5
+        Maximum number of connections kept open per host. Should match
+        the batch concurrency of the compressors using the pool.
+    max_hosts : int, default=4
+        Number of distinct hosts to keep connection pools for.
+    """
+
+    def __init__(self, pool_size: int = DEFAULT_POOL_SIZE, max_hosts: int = 4):
+        if pool_size < 1:
+            raise ValueError("pool_size must be at least 1")
+        self.pool_size = pool_size
+        self._adapter = HTTPAdapter(pool_connections=max_hosts, pool_maxsize=pool_size)
+        self._session = requests.Session()
+        self._session.mount("https://", self._adapter)
+        self._session.mount("http://", self._adapter)
+
+    def post(self, url: str, **kwargs) -> requests.Response:
+        """Send a POST request over a pooled connection."""
+        return self._session.post(url, **kwargs)
+
+    def warmup(self, url: str, timeout: Optional[float] = None) -> None:
+        """Open a pooled connection to ``url``'s host so the first POST skips the TCP/TLS handshake."""
+        self._session.head(url, timeout=timeout).close()
+
+    def stats(self) -> PoolStats:
+        """Aggregate request/connection counters over all host pools."""
+        pools = self._adapter.poolmanager.pools
+        total_requests, total_connections = 0, 0
+        for key in list(pools.keys()):
+            pool = pools.get(key)
+            if pool is None:
+                continue
+            total_requests += pool.num_requests
+            total_connections += pool.num_connections
+        return PoolStats(requests=total_requests, connections=total_connections)
+
+    def close(self) -> None:
+        """Close all pooled connections."""
+        self._session.close()
+
+    def __repr__(self) -> str:
+        return f"SessionPool(pool_size={self.pool_size})"
+
+
+def import_httpx():
+    """Import httpx, which is only needed for the async API."""
+    try:
+        import httpx
+    except ImportError as e:
+        raise ImportError(
+            "Async compression requires 'httpx'. Install with `pip install scaledown[async]`"
+        ) from e
+    return httpx
+
+
+class AsyncSessionPool:
+    """
+    Keep-alive ``httpx.AsyncClient`` pool for the asyncio API.
+
+    Async clients are bound to the event loop they were created on, so one
+    client is kept per running loop and reused by every call made on it.
+    Close it with ``aclose`` on that loop before the loop ends.
+
+    Parameters
+    ----------
+    pool_size : int, default=5
+        Maximum number of open connections per event loop.
+    """
+
+    def __init__(self, pool_size: int = DEFAULT_POOL_SIZE):
+        if pool_size < 1:
+            raise ValueError("pool_size must be at least 1")
+        self.pool_size = pool_size
+        self._clients = weakref.WeakKeyDictionary()
+
+    def _client(self):
+        httpx = import_httpx()
+        loop = asyncio.get_running_loop()
+        client = self._clients.get(loop)
+        if client is None:
+            client = httpx.AsyncClient(
+                limits=httpx.Limits(
+                    max_connections=self.pool_size,
+                    max_keepalive_connections=self.pool_size,
+                ),
+                timeout=None,
+            )
+            self._clients[loop] = client
+        return client
+
+    async def post(self, url: str, **kwargs):
+        """Send a POST request over the current loop's pooled client."""
+        return await self._client().post(url, **kwargs)
+
+    async def aclose(self) -> None:
+        """Close the client bound to the running event loop."""
+        client = self._clients.pop(asyncio.get_running_loop(), None)
+        if client is not None:
+            await client.aclose()
+
+    def __repr__(self) -> str:
+        return f"AsyncSessionPool(pool_size={self.pool_size})"
+
+
+_shared_pool: Optional[SessionPool] = None
+_shared_lock = threading.Lock()
+
+
+def get_shared_pool(pool_size: int = DEFAULT_POOL_SIZE) -> SessionPool:
+    """
+    Return the process-wide SessionPool, creating it on first use.
+
+    ``pool_size`` only applies when the pool is first created.
+    """
+    global _shared_pool
+    with _shared_lock:
+        if _shared_pool is None:
+            _shared_pool = SessionPool(pool_size=pool_size)
+        return _shared_pool
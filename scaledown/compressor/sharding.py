@@ -0,0 +1,181 @@
+"""
+Structure-aware sharding of oversized contexts.
+
+A context is cut into paragraphs and fenced code blocks, which are packed
+into shards of at most ``max_shard_tokens`` tokens. Blocks that are too
+large on their own are split by lines, and lines by token slices.
+Concatenating the shard texts always gives back the original context.
+"""
+from dataclasses import dataclass
+from typing import List, Optional, Tuple
+
+from ..types import CompressedPrompt
+from ..types.metrics import get_encoding
+
+
+@dataclass
+class Shard:
+    text: str
+    tokens: int
+
+
+def _blocks(text: str) -> List[str]:
+    """Split text into paragraphs and fenced code blocks (lossless)."""
+    blocks: List[str] = []
+    current: List[str] = []
+    fence: Optional[str] = None
+
+    for line in text.splitlines(keepends=True):
+        stripped = line.lstrip()
+        if fence is not None:
+            current.append(line)
+            if stripped.startswith(fence):
+                blocks.append("".join(current))
+                current, fence = [], None
+            continue
+        if stripped.startswith("```") or stripped.startswith("~~~"):
+            if current:
+                blocks.append("".join(current))
+            current, fence = [line], stripped[:3]
+            continue
+        current.append(line)
+        # A blank line closes the paragraph it follows
+        if not line.strip():
+            blocks.append("".join(current))
+            current = []
+
+    if current:
+        blocks.append("".join(current))
+    return blocks
+
+
+def _split_by_tokens(text: str, max_tokens: int, encoding) -> List[Tuple[str, int]]:
+    ids = encoding.encode(text, disallowed_special=())
+    pieces: List[Tuple[str, int]] = []
+    carry = b""
+    for i in range(0, len(ids), max_tokens):
+        window = ids[i:i + max_tokens]
+        chunk = carry + encoding.decode_bytes(window)
+        try:
+            piece, carry = chunk.decode("utf-8"), b""
+        except UnicodeDecodeError as e:
+            # Keep a multi-byte character cut at the slice boundary for the next piece
+            piece, carry = chunk[:e.start].decode("utf-8"), chunk[e.start:]
+        pieces.append((piece, len(window)))
+    if carry:
+        piece, n = pieces[-1]
+        pieces[-1] = (piece + carry.decode("utf-8", errors="replace"), n)
+    return pieces
+
+
+def _split_oversized(block: str, max_tokens: int, encoding) -> List[Tuple[str, int]]:
+    pieces: List[Tuple[str, int]] = []
+    for line in block.splitlines(keepends=True):
+        n = len(encoding.encode(line, disallowed_special=()))
+        if n <= max_tokens:
+            pieces.append((line, n))
+        else:
+            pieces.extend(_split_by_tokens(line, max_tokens, encoding))
+    return pieces
+
+
+def split_context(text: str, max_shard_tokens: int, model: str = "gpt-4o") -> List[Shard]:
+    """
+    Split ``text`` into shards of at most ``max_shard_tokens`` tokens.
+
+    Shard token counts are the sum of their blocks' counts, which can differ
+    by a few tokens from tokenizing the joined shard in one pass.
+    """
+    if max_shard_tokens < 1:
+        raise ValueError("max_shard_tokens must be at least 1")
+
+    encoding = get_encoding(model)
+    shards: List[Shard] = []
+    current: List[str] = []
+    current_tokens = 0
+
+    for block in _blocks(text):
+        n = len(encoding.encode(block, disallowed_special=()))
+        pieces = [(block, n)] if n <= max_shard_tokens else _split_oversized(block, max_shard_tokens, encoding)
+        for piece, piece_tokens in pieces:
+            if current and current_tokens + piece_tokens > max_shard_tokens:
+                shards.append(Shard("".join(current), current_tokens))
+                current, current_tokens = [], 0
+            current.append(piece)
+            current_tokens += piece_tokens
+
+    if current or not shards:
+        shards.append(Shard("".join(current), current_tokens))
+    return shards
+
+
+def allocate_budgets(shard_tokens: List[int], total: int) -> List[int]:
+    """
+    Split a ``total`` token budget across shards in proportion to their size.
+
+    Uses largest-remainder rounding, so the budgets always sum to ``total``,
+    and every shard gets at least one token. Raises ``ValueError`` if
+    ``total`` is smaller than the number of shards (see ``merge_shards``).
+    """
+    n = len(shard_tokens)
+    if n == 0:
+        return []
+    if total < n:
+        raise ValueError(f"A budget of {total} tokens cannot give each of {n} shards a token")
+    weight = sum(shard_tokens)
+    raw = [total * t / weight for t in shard_tokens] if weight else [total / n] * n
+    budgets = [int(r) for r in raw]
+
+    remainder = total - sum(budgets)
+    by_fraction = sorted(range(n), key=lambda i: raw[i] - budgets[i], reverse=True)
+    for i in by_fraction[:remainder]:
+        budgets[i] += 1
+
+    for i in range(n):
+        if budgets[i] == 0:
+            donor = max(range(n), key=lambda j: budgets[j])
+            budgets[donor] -= 1
+            budgets[i] += 1
+    return budgets
+
+
+def merge_shards(shards: List[Shard], count: int) -> List[Shard]:
+    """
+    Merge adjacent shards into at most ``count`` shards of similar sizes.
+
+    Used when a token budget is too small to give every shard a token;
+    merged shards can exceed the size the context was split at.
+    """
+    if count < 1:
+        raise ValueError("count must be at least 1")
+    if len(shards) <= count:
+        return shards
+    size, extra = divmod(len(shards), count)
+    merged: List[Shard] = []
+    start = 0
+    for i in range(count):
+        group = shards[start:start + size + (i < extra)]
+        start += len(group)
+        merged.append(Shard("".join(s.text for s in group), sum(s.tokens for s in group)))
+    return merged
+
+
+def combine_results(results: List[CompressedPrompt], separator: str = "\n\n") -> CompressedPrompt:
+    """
+    Reassemble per-shard results, in shard order, into one CompressedPrompt.
+
+    Token counts are summed. Latency is the slowest shard (the critical
+    path), since shards are compressed in parallel.
+    """
+    return CompressedPrompt(
+        content=separator.join(r.content for r in results),
+        original_prompt="",
+        tokens=(
+            sum(r.tokens[0] for r in results),
+            sum(r.tokens[1] for r in results),
+        ),
+        latency=max((r.latency for r in results), default=0.0),
+        model=results[0].model if results else "unknown",
+        cached=bool(results) and all(r.cached for r in results),
+        passthrough=any(r.passthrough for r in results),
+    )
@@ -0,0 +1,156 @@
+"""
+Single-flight de-duplication of identical in-flight requests.
+"""
+import asyncio
+import threading
+import time
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+from ..exceptions import DeadlineExceededError
+
+
+@dataclass
+class SingleFlightStats:
+    """Counters for a SingleFlight group."""
+    calls: int = 0
+    executions: int = 0
+    coalesced: int = 0
+
+    @property
+    def coalesce_rate(self) -> float:
+        if self.calls == 0: return 0.0
+        return self.coalesced / self.calls
+
+
+class SingleFlight:
+    """
+    Run at most one call per key at a time; concurrent callers share its result.
+
+    The first caller for a key (the leader) executes the function. Callers
+    arriving while it runs wait for the leader and receive the same result
+    or exception. Threaded (``do``) and asyncio (``ado``) callers use the same
+    in-flight table, so they coalesce with each other too.
+
+    Followers wait no longer than their own ``deadline``. If the leader is
+    cancelled or interrupted (rather than failing), its call is abandoned:
+    the in-flight entry is cleared and one waiting follower becomes the new
+    leader, so the cancellation never reaches unrelated callers.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls: Dict[str, Future] = {}
+        self._stats = SingleFlightStats()
+
+    def _join(self, key: str, retry: bool = False) -> Tuple[Future, bool]:
+        with self._lock:
+            if not retry:
+                self._stats.calls += 1
+            future = self._calls.get(key)
+            if future is not None:
+                if not retry:
+                    self._stats.coalesced += 1
+                return future, False
+            future = Future()
+            self._calls[key] = future
+            self._stats.executions += 1
+            return future, True
+
+    def _finish(self, key: str, future: Future) -> None:
+        with self._lock:
+            # A new leader may already own the key if this call was abandoned
+            if self._calls.get(key) is future:
+                del self._calls[key]
+
+    def _abandon(self, key: str, future: Future) -> None:
+        self._finish(key, future)
+        future.set_exception(_Abandoned())
+
+    def do(self, key: str, fn: Callable[[], Any], deadline: Optional[float] = None) -> Tuple[Any, bool]:
+        """
+        Call ``fn`` unless a call for ``key`` is already running.
+
+        Returns ``(result, shared)``; ``shared`` is True for callers that
+        received the result of another caller's execution. ``deadline`` (a
+        ``time.monotonic()`` timestamp) bounds the wait for another
+        caller's execution; ``DeadlineExceededError`` is raised when it
+        passes.
+        """
+        future, leader = self._join(key)
+        while not leader:
+            try:
+                return future.result(timeout=_remaining(deadline)), True
+            except FutureTimeoutError:
+                raise DeadlineExceededError("Deadline exceeded waiting for an identical in-flight request")
+            except _Abandoned:
+                future, leader = self._join(key, retry=True)
+        try:
+            result = fn()
+        except Exception as e:
+            future.set_exception(e)
+            raise
+        except BaseException:
+            self._abandon(key, future)
+            raise
+        else:
+            future.set_result(result)
+            return result, False
+        finally:
+            self._finish(key, future)
+
+    async def ado(self, key: str, fn: Callable[[], Awaitable[Any]],
+                  deadline: Optional[float] = None) -> Tuple[Any, bool]:
+        """Asynchronous version of ``do``; ``fn`` returns an awaitable."""
+        future, leader = self._join(key)
+        while not leader:
+            try:
+                # shield so that a cancelled follower does not cancel the shared call
+                waiter = asyncio.shield(asyncio.wrap_future(future))
+                return await asyncio.wait_for(waiter, _remaining(deadline)), True
+            except asyncio.TimeoutError:
+                raise DeadlineExceededError("Deadline exceeded waiting for an identical in-flight request")
+            except _Abandoned:
+                future, leader = self._join(key, retry=True)
+        try:
+            result = await fn()
+        except Exception as e:
+            future.set_exception(e)
+            raise
+        except BaseException:
+            # Cancelled (e.g. a losing hedge or a closed stream): hand the call over
+            self._abandon(key, future)
+            raise
+        else:
+            future.set_result(result)
+            return result, False
+        finally:
+            self._finish(key, future)
+
+    def stats(self) -> SingleFlightStats:
+        with self._lock:
+            return SingleFlightStats(**vars(self._stats))
+
+
+class _Abandoned(Exception):
+    """Set on a call whose leader was cancelled; followers retry."""
+
+
+def _remaining(deadline: Optional[float]) -> Optional[float]:
+    if deadline is None:
+        return None
+    return max(deadline - time.monotonic(), 0.0)
+
+
+_shared_group: Optional[SingleFlight] = None
+_shared_lock = threading.Lock()
+
+
+def get_shared_singleflight() -> SingleFlight:
+    """Return the process-wide SingleFlight group used by compressors."""
+    global _shared_group
+    with _shared_lock:
+        if _shared_group is None:
+            _shared_group = SingleFlight()
+        return _shared_group
@@ -0,0 +1,340 @@
+"""
+Client-side flow control for the ScaleDown API.
+
+A ``Throttle`` combines:
+
+- an AIMD ``AdaptiveConcurrencyLimiter`` that grows the number of in-flight
+  requests while calls succeed and halves it on HTTP 429 or latency spikes,
+- ``TokenBucket`` limits on requests/sec and tokens/sec,
+- a ``RetryPolicy`` with jittered exponential backoff that honors
+  ``Retry-After``.
+
+By default every ``ScaleDownCompressor`` in the process shares the same
+``Throttle`` (see ``get_shared_throttle``).
+"""
+import asyncio
+import random
+import statistics
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass
+from email.utils import parsedate_to_datetime
+from typing import Optional, Tuple
+
+
+class TokenBucket:
+    """
+    Token bucket refilled at ``rate`` units per second.
+
+    ``reserve`` debits the bucket immediately (possibly into debt) and
+    returns how long the caller has to wait, so the same bucket serves
+    threaded and asyncio callers.
+
+    Parameters
+    ----------
+    rate : float
+        Refill rate in units per second.
+    capacity : float, optional
+        Maximum burst size. Defaults to one second worth of ``rate``.
+    """
+
+    def __init__(self, rate: float, capacity: Optional[float] = None):
+        if rate <= 0:
+            raise ValueError("rate must be positive")
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else rate
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def reserve(self, amount: float = 1.0) -> float:
+        """Take ``amount`` units and return the seconds to wait before using them."""
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            self._tokens -= amount
+            if self._tokens >= 0:
+                return 0.0
+            return -self._tokens / self.rate
+
+    def try_take(self, amount: float = 1.0) -> bool:
+        """Take ``amount`` units only if they are available now."""
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            if self._tokens < amount:
+                return False
+            self._tokens -= amount
+            return True
+
+    def refund(self, amount: float = 1.0) -> None:
+        """Return units taken by ``try_take`` that went unused."""
+        with self._lock:
+            self._tokens = min(self.capacity, self._tokens + amount)
+
+    def acquire(self, amount: float = 1.0) -> None:
+        delay = self.reserve(amount)
+        if delay > 0:
+            time.sleep(delay)
+
+    async def aacquire(self, amount: float = 1.0) -> None:
+        delay = self.reserve(amount)
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+
+class AdaptiveConcurrencyLimiter:
+    """
+    Additive-increase / multiplicative-decrease limit on in-flight requests.
+
+    Every successful call raises the limit by ``1 / limit`` (about +1 per
+    round of requests). A throttled call (HTTP 429), or one slower than
+    ``latency_tolerance`` times the recent median latency, multiplies it by
+    ``backoff_ratio``. Only one decrease is applied per congestion event.
+
+    Parameters
+    ----------
+    initial_limit : int, default=5
+    min_limit : int, default=1
+    max_limit : int, default=64
+    latency_tolerance : float, optional, default=3.0
+        Latency multiple over the recent median that counts as congestion.
+        ``None`` reacts to 429s only.
+    backoff_ratio : float, default=0.5
+    """
+
+    def __init__(self, initial_limit: int = 5, min_limit: int = 1, max_limit: int = 64,
+                 latency_tolerance: Optional[float] = 3.0, backoff_ratio: float = 0.5,
+                 window: int = 100):
+        if not min_limit <= initial_limit <= max_limit:
+            raise ValueError("initial_limit must be between min_limit and max_limit")
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.latency_tolerance = latency_tolerance
+        self.backoff_ratio = backoff_ratio
+        self._limit = float(initial_limit)
+        self._in_flight = 0
+        self._latencies = deque(maxlen=window)
+        self._last_decrease = 0.0
+        self._cond = threading.Condition()
+
+    @property
+    def limit(self) -> int:
+        return max(int(self._limit), self.min_limit)
+
+    @property
+    def in_flight(self) -> int:
+        return self._in_flight
+
+    def try_acquire(self) -> bool:
+        with self._cond:
+            if self._in_flight < self.limit:
+                self._in_flight += 1
+                return True
+            return False
+
+    def acquire(self) -> None:
+        with self._cond:
+            while self._in_flight >= self.limit:
+                self._cond.wait()
+            self._in_flight += 1
+
+    async def aacquire(self) -> None:
+        # The limiter is shared with threads, so poll instead of blocking the loop
+        delay = 0.001
+        while not self.try_acquire():
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, 0.05)
+
+    def release(self, start: float, throttled: bool = False, failed: bool = False) -> None:
+        """
+        Return a slot taken at ``start`` (``time.monotonic()``) and adapt the limit.
+
+        ``failed`` calls (connection errors) free the slot without
+        counting as a latency sample.
+        """
+        latency = time.monotonic() - start
+        with self._cond:
+            self._in_flight -= 1
+            if throttled or (not failed and self._is_slow(latency)):
+                if start >= self._last_decrease:
+                    self._limit = max(self.min_limit, self._limit * self.backoff_ratio)
+                    self._last_decrease = time.monotonic()
+            elif not failed:
+                self._limit = min(self.max_limit, self._limit + 1.0 / self._limit)
+            if not failed and not throttled:
+                self._latencies.append(latency)
+            self._cond.notify_all()
+
+    def _is_slow(self, latency: float) -> bool:
+        if self.latency_tolerance is None or len(self._latencies) < 10:
+            return False
+        return latency > self.latency_tolerance * statistics.median(self._latencies)
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """Parse a ``Retry-After`` header (delta-seconds or HTTP-date) into seconds."""
+    if not value:
+        return None
+    try:
+        return max(float(value), 0.0)
+    except ValueError:
+        pass
+    try:
+        return max(parsedate_to_datetime(value).timestamp() - time.time(), 0.0)
+    except (TypeError, ValueError):
+        return None
+
+
+@dataclass
+class RetryPolicy:
+    """
+    Jittered exponential backoff.
+
+    Attempt ``n`` waits a random time in ``[0, min(max_delay, base_delay * 2**n)]``
+    ("full jitter"), unless the server sent ``Retry-After``, which is honored.
+    """
+    max_retries: int = 3
+    base_delay: float = 0.5
+    max_delay: float = 30.0
+    retry_statuses: Tuple[int, ...] = (429, 500, 502, 503, 504)
+
+    def delay(self, attempt: int, retry_after: Optional[float] = None) -> float:
+        if retry_after is not None:
+            return retry_after
+        return random.uniform(0, min(self.max_delay, self.base_delay * (2 ** attempt)))
+
+
+@dataclass
+class ThrottleStats:
+    """Current limit and counters of a Throttle."""
+    concurrency_limit: int
+    in_flight: int
+    requests: int = 0
+    retries: int = 0
+    throttled: int = 0
+
+
+class Throttle:
+    """
+    Concurrency limiter, rate limits and retry policy applied to every request.
+
+    Parameters
+    ----------
+    initial_concurrency : int, default=5
+    min_concurrency : int, default=1
+    max_concurrency : int, default=64
+    adaptive : bool, default=True
+        If False, the concurrency limit stays at ``initial_concurrency``.
+    requests_per_second : float, optional
+    tokens_per_second : float, optional
+        Budget on estimated request tokens (context + prompt) per second.
+    retry : RetryPolicy, optional
+    """
+
+    def __init__(self, initial_concurrency: int = 5, min_concurrency: int = 1,
+                 max_concurrency: int = 64, adaptive: bool = True,
+                 requests_per_second: Optional[float] = None,
+                 tokens_per_second: Optional[float] = None,
+                 retry: Optional[RetryPolicy] = None):
+        if not adaptive:
+            min_concurrency = max_concurrency = initial_concurrency
+        self.limiter = AdaptiveConcurrencyLimiter(
+            initial_limit=initial_concurrency,
+            min_limit=min_concurrency,
+            max_limit=max_concurrency,
+        )
+        self.request_bucket = TokenBucket(requests_per_second) if requests_per_second else None
+        self.token_bucket = TokenBucket(tokens_per_second) if tokens_per_second else None
+        self.retry = retry or RetryPolicy()
+        self._stats = ThrottleStats(concurrency_limit=0, in_flight=0)
+        self._lock = threading.Lock()
+
+    def acquire(self, tokens: int = 0) -> float:
+        """Wait for rate budget and a concurrency slot; return the slot start time."""
+        if self.request_bucket is not None:
+            self.request_bucket.acquire()
+        if self.token_bucket is not None and tokens:
+            self.token_bucket.acquire(tokens)
+        self.limiter.acquire()
+        return time.monotonic()
+
+    def try_acquire(self, tokens: int = 0) -> Optional[float]:
+        """
+        Take rate budget and a concurrency slot only if both are available
+        without waiting; return the slot start time, or None.
+        """
+        if self.request_bucket is not None and not self.request_bucket.try_take():
+            return None
+        if self.token_bucket is not None and tokens and not self.token_bucket.try_take(tokens):
+            if self.request_bucket is not None:
+                self.request_bucket.refund()
+            return None
+        if not self.limiter.try_acquire():
+            if self.request_bucket is not None:
+                self.request_bucket.refund()
+            if self.token_bucket is not None and tokens:
+                self.token_bucket.refund(tokens)
+            return None
+        return time.monotonic()
+
+    async def aacquire(self, tokens: int = 0) -> float:
+        if self.request_bucket is not None:
+            await self.request_bucket.aacquire()
+        if self.token_bucket is not None and tokens:
+            await self.token_bucket.aacquire(tokens)
+        await self.limiter.aacquire()
+        return time.monotonic()
+
+    def release(self, start: float, throttled: bool = False, failed: bool = False) -> None:
+        self.limiter.release(start, throttled=throttled, failed=failed)
+        with self._lock:
+            self._stats.requests += 1
+            if throttled:
+                self._stats.throttled += 1
+
+    def record_retry(self) -> None:
+        with self._lock:
+            self._stats.retries += 1
+
+    def stats(self) -> ThrottleStats:
+        with self._lock:
+            return ThrottleStats(
+                concurrency_limit=self.limiter.limit,
+                in_flight=self.limiter.in_flight,
+                requests=self._stats.requests,
+                retries=self._stats.retries,
+                throttled=self._stats.throttled,
+            )
+
+    def __repr__(self) -> str:
+        return f"Throttle(concurrency_limit={self.limiter.limit})"
+
+
+_shared_throttle: Optional[Throttle] = None
+_shared_lock = threading.Lock()
+
+
+def get_shared_throttle() -> Throttle:
+    """Return the process-wide Throttle, creating it with defaults on first use."""
+    global _shared_throttle
+    with _shared_lock:
+        if _shared_throttle is None:
+            _shared_throttle = Throttle()
+        return _shared_throttle
+
+
+def configure_throttle(**kwargs) -> Throttle:
+    """
+    Replace the process-wide Throttle.
+
+    Accepts the same parameters as ``Throttle``. Compressors without an
+    explicit ``throttle`` pick up the new instance on their next request.
+    """
+    global _shared_throttle
+    with _shared_lock:
+        _shared_throttle = Throttle(**kwargs)
+        return _shared_throttle
@@ -1,8 +1,12 @@
+import multiprocessing
 import os
 from typing import Optional
 
+METRICS_MODES = ("exact", "estimate", "off")
+
 # Global configuration state
 _API_KEY: Optional[str] = os.environ.get("SCALEDOWN_API_KEY")
+_METRICS_MODE: str = os.environ.get("SCALEDOWN_METRICS_MODE", "exact")
 
 def set_api_key(api_key: Optional[str]) -> None:
     """Sets the global API key for ScaleDown."""
@@ -12,3 +16,26 @@ def set_api_key(api_key: Optional[str]) -> None:
 def get_api_key() -> Optional[str] :
     """Retrieves the global API key."""
     return _API_KEY
+
+
+def _validate_metrics_mode(mode: str) -> str:
+    if mode not in METRICS_MODES:
+        raise ValueError(f"metrics mode must be one of {METRICS_MODES}, got {mode!r}")
+    return mode
+
+def set_metrics_mode(mode: str) -> None:
+    """
+    Sets how token metrics are computed: 'exact' (tiktoken), 'estimate'
+    (fast approximate counts) or 'off' (counts reported as 0).
+    """
+    global _METRICS_MODE
+    _METRICS_MODE = _validate_metrics_mode(mode)
+
+def get_metrics_mode() -> str:
+    """Retrieves the global metrics mode."""
+    return _METRICS_MODE
+
+
+def _default_start_method() -> str:
+    # fork can deadlock once the parent runs threads (HTTP pools, loaded models)
+    return "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
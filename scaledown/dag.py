@@ -0,0 +1,448 @@
+"""
+DAG pipelines: run independent steps concurrently and merge their outputs.
+"""
+import asyncio
+import contextvars
+import inspect
+import multiprocessing
+import re
+import time
+from collections import deque
+from contextlib import nullcontext
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor, wait, FIRST_COMPLETED
+from dataclasses import dataclass
+from typing import Any, Deque, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple, Union
+
+from scaledown.config import _default_start_method
+from scaledown.optimizer.base import BaseOptimizer
+from scaledown.compressor.base import BaseCompressor
+from scaledown.pipeline import Pipeline, _add_trace_details, _broadcast, _with_deadline
+from scaledown.types import PipelineResult, StepMetadata
+from scaledown.types.metrics import current_metrics_mode, metrics_mode, token_count_scope
+
+
+@dataclass
+class Node:
+    """
+    One step of a DAGPipeline.
+
+    ``inputs`` names the upstream nodes whose outputs this node consumes;
+    an empty tuple means the pipeline input. Nodes with several inputs
+    must be callables that accept a list of strings (see ``MergeStep``).
+    """
+    name: str
+    component: Any
+    inputs: Tuple[str, ...] = ()
+
+
+class MergeStep:
+    """
+    Merge the outputs of several branches into one context.
+
+    Each input is split into blocks at blank lines. With ``dedupe=True``,
+    a block is dropped if it repeats, or is contained in, a block already
+    kept. Order follows the inputs, then the blocks within each input.
+
+    Parameters
+    ----------
+    separator : str, default="\\n\\n"
+        Inserted between kept blocks.
+    dedupe : bool, default=True
+    """
+
+    def __init__(self, separator: str = "\n\n", dedupe: bool = True):
+        self.separator = separator
+        self.dedupe = dedupe
+
+    def __call__(self, contexts: List[str], **kwargs) -> str:
+        kept: List[str] = []
+        for context in contexts:
+            for block in re.split(r"\n\s*\n", context):
+                block = block.strip("\n")
+                if not block.strip():
+                    continue
+                if self.dedupe and any(block.strip() in k for k in kept):
+                    continue
+                kept.append(block)
+        return self.separator.join(kept)
+
+    def __repr__(self) -> str:
+        return f"MergeStep(dedupe={self.dedupe})"
+
+
+class DAGPipeline(Pipeline):
+    """
+    Pipeline whose steps form a directed acyclic graph.
+
+    Nodes whose inputs are ready run concurrently, so the wall-clock time of
+    a run follows the critical path rather than the sum of the steps.
+
+    Example
+    -------
+    >>> from scaledown.dag import DAGPipeline, MergeStep
+    >>> pipe = DAGPipeline([
+    ...     ('haste', HasteOptimizer()),
+    ...     ('semantic', SemanticOptimizer()),
+    ...     ('merge', MergeStep(), ['haste', 'semantic']),
+    ...     ('compress', ScaleDownCompressor(), ['merge']),
+    ... ])
+    >>> result = pipe.run(code, query="training loop", file_path="train.py", prompt="Explain")
+
+    Parameters
+    ----------
+    nodes : list of Node or (name, component[, inputs]) tuples
+        Nodes without ``inputs`` read the pipeline input.
+    output : str, optional
+        Node whose output is the final result. Defaults to the only node
+        that no other node consumes.
+    max_workers : int, optional
+        Size of the worker pool.
+    executor : {'thread', 'process'}, default='thread'
+        Pool used for optimizers and custom steps. Process pools need
+        picklable components and results and suit CPU-bound steps; the
+        per-run token count memo is not shared with worker processes.
+    metrics_mode, cache, cache_steps, tracer, warmup
+        As for ``Pipeline``. With a process pool, node spans are not
+        recorded (spans cannot cross process boundaries).
+    """
+
+    def __init__(self, nodes: Sequence[Union[Node, tuple]], output: Optional[str] = None,
+                 max_workers: Optional[int] = None, executor: str = "thread",
+                 metrics_mode: Optional[str] = None, cache=None, cache_steps=None,
+                 tracer=None, warmup=False):
+        if executor not in ("thread", "process"):
+            raise ValueError("executor must be 'thread' or 'process'")
+        self.nodes = [n if isinstance(n, Node) else Node(n[0], n[1], tuple(n[2]) if len(n) > 2 else ())
+                      for n in nodes]
+        self.output = output
+        self.max_workers = max_workers
+        self.executor = executor
+        self._pool = None
+        super().__init__([(n.name, n.component) for n in self.nodes], metrics_mode=metrics_mode,
+                         cache=cache, cache_steps=cache_steps, tracer=tracer,
+                         warmup=warmup)
+
+    def _validate_steps(self):
+        """Validate node names, edges, acyclicity and the output node."""
+        if not self.nodes:
+            raise ValueError("Pipeline must have at least one step")
+
+        by_name: Dict[str, Node] = {}
+        for node in self.nodes:
+            if node.name in by_name:
+                raise ValueError(f"Duplicate node name '{node.name}'")
+            by_name[node.name] = node
+        for node in self.nodes:
+            for upstream in node.inputs:
+                if upstream not in by_name:
+                    raise ValueError(f"Node '{node.name}' depends on unknown node '{upstream}'")
+                if isinstance(node.component, BaseOptimizer) and isinstance(by_name[upstream].component, BaseCompressor):
+                    raise ValueError(
+                        f"Optimizer '{node.name}' cannot come after a compressor. "
+                        "Pipeline order must be: optimizers -> compressors"
+                    )
+            if len(node.inputs) > 1 and isinstance(node.component, (BaseOptimizer, BaseCompressor)):
+                raise ValueError(
+                    f"Node '{node.name}' has several inputs; add a merge step (e.g. MergeStep) before it"
+                )
+
+        self._order = self._topological_order(by_name)
+        sinks = [n.name for n in self.nodes if not any(n.name in m.inputs for m in self.nodes)]
+        if self.output is None:
+            if len(sinks) != 1:
+                raise ValueError(f"DAG has several final nodes {sinks}; pass output= to choose one")
+            self.output = sinks[0]
+        elif self.output not in by_name:
+            raise ValueError(f"Unknown output node '{self.output}'")
+
+    def _topological_order(self, by_name) -> List[str]:
+        pending = {name: set(node.inputs) for name, node in by_name.items()}
+        order: List[str] = []
+        while pending:
+            ready = [name for name, deps in pending.items() if not deps]
+            if not ready:
+                raise ValueError(f"DAG has a cycle through nodes {sorted(pending)}")
+            for name in ready:
+                order.append(name)
+                del pending[name]
+            for deps in pending.values():
+                deps.difference_update(ready)
+        return order
+
+    def run(self, context: str, timeout: Optional[float] = None, **kwargs) -> PipelineResult:
+        """
+        Run the DAG on ``context``; independent nodes run concurrently.
+
+        ``history`` holds one StepMetadata per node in topological order;
+        ``details`` records the node's ``inputs`` and its ``start_ms`` and
+        ``end_ms`` offsets within the run.
+        """
+        with metrics_mode(self.metrics_mode), token_count_scope(), self._span("pipeline.run") as trace:
+            run_start = time.perf_counter()
+            deadline = time.monotonic() + timeout if timeout is not None else None
+            outputs: Dict[str, str] = {}
+            history: Dict[str, StepMetadata] = {}
+            pending = {n.name: set(n.inputs) for n in self.nodes}
+            futures: Dict[Future, tuple] = {}
+
+            def submit(node: Node):
+                step_input = self._node_input(node, context, outputs)
+                key, cached = self._cache_lookup(node.name, node.component, step_input, kwargs)
+                span = None
+                if cached is not None:
+                    future = Future()
+                    future.set_result(cached)
+                else:
+                    step_kwargs = _with_deadline(node.name, node.component, deadline, kwargs)
+                    if self.tracer is not None and self.executor == "thread":
+                        span = self._step_span(node.name, node.component)
+                    future = self._submit(_call_node, node.component, step_input, step_kwargs, kwargs, span)
+                futures[future] = (node, step_input, key, cached is not None, time.perf_counter(), span)
+
+            try:
+                for node in self.nodes:
+                    if not node.inputs:
+                        del pending[node.name]
+                        submit(node)
+
+                while futures:
+                    done, _ = wait(futures, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        node, step_input, key, cache_hit, started, span = futures.pop(future)
+                        result = future.result()
+                        if not cache_hit:
+                            self._cache_store(key, result)
+                        outputs[node.name], history[node.name] = self._node_metadata(
+                            node, step_input, result, key, cache_hit,
+                            started - run_start, time.perf_counter() - run_start, span
+                        )
+                        for name, deps in list(pending.items()):
+                            deps.discard(node.name)
+                            if not deps:
+                                del pending[name]
+                                submit(self._node(name))
+            finally:
+                for future in futures:
+                    future.cancel()
+
+            pipeline_result = PipelineResult(
+                final_content=outputs[self.output],
+                original_content=context,
+                history=[history[name] for name in self._order if name in history],
+                metrics_mode=current_metrics_mode()
+            )
+        pipeline_result.trace = trace
+        return pipeline_result
+
+    async def arun(self, context: str, timeout: Optional[float] = None, **kwargs) -> PipelineResult:
+        """
+        Asynchronous version of ``run``.
+
+        Compressors are awaited through ``acompress`` and coroutine functions
+        directly; other steps run on the worker pool.
+        """
+        with metrics_mode(self.metrics_mode), token_count_scope(), self._span("pipeline.arun") as trace:
+            run_start = time.perf_counter()
+            deadline = time.monotonic() + timeout if timeout is not None else None
+            outputs: Dict[str, str] = {}
+            history: Dict[str, StepMetadata] = {}
+            pending = {n.name: set(n.inputs) for n in self.nodes}
+            tasks: Dict[asyncio.Future, tuple] = {}
+
+            def submit(node: Node):
+                step_input = self._node_input(node, context, outputs)
+                key, cached = self._cache_lookup(node.name, node.component, step_input, kwargs)
+                span = None
+                if cached is not None:
+                    task = asyncio.get_running_loop().create_future()
+                    task.set_result(cached)
+                else:
+                    step_kwargs = _with_deadline(node.name, node.component, deadline, kwargs)
+                    if self.tracer is not None:
+                        span = self._step_span(node.name, node.component)
+                    task = asyncio.ensure_future(
+                        self._acall_node(node.component, step_input, step_kwargs, kwargs, span)
+                    )
+                tasks[task] = (node, step_input, key, cached is not None, time.perf_counter(), span)
+
+            try:
+                for node in self.nodes:
+                    if not node.inputs:
+                        del pending[node.name]
+                        submit(node)
+
+                while tasks:
+                    done, _ = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+                    for task in done:
+                        node, step_input, key, cache_hit, started, span = tasks.pop(task)
+                        result = task.result()
+                        if not cache_hit:
+                            self._cache_store(key, result)
+                        outputs[node.name], history[node.name] = self._node_metadata(
+                            node, step_input, result, key, cache_hit,
+                            started - run_start, time.perf_counter() - run_start, span
+                        )
+                        for name, deps in list(pending.items()):
+                            deps.discard(node.name)
+                            if not deps:
+                                del pending[name]
+                                submit(self._node(name))
+            finally:
+                for task in tasks:
+                    task.cancel()
+
+            pipeline_result = PipelineResult(
+                final_content=outputs[self.output],
+                original_content=context,
+                history=[history[name] for name in self._order if name in history],
+                metrics_mode=current_metrics_mode()
+            )
+        pipeline_result.trace = trace
+        return pipeline_result
+
+    def run_batch(self, contexts: List[str], prompts=None, queries=None, file_paths=None,
+                  timeout: Optional[float] = None, **kwargs) -> List[PipelineResult]:
+        """
+        Run the DAG on each context in turn.
+
+        Results are in input order; a failed item has its exception in
+        ``PipelineResult.error``.
+        """
+        n = len(contexts)
+        item_args = {
+            "prompt": _broadcast(prompts, n, "prompts"),
+            "query": _broadcast(queries, n, "queries"),
+            "file_path": _broadcast(file_paths, n, "file_paths"),
+        }
+        results = []
+        for i, context in enumerate(contexts):
+            item_kwargs = dict(kwargs, **{k: v[i] for k, v in item_args.items() if v[i] is not None})
+            try:
+                results.append(self.run(context, timeout=timeout, **item_kwargs))
+            except Exception as e:
+                results.append(PipelineResult(final_content=context, original_content=context,
+                                              metrics_mode=current_metrics_mode(), error=e))
+        return results
+
+    def stream(self, items: Iterable[Union[str, dict]], workers: int = 4, queue_size: int = 32,
+               ordered: bool = True, timeout: Optional[float] = None, **kwargs) -> Iterator[PipelineResult]:
+        """
+        Run the DAG over a (possibly unbounded) stream of inputs.
+
+        Items run whole (``run`` per item) on ``workers`` threads, with at
+        most ``queue_size`` items admitted and not yet yielded, so memory
+        stays flat however long the stream is. Items are contexts or dicts
+        with a ``context`` key and per-item run arguments that override
+        ``kwargs``. ``ordered=False`` yields in completion order with
+        ``PipelineResult.index`` set. Failed items carry their exception in
+        ``PipelineResult.error``.
+        """
+        if workers < 1 or queue_size < 1:
+            raise ValueError("workers and queue_size must be at least 1")
+
+        def run_item(index, item):
+            if isinstance(item, dict):
+                item = dict(item)
+                context = item.pop("context")
+                item_kwargs = dict(kwargs, **item)
+            else:
+                context, item_kwargs = item, kwargs
+            try:
+                result = self.run(context, timeout=timeout, **item_kwargs)
+            except Exception as e:
+                with metrics_mode(self.metrics_mode):
+                    result = PipelineResult(final_content=context, original_content=context,
+                                            metrics_mode=current_metrics_mode(), error=e)
+            result.index = index
+            return result
+
+        pending: Deque[Future] = deque()
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="scaledown-dag-stream") as pool:
+            try:
+                for index, item in enumerate(items):
+                    if len(pending) >= queue_size:
+                        yield from self._drain(pending, ordered, until=queue_size - 1)
+                    pending.append(pool.submit(contextvars.copy_context().run, run_item, index, item))
+                yield from self._drain(pending, ordered, until=0)
+            finally:
+                for future in pending:
+                    future.cancel()
+
+    @staticmethod
+    def _drain(pending: "Deque[Future]", ordered: bool, until: int) -> Iterator[PipelineResult]:
+        """Yield finished results until at most ``until`` items are pending."""
+        while len(pending) > until:
+            if ordered:
+                yield pending.popleft().result()
+                continue
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                pending.remove(future)
+                yield future.result()
+
+    def close(self) -> None:
+        """Shut down the worker pool."""
+        if self._pool is not None:
+            self._pool.shutdown(wait=False)
+            self._pool = None
+
+    def _node(self, name: str) -> Node:
+        return next(n for n in self.nodes if n.name == name)
+
+    @staticmethod
+    def _node_input(node: Node, context: str, outputs: Dict[str, str]):
+        if not node.inputs:
+            return context
+        if len(node.inputs) == 1:
+            return outputs[node.inputs[0]]
+        return [outputs[name] for name in node.inputs]
+
+    def _node_metadata(self, node, step_input, result, key, cache_hit, start_s, end_s, span=None):
+        counted_input = "\n\n".join(step_input) if isinstance(step_input, list) else step_input
+        output, metadata = self._step_metadata(
+            node.name, node.component, counted_input, result, cache_hit=cache_hit if key else None
+        )
+        metadata.details["inputs"] = list(node.inputs)
+        metadata.details["start_ms"] = start_s * 1000
+        metadata.details["end_ms"] = end_s * 1000
+        _add_trace_details(metadata, span)
+        return output, metadata
+
+    def _get_pool(self):
+        if self._pool is None:
+            if self.executor == "process":
+                self._pool = ProcessPoolExecutor(
+                    max_workers=self.max_workers,
+                    mp_context=multiprocessing.get_context(_default_start_method()),
+                )
+            else:
+                self._pool = ThreadPoolExecutor(max_workers=self.max_workers or max(len(self.nodes), 1),
+                                                thread_name_prefix="scaledown-dag")
+        return self._pool
+
+    def _submit(self, fn, *args) -> Future:
+        pool = self._get_pool()
+        if self.executor == "thread":
+            # Carry the metrics mode and token memo of this run into the worker thread
+            return pool.submit(contextvars.copy_context().run, fn, *args)
+        return pool.submit(fn, *args)
+
+    async def _acall_node(self, component, step_input, step_kwargs, kwargs, span=None):
+        with span if span is not None else nullcontext():
+            if isinstance(component, BaseCompressor):
+                return await self._acall_step(component, step_input, step_kwargs, kwargs)
+            if inspect.iscoroutinefunction(component):
+                return await component(step_input, **kwargs)
+            return await asyncio.wrap_future(self._submit(_call_node, component, step_input, step_kwargs, kwargs))
+
+    def __repr__(self) -> str:
+        edges = {n.name: list(n.inputs) for n in self.nodes}
+        return f"DAGPipeline(nodes={edges})"
+
+
+def _call_node(component, step_input, step_kwargs, kwargs, span=None):
+    """Run one node; module-level so process pools can pickle it."""
+    with span if span is not None else nullcontext():
+        if isinstance(step_input, list):
+            return component(step_input, **kwargs)
+        return Pipeline._call_step(component, step_input, step_kwargs, kwargs)
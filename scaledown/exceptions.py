@@ -10,6 +10,20 @@ class APIError(ScaleDownError):
     """Raised when the ScaleDown API returns an error."""
     pass
 
+class RateLimitError(APIError):
+    """Raised when the ScaleDown API keeps rejecting requests with HTTP 429."""
+    def __init__(self, message, retry_after=None):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+class CircuitOpenError(APIError):
+    """Raised without contacting the API while the circuit breaker is open."""
+    pass
+
+class DeadlineExceededError(ScaleDownError, TimeoutError):
+    """Raised when a call or pipeline run exceeds its deadline."""
+    pass
+
 class OptimizerError(ScaleDownError):
     """Raised when an optimizer encounters an error."""
     pass
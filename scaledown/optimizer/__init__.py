@@ -1,9 +1,10 @@
 from typing import TYPE_CHECKING
 
 from .base import BaseOptimizer
+from .embeddings import LocalReranker
 
 # Define what to expose
-__all__ = ["BaseOptimizer", "HasteOptimizer", "SemanticOptimizer"]
+__all__ = ["BaseOptimizer", "HasteIndex", "HasteOptimizer", "LocalReranker", "SemanticOptimizer"]
 
 def __getattr__(name):
     if name == "HasteOptimizer":
@@ -15,6 +16,15 @@ def __getattr__(name):
                 "HasteOptimizer requires 'haste'. Install with `pip install scaledown[haste]`"
             ) from e
             
+    if name == "HasteIndex":
+        try:
+            from .haste_index import HasteIndex
+            return HasteIndex
+        except ImportError as e:
+            raise ImportError(
+                "HasteIndex requires 'haste'. Install with `pip install scaledown[haste]`"
+            ) from e
+
     if name == "SemanticOptimizer":
         try:
             from .semantic_code import SemanticOptimizer
@@ -28,4 +38,5 @@ def __getattr__(name):
 
 if TYPE_CHECKING:
     from .haste import HasteOptimizer
+    from .haste_index import HasteIndex
     from .semantic_code import SemanticOptimizer
@@ -1,6 +1,7 @@
 from abc import ABC, abstractmethod
 from typing import Union, List, Optional
 import scaledown
+from scaledown.types.metrics import current_metrics_mode, get_encoding
 
 class BaseOptimizer(ABC):
     """
@@ -52,6 +53,49 @@ class BaseOptimizer(ABC):
         """
         pass
     
+    def optimize_batch(
+        self,
+        contexts: List[str],
+        queries: Optional[List[Optional[str]]] = None,
+        file_paths: Optional[List[Optional[str]]] = None,
+        return_exceptions: bool = False,
+        **kwargs
+    ) -> list:
+        """
+        Optimize several contexts; returns one result per context, in order.
+
+        ``queries`` and ``file_paths`` are per-item; other keyword arguments
+        apply to every item. With ``return_exceptions=True``, an item that
+        fails yields its exception instead of aborting the batch. The default
+        implementation calls ``optimize`` per item; optimizers that can share
+        work across items (e.g. one embedding call) override it.
+        """
+        n = len(contexts)
+        queries = queries or [None] * n
+        file_paths = file_paths or [None] * n
+        if not len(queries) == len(file_paths) == n:
+            raise ValueError("queries and file_paths must have one entry per context.")
+
+        results = []
+        for context, query, file_path in zip(contexts, queries, file_paths):
+            try:
+                results.append(self.optimize(context=context, query=query, file_path=file_path, **kwargs))
+            except Exception as e:
+                if not return_exceptions:
+                    raise
+                results.append(e)
+        return results
+
+    def warmup(self) -> None:
+        """
+        Load heavy resources (models, parsers, tokenizers) ahead of the first call.
+
+        Called by ``Pipeline.warmup``. The default loads the tokenizer used
+        for token metrics; optimizers with more expensive setup extend it.
+        """
+        if current_metrics_mode() == "exact":
+            get_encoding(self.target_model)
+
     def update_config(self, **kwargs):
         """Update optimizer configuration."""
         self.config.update(kwargs)
@@ -0,0 +1,142 @@
+"""
+Local sentence-transformers embeddings shared by the optimizers.
+
+Models are loaded once per process and shared: ``SemanticOptimizer`` and
+``LocalReranker`` instances naming the same model use one copy of it.
+"""
+import hashlib
+import logging
+import threading
+from typing import Dict, List, Optional
+
+from ..cache import LRUCache
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_EMBEDDING_MODEL = "Qwen/Qwen3-Embedding-0.6B"
+
+_models: Dict[tuple, object] = {}
+_models_lock = threading.Lock()
+
+
+def load_sentence_transformer(model_name: str = DEFAULT_EMBEDDING_MODEL):
+    """
+    Return the process-wide ``SentenceTransformer`` for ``model_name``,
+    loading it on first use. Load errors propagate and are not cached.
+    """
+    try:
+        from sentence_transformers import SentenceTransformer
+    except ImportError as e:
+        raise ImportError(
+            "Local embeddings require 'sentence-transformers'. "
+            "Install with `pip install scaledown[semantic]`"
+        ) from e
+
+    # Keyed on the class too, so a replaced SentenceTransformer gets fresh instances
+    key = (SentenceTransformer, model_name)
+    with _models_lock:
+        model = _models.get(key)
+        if model is None:
+            logger.info(f"Loading embedding model: {model_name}...")
+            model = _models[key] = SentenceTransformer(model_name)
+        return model
+
+
+class LocalReranker:
+    """
+    Rerank HASTE candidates with a local sentence-transformers model.
+
+    Drop-in replacement for HASTE's OpenAI reranker: each candidate is
+    embedded from its qualified name, signature, docstring and the start of
+    its body, and its score becomes ``0.5 * bm25 + 0.5 * cosine``. All
+    candidates of a query are embedded in one batch together with the
+    query, and candidate embeddings are cached by content hash, so
+    repeated queries over the same code only embed the query.
+
+    Parameters
+    ----------
+    model_name : str, default='Qwen/Qwen3-Embedding-0.6B'
+        sentence-transformers model; the default is the one
+        ``SemanticOptimizer`` uses, so both share a loaded copy.
+    cache_bytes : int, default=64 MiB
+        Memory budget of the embedding cache (LRU).
+
+    Example
+    -------
+    >>> opt = HasteOptimizer(semantic=True, reranker=LocalReranker())
+    """
+
+    def __init__(self, model_name: str = DEFAULT_EMBEDDING_MODEL, cache_bytes: int = 64 * 2**20):
+        self.model_name = model_name
+        self.cache_bytes = cache_bytes
+        self._cache = LRUCache(max_entries=1_000_000, max_bytes=cache_bytes, sizeof=_nbytes)
+
+    def rerank(self, prelim: list, query: str, src_bytes: Optional[bytes] = None,
+               src_by_path: Optional[Dict[str, bytes]] = None) -> list:
+        """Rerank HASTE ``Doc`` candidates; same contract as ``haste.retriever.semantic_rerank``."""
+        if not prelim:
+            return []
+        import numpy as np
+        from haste.retriever import Doc
+
+        texts = [_doc_text(d, src_bytes, src_by_path) for d in prelim]
+        keys = [self._key(text) for text in texts]
+        vectors = [self._cache.get(key) for key in keys]
+        missing = [i for i, vector in enumerate(vectors) if vector is None]
+
+        # The query and every uncached candidate go through the model in one batch
+        encoded = self._encode([query] + [texts[i] for i in missing])
+        query_vector = encoded[0]
+        for row, i in enumerate(missing, start=1):
+            vectors[i] = encoded[row]
+            self._cache.set(keys[i], encoded[row])
+
+        similarities = np.stack(vectors) @ query_vector
+        out = [
+            Doc(**{**d.__dict__, "score": 0.5 * float(d.score or 0.0) + 0.5 * float(s)})
+            for d, s in zip(prelim, similarities)
+        ]
+        out.sort(key=lambda x: x.score or 0.0, reverse=True)
+        return out
+
+    def warmup(self) -> None:
+        """Load the model and run one encode."""
+        self._encode(["warmup"])
+
+    def cache_stats(self):
+        return self._cache.stats()
+
+    def _encode(self, texts: List[str]):
+        model = load_sentence_transformer(self.model_name)
+        # Unit vectors, so cosine similarity is a dot product
+        return model.encode(texts, normalize_embeddings=True, convert_to_numpy=True)
+
+    def _key(self, text: str) -> str:
+        return hashlib.sha256(f"{self.model_name}\0{text}".encode("utf-8")).hexdigest()
+
+    def __getstate__(self):
+        # Embeddings stay in the process that computed them
+        state = self.__dict__.copy()
+        del state["_cache"]
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._cache = LRUCache(max_entries=1_000_000, max_bytes=self.cache_bytes, sizeof=_nbytes)
+
+    def __repr__(self) -> str:
+        # Stable across instances: part of HASTE result cache keys
+        return f"LocalReranker(model_name={self.model_name!r})"
+
+
+def _doc_text(doc, src_bytes: Optional[bytes], src_by_path: Optional[Dict[str, bytes]]) -> str:
+    # Same candidate text as haste.retriever.semantic_rerank
+    body = src_by_path.get(doc.path) if src_by_path is not None else src_bytes
+    preview = ""
+    if body is not None:
+        preview = body[doc.start_byte:min(doc.end_byte, doc.start_byte + 1200)].decode("utf-8", "ignore")
+    return f"{doc.qname}\n{doc.signature}\n{doc.docstring}\n{preview}"
+
+
+def _nbytes(vector) -> int:
+    return vector.nbytes
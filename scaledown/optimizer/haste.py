@@ -2,21 +2,27 @@
 HASTE optimizer integration for scaledown.
 Uses the local HasteContext library for code context retrieval.
 """
-from typing import Union, List, Optional, Dict, Any
-import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Union, List, Optional, Dict, Any, Tuple
+import logging
+import multiprocessing
 import os
-import tempfile
-
-try:
-    from haste import select_from_file
-    HASTE_AVAILABLE = True
-except ImportError:
-    HASTE_AVAILABLE = False
+import threading
+import time
 
 from .base import BaseOptimizer
+from .embeddings import LocalReranker
+from .haste_index import HasteIndex
+from . import haste_source
+from .haste_source import (
+    HASTE_AVAILABLE, cached_select, content_hash, parse_source, select, select_from_source,
+)
+from ..config import _default_start_method
 from ..exceptions import OptimizerError
 from ..types import OptimizedContext, OptimizerMetrics
-from ..types.metrics import count_tokens
+from ..types.metrics import count_tokens_many, current_metrics_mode
+
+logger = logging.getLogger(__name__)
 
 
 class HasteOptimizer(BaseOptimizer):
@@ -37,13 +43,35 @@ class HasteOptimizer(BaseOptimizer):
     max_add : int, default=12
         Maximum nodes added during BFS expansion
     semantic : bool, default=False
-        Enable semantic reranking with OpenAI embeddings
+        Enable semantic reranking with OpenAI embeddings, or with
+        ``reranker`` when given
     sem_model : str, default='text-embedding-3-small'
         OpenAI embedding model for semantic search
     hard_cap : int, default=1200
         Hard token cap for output
     soft_cap : int, default=1800
         Soft token cap for output
+    index : HasteIndex, optional
+        Prebuilt repository index. When set, queries are answered from the
+        index (BFS expansion crosses file boundaries) and ``context`` and
+        ``file_path`` are ignored.
+    cache : bool, default=True
+        Reuse parsed sources and selection results across calls through
+        process-wide LRU caches keyed on the source content. Their hit
+        rates are reported in ``OptimizerMetrics``.
+    reranker : LocalReranker, optional
+        Local embedding reranker used in semantic mode instead of OpenAI,
+        so hybrid retrieval runs offline on CPU.
+    workers : int, optional
+        Processes used by ``optimize_batch``; defaults to ``os.cpu_count()``.
+        The pool is started on first use (or by ``warmup``) and kept until
+        ``close``. ``workers=1`` runs batches in the calling process, and so
+        does semantic mode with a ``reranker``, so its model is loaded once
+        and its embedding cache is shared.
+    mp_context : str, optional
+        Start method of the batch processes; defaults to ``'forkserver'``
+        where available, else ``'spawn'``. ``'fork'`` can deadlock once the
+        calling process runs threads (HTTP pools, loaded models).
     """
     
     def __init__(
@@ -57,14 +85,21 @@ class HasteOptimizer(BaseOptimizer):
         hard_cap: int = 1200,
         soft_cap: int = 1800,
         target_model: str = "gpt-4o",
+        index: Optional[HasteIndex] = None,
+        cache: bool = True,
+        reranker: Optional[LocalReranker] = None,
+        workers: Optional[int] = None,
+        mp_context: Optional[str] = None,
         **kwargs
     ):
         super().__init__(target_model=target_model, **kwargs)
         
         if not HASTE_AVAILABLE:
             raise ImportError(
-                "HASTE is not installed. Install with: pip install HasteContext>=0.2.1"
+                "HASTE is not installed. Install with `pip install scaledown[haste]`"
             )
+        if workers is not None and workers < 1:
+            raise ValueError("workers must be at least 1")
         
         self.top_k = top_k
         self.prefilter = prefilter
@@ -74,6 +109,13 @@ class HasteOptimizer(BaseOptimizer):
         self.sem_model = sem_model
         self.hard_cap = hard_cap
         self.soft_cap = soft_cap
+        self.index = index
+        self.cache = cache
+        self.reranker = reranker
+        self.workers = workers or os.cpu_count() or 1
+        self.mp_context = mp_context or _default_start_method()
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._pool_lock = threading.Lock()
     
     def optimize(
         self,
@@ -89,19 +131,22 @@ class HasteOptimizer(BaseOptimizer):
         Parameters
         ----------
         context : str or List[str]
-            Source code content (currently expects file path in file_path param)
+            Source code content; selected in memory, without temporary
+            files, when ``file_path`` is not given. A list is optimized as a
+            batch (see ``optimize_batch``) with the same query for every item
         query : str
             Query to guide context retrieval (e.g., "find training loop")
         max_tokens : int, optional
             Maximum token budget (uses hard_cap if not specified)
         file_path : str, optional
-            Path to Python file to analyze (required for HASTE)
+            Path to a Python file to analyze instead of ``context``; it is
+            read once
         **kwargs : dict
             Additional HASTE parameters
             
         Returns
         -------
-        OptimizedContext
+        OptimizedContext or List[OptimizedContext]
             Optimized context with relevant code and metrics
         """
         start_time = time.time()
@@ -112,80 +157,288 @@ class HasteOptimizer(BaseOptimizer):
         if max_tokens is None:
             max_tokens = kwargs.get("max_tokens")
 
+        if isinstance(context, list):
+            return self.optimize_batch(context, queries=[query] * len(context), max_tokens=max_tokens)
+
         if not query:
             raise ValueError("Query is required for HASTE optimization")
 
-        # 3. Handle string input without file_path by creating a temp file
-        temp_path = None
-        if not file_path:
-            # If context is a string, we can try to write it to a temp file
-            if isinstance(context, str) and len(context.strip()) > 0:
-                # Write to temp file
-                with tempfile.NamedTemporaryFile(
-                    mode='w',
-                    suffix='.py',
-                    delete=False,
-                    encoding='utf-8'
-                ) as f:
-                    f.write(context)
-                    temp_path = f.name
-                file_path = temp_path
-            else:
-                 raise ValueError(
-                    "file_path is required for HASTE optimization, or context must be a valid code string."
-                )
-
+        if self.index is not None:
+            return self._optimize_indexed(query, max_tokens, start_time)
 
+        _check_source(context, file_path)
         try:
-            # Call HASTE's select_from_file function
-            result = select_from_file(
-                path=file_path,
-                query=query,
-                top_k=self.top_k,
-                prefilter=self.prefilter,
-                bfs_depth=self.bfs_depth,
-                max_add=self.max_add,
-                semantic=self.semantic,
-                sem_model=self.sem_model,
-                hard_cap=max_tokens or self.hard_cap,
-                soft_cap=self.soft_cap,
-            )
+            src, original_code = _read_source(context, file_path)
+            path = file_path or "context.py"
+            if self.cache:
+                result = cached_select(src, query, path, **self._select_params(max_tokens))
+            else:
+                result = select(parse_source(src, path), query, **self._select_params(max_tokens))
             
             latency_ms = int((time.time() - start_time) * 1000)
             
             # Extract optimized code
             optimized_content = result.get('code', '')
-            nodes = result.get('nodes', [])
-            
-            # Estimate original tokens
-            original_tokens = 0
-            if file_path and os.path.exists(file_path):
-                with open(file_path, 'r', encoding='utf-8') as f:
-                    original_code = f.read()
-                original_tokens = count_tokens(original_code, model=self.target_model)
-            
-            optimized_tokens = count_tokens(optimized_content, model=self.target_model)
             
-            metrics = OptimizerMetrics(
-                original_tokens=original_tokens,
-                optimized_tokens=optimized_tokens,
-                chunks_retrieved=len(nodes),
-                compression_ratio=original_tokens / max(optimized_tokens, 1),
-                latency_ms=latency_ms,
-                retrieval_mode='hybrid' if self.semantic else 'bm25',
-                ast_fidelity=1.0 
+            original_tokens, optimized_tokens = count_tokens_many(
+                [original_code, optimized_content], model=self.target_model
             )
-            
-            return OptimizedContext(
-                content=optimized_content,
-                metrics=metrics
+            return self._result(
+                result, original_tokens, optimized_tokens, latency_ms,
+                _cache_hit_rates() if self.cache else (None, None),
             )
             
         except Exception as e:
             raise OptimizerError(f"HASTE optimization failed: {str(e)}")
-        finally:
-            if temp_path and os.path.exists(temp_path):
-                os.unlink(temp_path)
+
+    def optimize_batch(
+        self,
+        contexts: List[str],
+        queries: Optional[List[Optional[str]]] = None,
+        file_paths: Optional[List[Optional[str]]] = None,
+        return_exceptions: bool = False,
+        max_tokens: Optional[int] = None,
+        **kwargs
+    ) -> List[OptimizedContext]:
+        """
+        Optimize many (context or file, query) pairs on a process pool.
+
+        Items are grouped by source content, so each distinct file is parsed
+        once however many queries it receives, and the groups are spread
+        over ``workers`` processes. Token metrics are counted in the calling
+        process, under its metrics mode. ``latency_ms`` of the first item of
+        a group includes parsing.
+
+        With an ``index``, or in semantic mode with a ``reranker``, queries
+        are answered in the calling process.
+        """
+        n = len(contexts)
+        queries = queries or [None] * n
+        file_paths = file_paths or [None] * n
+        if not len(queries) == len(file_paths) == n:
+            raise ValueError("queries and file_paths must have one entry per context.")
+        if self.index is not None:
+            return super().optimize_batch(contexts, queries, file_paths, return_exceptions,
+                                          max_tokens=max_tokens, **kwargs)
+
+        results: list = [None] * n
+        groups: Dict[Tuple[str, str], Tuple[bytes, str, List[int]]] = {}
+        sources: Dict[str, Tuple[bytes, str]] = {}
+        for i, (context, query, file_path) in enumerate(zip(contexts, queries, file_paths)):
+            try:
+                if not query:
+                    raise ValueError("Query is required for HASTE optimization")
+                _check_source(context, file_path)
+                try:
+                    if file_path:
+                        # A file listed several times is read once
+                        if file_path not in sources:
+                            sources[file_path] = _read_source(None, file_path)
+                        src, original = sources[file_path]
+                    else:
+                        src, original = _read_source(context, None)
+                except Exception as e:
+                    raise OptimizerError(f"HASTE optimization failed: {str(e)}")
+            except Exception as e:
+                results[i] = e
+                continue
+            key = (content_hash(src), file_path or "context.py")
+            groups.setdefault(key, (src, original, []))[2].append(i)
+
+        params = self._select_params(max_tokens)
+        tasks = [(src, path, [queries[i] for i in items], params, self.cache)
+                 for (_, path), (src, _, items) in groups.items()]
+        if len(tasks) > 1 and self._pooled():
+            futures = [self._get_pool().submit(_select_group, *task) for task in tasks]
+            outputs = []
+            for future in futures:
+                try:
+                    outputs.append(future.result())
+                except Exception as e:
+                    outputs.append(e)
+        else:
+            outputs = [_select_group(*task) for task in tasks]
+
+        # One batched token count for every original and every selection
+        originals = [original for src, original, _ in groups.values()]
+        selections = [r.get("code", "") for out in outputs if not isinstance(out, Exception)
+                      for r, _ in out[0] if not isinstance(r, Exception)]
+        counts = iter(count_tokens_many(originals + selections, model=self.target_model))
+        original_counts = [next(counts) for _ in originals]
+
+        for group_tokens, (src, original, items), out in zip(original_counts, groups.values(), outputs):
+            if isinstance(out, Exception):
+                for i in items:
+                    results[i] = OptimizerError(f"HASTE optimization failed: {str(out)}")
+                continue
+            selected, hit_rates = out
+            for i, (result, latency_ms) in zip(items, selected):
+                if isinstance(result, Exception):
+                    results[i] = OptimizerError(f"HASTE optimization failed: {str(result)}")
+                else:
+                    results[i] = self._result(result, group_tokens, next(counts), latency_ms, hit_rates)
+
+        if not return_exceptions:
+            for result in results:
+                if isinstance(result, Exception):
+                    raise result
+        return results
+
+    def _select_params(self, max_tokens: Optional[int]) -> Dict[str, Any]:
+        return dict(
+            top_k=self.top_k,
+            prefilter=self.prefilter,
+            bfs_depth=self.bfs_depth,
+            max_add=self.max_add,
+            semantic=self.semantic,
+            sem_model=self.sem_model,
+            hard_cap=max_tokens or self.hard_cap,
+            soft_cap=self.soft_cap,
+            reranker=self.reranker,
+        )
+
+    def _result(self, result: Dict[str, Any], original_tokens: int, optimized_tokens: int,
+                latency_ms: int, hit_rates: Tuple[Optional[float], Optional[float]]) -> OptimizedContext:
+        metrics = OptimizerMetrics(
+            original_tokens=original_tokens,
+            optimized_tokens=optimized_tokens,
+            chunks_retrieved=len(result.get('nodes', [])),
+            compression_ratio=original_tokens / max(optimized_tokens, 1),
+            latency_ms=latency_ms,
+            retrieval_mode='hybrid' if self.semantic else 'bm25',
+            ast_fidelity=1.0,
+            token_count_mode=current_metrics_mode(),
+            parse_cache_hit_rate=hit_rates[0],
+            result_cache_hit_rate=hit_rates[1],
+        )
+        return OptimizedContext(content=result.get('code', ''), metrics=metrics)
+
+    def _optimize_indexed(self, query: str, max_tokens: Optional[int],
+                          start_time: float) -> OptimizedContext:
+        try:
+            result = self.index.select(query, **self._select_params(max_tokens))
+            latency_ms = int((time.time() - start_time) * 1000)
+            # The original is the whole indexed tree; its count is cached on the index
+            original_tokens = self.index.token_count(self.target_model)
+            optimized_tokens = count_tokens_many([result.get('code', '')], model=self.target_model)[0]
+            return self._result(result, original_tokens, optimized_tokens, latency_ms, (None, None))
+        except Exception as e:
+            raise OptimizerError(f"HASTE optimization failed: {str(e)}")
+
+    def _get_pool(self) -> ProcessPoolExecutor:
+        with self._pool_lock:
+            if self._pool is None:
+                # Each worker warms its parser and tokenizer once, when it starts
+                self._pool = ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    mp_context=multiprocessing.get_context(self.mp_context),
+                    initializer=_warm_worker,
+                    initargs=(self.top_k,),
+                )
+            return self._pool
+
+    def warmup(self) -> None:
+        """
+        Run one selection on a small snippet.
+
+        This loads the HASTE chunker's tokenizer and exercises the parser and
+        ranking code paths, and loads the local reranker's model. If
+        ``optimize_batch`` uses the process pool, the pool is started too.
+        """
+        super().warmup()
+        # Semantic reranking calls a remote embedding API, so warm the local path only
+        select_from_source(_WARMUP_SOURCE, "warmup", top_k=self.top_k, semantic=False)
+        if self.semantic and self.reranker is not None:
+            self.reranker.warmup()
+        if self._pooled():
+            pool = self._get_pool()
+            # Wait until every worker process has started and run its initializer
+            for future in [pool.submit(os.getpid) for _ in range(self.workers)]:
+                future.result()
+
+    def _pooled(self) -> bool:
+        # A reranker in each worker would load its own copy of the model
+        local_rerank = self.semantic and self.reranker is not None
+        return self.workers > 1 and self.index is None and not local_rerank
+
+    def close(self) -> None:
+        """Shut down the batch process pool, if it was started."""
+        with self._pool_lock:
+            pool, self._pool = self._pool, None
+        if pool is not None:
+            pool.shutdown()
+
+    def __getstate__(self):
+        # The pool and its lock stay with the process that created them
+        state = self.__dict__.copy()
+        state["_pool"] = None
+        del state["_pool_lock"]
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._pool_lock = threading.Lock()
+
+
+def _check_source(context, file_path: Optional[str]) -> None:
+    # Code strings are selected in memory; only a real file_path is read from disk
+    if not file_path and not (isinstance(context, str) and len(context.strip()) > 0):
+        raise ValueError(
+            "file_path is required for HASTE optimization, or context must be a valid code string."
+        )
+
+
+def _read_source(context, file_path: Optional[str]) -> Tuple[bytes, str]:
+    """Source bytes to select from and the original text."""
+    if file_path:
+        with open(file_path, 'rb') as f:
+            src = f.read()
+        return src, src.decode('utf-8', errors='replace')
+    return context.encode('utf-8'), context
+
+
+def _cache_hit_rates() -> Tuple[float, float]:
+    return haste_source.parse_cache.stats().hit_rate, haste_source.result_cache.stats().hit_rate
+
+
+def _select_group(src: bytes, path: str, queries: List[str], params: Dict[str, Any], cache: bool):
+    """
+    Answer several queries over one source, parsing it once. Runs in a
+    batch worker process; per-query failures are returned, not raised.
+    """
+    parsed = None
+    selected = []
+    for query in queries:
+        start = time.time()
+        try:
+            if cache:
+                result = cached_select(src, query, path, **params)
+            else:
+                parsed = parsed or parse_source(src, path)
+                result = select(parsed, query, **params)
+        except Exception as e:
+            result = e
+        selected.append((result, int((time.time() - start) * 1000)))
+    return selected, (_cache_hit_rates() if cache else (None, None))
+
+
+def _warm_worker(top_k: int) -> None:
+    try:
+        select_from_source(_WARMUP_SOURCE, "warmup", top_k=top_k, semantic=False)
+    except Exception:
+        # The first real call in this worker reports the problem
+        logger.warning("HASTE batch worker warmup failed", exc_info=True)
+
+
+_WARMUP_SOURCE = '''
+def warmup(value):
+    """Warm up the parser."""
+    return helper(value) + 1
+
+
+def helper(value):
+    return value * 2
+'''
+
 # Alias for backward compatibility
 HasteContext = HasteOptimizer
-    
\ No newline at end of file
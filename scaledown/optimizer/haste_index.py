@@ -0,0 +1,339 @@
+"""
+Repository-level HASTE index.
+
+``HasteIndex`` parses every Python file under a directory once and keeps
+the symbols, BM25 postings and call graph of the whole tree in memory, so
+queries only pay for scoring, BFS expansion and stitching. Call edges are
+resolved across files. Indexes can be saved to disk and reloaded without
+re-parsing.
+"""
+import os
+import pickle
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Tuple
+
+from .haste_source import HASTE_AVAILABLE, index_source
+
+if HASTE_AVAILABLE:
+    import numpy as np
+    from haste.api import _build_call_edges, _build_line_starts, _byte_to_line, _to_doc_list
+    from haste.cast_chunker import ByteSpan, cast_split_merge
+    from haste.exporter import stitch_code
+    from haste.retriever import Doc, bfs_expand, normalize_query, semantic_rerank
+    from haste.scanner import should_skip_dir
+
+_FORMAT_VERSION = 1
+# Okapi BM25 parameters, as used by HASTE (rank_bm25 defaults)
+_K1, _B, _EPSILON = 1.5, 0.75, 0.25
+
+
+@dataclass
+class _IndexedFile:
+    path: str                       # relative to the index root, '/'-separated
+    src: bytes
+    signature: Tuple[int, int]      # (mtime_ns, size) when indexed
+    symbols: list
+    line_starts: List[int]
+
+
+@dataclass(frozen=True)
+class _Snapshot:
+    """Everything a query reads; replaced as a whole on refresh."""
+    files: Dict[str, _IndexedFile]
+    docs: list
+    postings: Dict[str, tuple]
+    call_edges: Dict[str, list]
+    docs_by_name: Dict[str, list]
+    token_counts: Dict[Tuple[str, str], int] = field(default_factory=dict)
+
+    @classmethod
+    def create(cls, files, docs=None, postings=None, call_edges=None) -> "_Snapshot":
+        """Build the corpus-wide docs, BM25 postings and call graph unless given."""
+        if docs is None:
+            symbols = [s for f in files.values() for s in f.symbols]
+            docs = _to_doc_list(symbols)
+            postings, call_edges = _bm25_postings(docs), _build_call_edges(symbols)
+        docs_by_name: Dict[str, list] = {}
+        for d in docs:
+            docs_by_name.setdefault(d.name, []).append(d)
+        return cls(files, docs, postings, call_edges, docs_by_name)
+
+
+class HasteIndex:
+    """
+    HASTE index over all Python files of a directory tree.
+
+    Build it once with ``HasteIndex.build(root)``, then answer queries with
+    ``select`` or pass it to ``HasteOptimizer(index=...)``. ``refresh``
+    re-parses only files that changed since they were indexed.
+
+    Symbols are qualified by their module path (``pkg.mod::func``), and
+    BFS expansion follows calls into other files by callee name.
+
+    Queries may run while another thread refreshes the index: each query
+    reads one consistent snapshot, which ``refresh`` replaces atomically.
+
+    Requires HASTE (``pip install scaledown[haste]``).
+    """
+
+    def __init__(self, root: str, files: Dict[str, _IndexedFile]):
+        if not HASTE_AVAILABLE:
+            raise ImportError("HASTE is not installed. Install with `pip install scaledown[haste]`")
+        self.root = os.path.abspath(root)
+        self._snapshot = _Snapshot.create(files)
+        self._lock = threading.Lock()
+
+    @classmethod
+    def build(cls, root: str, max_workers: Optional[int] = None) -> "HasteIndex":
+        """Index every ``.py`` file under ``root``, parsing files on ``max_workers`` threads."""
+        root = os.path.abspath(root)
+        paths = list(_iter_python_files(root))
+        with ThreadPoolExecutor(max_workers=max_workers) as pool:
+            files = list(pool.map(lambda p: _index_file(root, p), paths))
+        return cls(root, {f.path: f for f in files})
+
+    def refresh(self) -> int:
+        """
+        Re-index files added or modified since they were indexed and drop
+        deleted ones. Returns the number of files re-parsed.
+        """
+        # Serializes refreshes; queries keep reading the previous snapshot
+        with self._lock:
+            known_files = self._snapshot.files
+            current = {_relative(self.root, p): p for p in _iter_python_files(self.root)}
+            files = {}
+            changed = 0
+            for rel, abs_path in current.items():
+                known = known_files.get(rel)
+                if known is not None and known.signature == _signature(abs_path):
+                    files[rel] = known
+                else:
+                    files[rel] = _index_file(self.root, abs_path)
+                    changed += 1
+            if changed or len(files) != len(known_files):
+                self._snapshot = _Snapshot.create(files)
+        return changed
+
+    def save(self, path: str) -> None:
+        """Write the index, including its postings, to ``path``."""
+        snap = self._snapshot
+        state = {"version": _FORMAT_VERSION, "root": self.root, "files": snap.files,
+                 "docs": snap.docs, "postings": snap.postings, "call_edges": snap.call_edges}
+        tmp = f"{path}.tmp"
+        with open(tmp, "wb") as f:
+            pickle.dump(state, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path: str) -> "HasteIndex":
+        """
+        Load an index written by ``save``. Only load files you trust; the
+        format is pickle. Call ``refresh`` to pick up changes made since.
+        """
+        with open(path, "rb") as f:
+            state = pickle.load(f)
+        if state.get("version") != _FORMAT_VERSION:
+            raise ValueError(f"Unsupported HasteIndex format: {state.get('version')}")
+        index = cls.__new__(cls)
+        index.root = state["root"]
+        index._snapshot = _Snapshot.create(state["files"], state["docs"], state["postings"],
+                                           state["call_edges"])
+        index._lock = threading.Lock()
+        return index
+
+    @property
+    def files(self) -> List[str]:
+        return sorted(self._snapshot.files)
+
+    def __len__(self) -> int:
+        return len(self._snapshot.docs)
+
+    def cache_key(self) -> tuple:
+        """Root and indexed file signatures; changes whenever ``refresh`` re-indexes."""
+        return self.root, sorted((path, f.signature) for path, f in self._snapshot.files.items())
+
+    def source(self, path: str) -> str:
+        """Indexed source of ``path`` (relative to the root)."""
+        return self._snapshot.files[path].src.decode("utf-8", errors="replace")
+
+    def token_count(self, model: str = "gpt-4o") -> int:
+        """Tokens of all indexed sources, counted once per model and metrics mode."""
+        from ..types.metrics import count_tokens_many, current_metrics_mode
+
+        snap = self._snapshot
+        key = (model, current_metrics_mode())
+        count = snap.token_counts.get(key)
+        if count is None:
+            sources = [f.src.decode("utf-8", errors="replace") for f in snap.files.values()]
+            count = snap.token_counts[key] = sum(count_tokens_many(sources, model=model))
+        return count
+
+    def search(self, query: str, k: int = 6, prefilter: int = 300) -> list:
+        """BM25 candidates for ``query``, best first, as HASTE ``Doc`` objects with scores."""
+        return _search(self._snapshot, query, k, prefilter)
+
+    def select(self, query: str, *, top_k: int = 6, prefilter: int = 300, bfs_depth: int = 1,
+               max_add: int = 12, semantic: bool = False,
+               sem_model: str = "text-embedding-3-small", hard_cap: int = 1200,
+               soft_cap: int = 1800, reranker=None) -> Dict[str, Any]:
+        """
+        Select the code relevant to ``query`` across the repository.
+
+        Returns the ``haste.select_from_file`` result format. ``code``
+        stitches the selected spans file by file, each file introduced by a
+        ``# <path>`` line, and ``files`` lists the files used. ``reranker``
+        replaces the OpenAI reranker in semantic mode, as in ``select``.
+        """
+        if hard_cap <= 0 or soft_cap <= 0:
+            raise ValueError("hard_cap and soft_cap must be positive integers")
+        soft_cap = max(soft_cap, hard_cap)
+        snap = self._snapshot
+        files = snap.files
+
+        prelim = _search(snap, query, top_k, prefilter)
+        if semantic:
+            src_by_path = {path: f.src for path, f in files.items()}
+            if reranker is not None:
+                prelim = reranker.rerank(prelim, query, src_by_path=src_by_path)
+            else:
+                prelim = semantic_rerank(prelim, query, sem_model, src_by_path=src_by_path)
+        if not prelim:
+            prelim = _search(snap, query, top_k, max(30, top_k))
+        expanded = bfs_expand(prelim[:top_k], snap.docs_by_name, snap.call_edges,
+                              depth=bfs_depth, max_add=max_add)
+
+        spans_by_file: Dict[str, list] = {}
+        for d in expanded:
+            if d.end_byte > d.start_byte:
+                spans_by_file.setdefault(d.path, []).append(ByteSpan(d.start_byte, d.end_byte))
+        parts = []
+        for path, spans in spans_by_file.items():
+            src = files[path].src
+            code, _ = stitch_code(src, cast_split_merge(src, spans, hard_cap_tokens=hard_cap,
+                                                        soft_cap_tokens=soft_cap))
+            parts.append(f"# {path}\n{code}")
+
+        nodes = []
+        for d in expanded:
+            line_starts = files[d.path].line_starts
+            nodes.append({
+                "type": d.kind,
+                "name": d.name,
+                "qname": d.qname,
+                "module": d.module,
+                "path": d.path,
+                "lineno": _byte_to_line(d.start_byte, line_starts),
+                "end_lineno": _byte_to_line(max(d.end_byte - 1, 0), line_starts),
+                "signature": d.signature,
+                "docstring": d.docstring or None,
+                "score": d.score,
+            })
+
+        return {
+            "summary": {
+                "total_functions": sum(1 for d in snap.docs if d.kind == "function"),
+                "total_classes": sum(1 for d in snap.docs if d.kind == "class"),
+                "total_files": len(files),
+            },
+            "nodes": nodes,
+            "classes": [n for n in nodes if n["type"] == "class"],
+            "selected": {
+                "roots": [d.qname for d in expanded],
+                "functions": [d.qname for d in expanded if d.kind == "function"],
+                "classes": [d.qname for d in expanded if d.kind == "class"],
+            },
+            "files": list(spans_by_file),
+            "code": "\n\n".join(parts),
+        }
+
+    def __repr__(self) -> str:
+        snap = self._snapshot
+        return f"HasteIndex(root={self.root!r}, files={len(snap.files)}, symbols={len(snap.docs)})"
+
+
+def _search(snap: _Snapshot, query: str, k: int, prefilter: int) -> list:
+    scores = np.zeros(len(snap.docs), dtype=np.float64)
+    for term in normalize_query(query):
+        posting = snap.postings.get(term)
+        if posting is not None:
+            ids, weights = posting
+            scores[ids] += weights
+    # Stable ordering matches HASTE's sorted() on ties
+    order = np.argsort(-scores, kind="stable")[:prefilter]
+    prelim = [Doc(**{**snap.docs[i].__dict__, "score": float(scores[i])}) for i in order]
+    return prelim[:k] if prefilter <= k else prelim
+
+
+def _doc_terms(doc) -> List[str]:
+    # Same bag of words as haste.retriever.build_bm25_corpus
+    terms: List[str] = []
+    terms.extend(normalize_query(doc.name))
+    terms.extend(normalize_query(doc.qname))
+    terms.extend(normalize_query(doc.docstring))
+    terms.extend(w.lower() for w in doc.identifiers[:256])
+    terms.extend(normalize_query(doc.signature))
+    return terms
+
+
+def _bm25_postings(docs) -> Dict[str, tuple]:
+    """term -> (doc ids, BM25 weights); a query's score is the sum of its terms' weights."""
+    n = len(docs)
+    if n == 0:
+        return {}
+    frequencies: Dict[str, Dict[int, int]] = {}
+    lengths = np.zeros(n, dtype=np.float64)
+    for i, doc in enumerate(docs):
+        terms = _doc_terms(doc)
+        lengths[i] = len(terms)
+        for term in terms:
+            counts = frequencies.setdefault(term, {})
+            counts[i] = counts.get(i, 0) + 1
+
+    idf = {t: np.log(n - len(c) + 0.5) - np.log(len(c) + 0.5) for t, c in frequencies.items()}
+    # rank_bm25's Okapi variant floors negative idf at a fraction of the mean
+    floor = _EPSILON * (sum(idf.values()) / len(idf))
+    norm = _K1 * (1 - _B + _B * lengths / max(lengths.mean(), 1e-9))
+
+    postings = {}
+    for term, counts in frequencies.items():
+        ids = np.fromiter(counts.keys(), dtype=np.int64, count=len(counts))
+        tf = np.fromiter(counts.values(), dtype=np.float64, count=len(counts))
+        term_idf = idf[term] if idf[term] >= 0 else floor
+        postings[term] = (ids, term_idf * tf * (_K1 + 1) / (tf + norm[ids]))
+    return postings
+
+
+def _iter_python_files(root: str):
+    for dirpath, dirnames, filenames in os.walk(root):
+        dirnames[:] = sorted(d for d in dirnames if not should_skip_dir(d))
+        for name in sorted(filenames):
+            if name.endswith(".py"):
+                yield os.path.join(dirpath, name)
+
+
+def _relative(root: str, path: str) -> str:
+    return os.path.relpath(path, root).replace(os.sep, "/")
+
+
+def _signature(path: str) -> Tuple[int, int]:
+    stat = os.stat(path)
+    return stat.st_mtime_ns, stat.st_size
+
+
+def _index_file(root: str, path: str) -> _IndexedFile:
+    rel = _relative(root, path)
+    signature = _signature(path)
+    with open(path, "rb") as f:
+        src = f.read()
+    module = rel[:-3].replace("/", ".")
+    if module.endswith(".__init__"):
+        module = module[: -len(".__init__")]
+    return _IndexedFile(
+        path=rel,
+        src=src,
+        signature=signature,
+        symbols=index_source(src, rel, module=module),
+        line_starts=_build_line_starts(src),
+    )
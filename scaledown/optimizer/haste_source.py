@@ -0,0 +1,274 @@
+"""
+HASTE selection over in-memory source.
+
+``haste.select_from_file`` reads its input from disk. The functions here
+run the same pipeline (tree-sitter indexing, BM25 prefilter, optional
+semantic rerank, BFS over call edges, CAST chunking) on source bytes the
+caller already holds, built from HASTE's own building blocks, so code
+strings never need a temporary file.
+
+The parsed form of a source (``ParsedSource``) is independent of the
+query and can be reused to answer several queries. ``cached_select``
+keeps parsed sources and selection results in process-wide LRU caches
+(``parse_cache`` and ``result_cache``), keyed on a hash of the source
+content, so repeated queries over unchanged files skip parsing, and
+repeated queries skip selection too.
+"""
+import hashlib
+import os
+import threading
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional
+
+try:
+    from tree_sitter import Parser
+    # Underscore names are HASTE internals: the optional dependency is pinned
+    # to HasteContext 0.2.x and tests/test_haste.py checks they still exist
+    from haste.api import _build_call_edges, _build_line_starts, _byte_to_line, _to_doc_list
+    from haste.cast_chunker import ByteSpan, cast_split_merge
+    from haste.exporter import stitch_code
+    from haste.index_py import (
+        PY_LANGUAGE,
+        Symbol,
+        _collect_decorators,
+        _collect_module_variables,
+        _gather_calls,
+        _gather_identifiers,
+        _is_wrapper_function,
+        _maybe_docstring,
+        _node_text,
+        _symbol_signature,
+    )
+    from haste.retriever import bfs_expand, build_bm25_corpus, lexical_topk, semantic_rerank
+    HASTE_AVAILABLE = True
+except ImportError:
+    HASTE_AVAILABLE = False
+
+from ..cache import LRUCache, hash_key
+
+# tree-sitter parsers are not safe to share between threads
+_parsers = threading.local()
+
+
+def _parser():
+    parser = getattr(_parsers, "parser", None)
+    if parser is None:
+        parser = _parsers.parser = Parser(PY_LANGUAGE)
+    return parser
+
+
+@dataclass
+class ParsedSource:
+    """Query-independent index of one Python source."""
+    path: str
+    src_bytes: bytes
+    symbols: list
+    docs: list
+    bm25: Any
+    call_edges: Dict[str, List[str]]
+    docs_by_name: Dict[str, list]
+    line_starts: List[int]
+
+
+def index_source(src: bytes, path: str, module: Optional[str] = None) -> list:
+    """
+    Symbols (functions, classes, module variables) of Python source ``src``.
+
+    Mirrors ``haste.index_py.index_python_file`` without reading ``path``.
+    ``module`` prefixes qualified names and defaults to the file name
+    without its extension.
+    """
+    root = _parser().parse(src).root_node
+    if module is None:
+        base = os.path.basename(path)
+        module = base[:-3] if base.endswith(".py") else base
+    symbols = []
+
+    for name, start, end in _collect_module_variables(src, root):
+        symbols.append(Symbol(
+            qname=f"{module}::{name}", kind="variable", name=name, module=module, path=path,
+            start_byte=0, end_byte=0, start_point=start, end_point=end,
+        ))
+
+    for node in root.children:
+        target = None
+        decorators: List[str] = []
+        if node.type == "decorated_definition":
+            decorators, target = _collect_decorators(src, node)
+        if node.type in ("class_definition", "function_definition"):
+            target = node
+        if target is None:
+            continue
+
+        kind = "class" if target.type == "class_definition" else "function"
+        name = ""
+        suite = None
+        for child in target.children:
+            if child.type == "identifier":
+                name = _node_text(src, child).decode("utf-8", "ignore")
+            if child.type in ("block", "suite"):
+                suite = child
+        identifiers: List[str] = []
+        if suite:
+            _gather_identifiers(src, suite, identifiers)
+        is_wrapper, wrapper_targets = _is_wrapper_function(src, suite) if kind == "function" else (False, [])
+
+        symbols.append(Symbol(
+            qname=f"{module}::{name}",
+            kind=kind,
+            name=name,
+            module=module,
+            path=path,
+            start_byte=target.start_byte,
+            end_byte=target.end_byte,
+            start_point=(target.start_point.row, target.start_point.column),
+            end_point=(target.end_point.row, target.end_point.column),
+            docstring=_maybe_docstring(src, suite) if suite else "",
+            identifiers=identifiers,
+            calls=_gather_calls(src, suite) if suite else [],
+            signature=_symbol_signature(src, target),
+            decorators=decorators,
+            is_wrapper=is_wrapper,
+            wrapper_targets=wrapper_targets,
+        ))
+    return symbols
+
+
+def parse_source(src: bytes, path: str = "context.py") -> ParsedSource:
+    """Index ``src`` and build its BM25 corpus and call graph."""
+    symbols = index_source(src, path)
+    docs = _to_doc_list(symbols)
+    bm25, _ = build_bm25_corpus(docs)
+    docs_by_name: Dict[str, list] = {}
+    for doc in docs:
+        docs_by_name.setdefault(doc.name, []).append(doc)
+    return ParsedSource(
+        path=path,
+        src_bytes=src,
+        symbols=symbols,
+        docs=docs,
+        bm25=bm25,
+        call_edges=_build_call_edges(symbols),
+        docs_by_name=docs_by_name,
+        line_starts=_build_line_starts(src),
+    )
+
+
+def select(parsed: ParsedSource, query: str, *, top_k: int = 6, prefilter: int = 300,
+           bfs_depth: int = 1, max_add: int = 12, semantic: bool = False,
+           sem_model: str = "text-embedding-3-small", hard_cap: int = 1200,
+           soft_cap: int = 1800, reranker=None) -> Dict[str, Any]:
+    """
+    Select the code relevant to ``query``; same result format as ``haste.select_from_file``.
+
+    With ``semantic``, candidates are reranked by ``reranker`` (e.g. a
+    ``LocalReranker``) if given, else by HASTE's OpenAI reranker.
+    """
+    if hard_cap <= 0 or soft_cap <= 0:
+        raise ValueError("hard_cap and soft_cap must be positive integers")
+    soft_cap = max(soft_cap, hard_cap)
+    docs, src = parsed.docs, parsed.src_bytes
+
+    prelim = lexical_topk(docs, parsed.bm25, query, k=top_k, prefilter=prefilter)
+    if semantic:
+        if reranker is not None:
+            prelim = reranker.rerank(prelim, query, src_bytes=src)
+        else:
+            prelim = semantic_rerank(prelim, query, sem_model, src_bytes=src)
+    if not prelim:
+        prelim = lexical_topk(docs, parsed.bm25, query, k=top_k, prefilter=max(30, top_k))
+    expanded = bfs_expand(prelim[:top_k], parsed.docs_by_name, parsed.call_edges,
+                          depth=bfs_depth, max_add=max_add)
+
+    spans = [ByteSpan(d.start_byte, d.end_byte) for d in expanded]
+    stitched = cast_split_merge(src, spans, hard_cap_tokens=hard_cap, soft_cap_tokens=soft_cap)
+    code, _ = stitch_code(src, stitched)
+
+    nodes = []
+    for d in expanded:
+        nodes.append({
+            "type": d.kind,
+            "name": d.name,
+            "qname": d.qname,
+            "module": d.module,
+            "path": d.path,
+            "lineno": _byte_to_line(d.start_byte, parsed.line_starts),
+            "end_lineno": _byte_to_line(max(d.end_byte - 1, 0), parsed.line_starts),
+            "signature": d.signature,
+            "docstring": d.docstring or None,
+            "score": d.score,
+        })
+
+    return {
+        "summary": {
+            "total_functions": sum(1 for s in parsed.symbols if s.kind == "function"),
+            "total_classes": sum(1 for s in parsed.symbols if s.kind == "class"),
+        },
+        "nodes": nodes,
+        "classes": [n for n in nodes if n["type"] == "class"],
+        "selected": {
+            "roots": [d.qname for d in expanded],
+            "functions": [d.qname for d in expanded if d.kind == "function"],
+            "classes": [d.qname for d in expanded if d.kind == "class"],
+        },
+        "code": code,
+    }
+
+
+def select_from_source(source: str, query: str, path: str = "context.py", **params) -> Dict[str, Any]:
+    """``haste.select_from_file`` for a source string; ``params`` as for ``select``."""
+    return select(parse_source(source.encode("utf-8"), path), query, **params)
+
+
+def _parser_version() -> str:
+    from importlib.metadata import PackageNotFoundError, version
+    try:
+        return f"haste-{version('HasteContext')}/tree-sitter-{version('tree-sitter')}"
+    except PackageNotFoundError:
+        return "unknown"
+
+
+# Cached parses and results are only valid for the HASTE and tree-sitter versions that made them
+_PARSER_VERSION = _parser_version() if HASTE_AVAILABLE else None
+
+
+def _parsed_size(parsed: ParsedSource) -> int:
+    # Rough footprint: the source plus docs, identifiers and BM25 bags per symbol
+    return 2 * len(parsed.src_bytes) + 1024 * len(parsed.symbols)
+
+
+def _result_size(result: Dict[str, Any]) -> int:
+    return 2 * len(result["code"]) + 512 * len(result["nodes"])
+
+
+# Process-wide caches shared by all HasteOptimizer instances; replace them to resize
+parse_cache = LRUCache(max_entries=1024, max_bytes=256 * 2**20, sizeof=_parsed_size)
+result_cache = LRUCache(max_entries=8192, max_bytes=64 * 2**20, sizeof=_result_size)
+
+
+def content_hash(src: bytes) -> str:
+    return hashlib.sha256(src).hexdigest()
+
+
+def cached_parse(src: bytes, path: str = "context.py", digest: Optional[str] = None) -> ParsedSource:
+    """``parse_source`` through ``parse_cache``; ``digest`` is ``content_hash(src)`` if known."""
+    key = hash_key("parse", _PARSER_VERSION, digest or content_hash(src), path)
+    parsed = parse_cache.get(key)
+    if parsed is None:
+        parsed = parse_source(src, path)
+        parse_cache.set(key, parsed)
+    return parsed
+
+
+def cached_select(src: bytes, query: str, path: str = "context.py", **params) -> Dict[str, Any]:
+    """
+    ``select`` through ``result_cache``, parsing through ``parse_cache`` on a
+    miss. The returned dict may be shared with other callers; do not modify it.
+    """
+    digest = content_hash(src)
+    key = hash_key("select", _PARSER_VERSION, digest, path, query, params)
+    result = result_cache.get(key)
+    if result is None:
+        result = select(cached_parse(src, path, digest), query, **params)
+        result_cache.set(key, result)
+    return result
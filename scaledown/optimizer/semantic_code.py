@@ -6,8 +6,9 @@ from typing import List, Dict, Any, Optional, Union
 from pathlib import Path
 
 from scaledown.optimizer.base import BaseOptimizer
+from scaledown.optimizer.embeddings import DEFAULT_EMBEDDING_MODEL, load_sentence_transformer
 from scaledown.types import OptimizedContext
-from scaledown.types.metrics import OptimizerMetrics, count_tokens
+from scaledown.types.metrics import OptimizerMetrics, count_tokens, count_tokens_many, current_metrics_mode
 from scaledown.exceptions import OptimizerError
 
 logger = logging.getLogger(__name__)
@@ -18,7 +19,7 @@ class SemanticOptimizer(BaseOptimizer):
     relevant code chunks (functions/classes) for a given query.
     """
 
-    def __init__(self, model_name: str = "Qwen/Qwen3-Embedding-0.6B", top_k: int = 3, target_model: str = "gpt-4o", **kwargs):
+    def __init__(self, model_name: str = DEFAULT_EMBEDDING_MODEL, top_k: int = 3, target_model: str = "gpt-4o", **kwargs):
         super().__init__(target_model=target_model, **kwargs)
         self.model_name = model_name
         self.top_k = top_k
@@ -33,7 +34,7 @@ class SemanticOptimizer(BaseOptimizer):
             return
 
         try:
-            from sentence_transformers import SentenceTransformer
+            import sentence_transformers  # noqa: F401
             import faiss
             import numpy as np
         except ImportError as e:
@@ -42,9 +43,9 @@ class SemanticOptimizer(BaseOptimizer):
                 "Install them with: pip install scaledown[semantic]"
             ) from e
 
-        logger.info(f"Loading embedding model: {self.model_name}...")
         try:
-            self._model = SentenceTransformer(self.model_name)
+            # Shared with other optimizers and rerankers using the same model
+            self._model = load_sentence_transformer(self.model_name)
             self._faiss = faiss
             self._numpy = np
         except Exception as e:
@@ -53,6 +54,14 @@ class SemanticOptimizer(BaseOptimizer):
             logger.warning("Falling back to pass-through mode.")
             self.model_load_failed = True
 
+    def warmup(self) -> None:
+        """Import the ML dependencies, load the embedding model and run one encode."""
+        super().warmup()
+        self._lazy_load_deps()
+        if self._model is not None:
+            # The first encode call initializes the tokenizer and inference kernels
+            self._model.encode(["warmup"])
+
     def _extract_semantic_units(self, file_path: str) -> List[Dict[str, Any]]:
         """Extracts functions and classes using AST."""
         try:
@@ -102,7 +111,80 @@ class SemanticOptimizer(BaseOptimizer):
         Embeds the code in `file_path` and returns the segments most relevant to `query`.
         """
         start_time = time.time()
+        prepared = self._prepare(context, file_path, start_time)
+        if isinstance(prepared, OptimizedContext):
+            return prepared
+
+        full_source, valid_units = prepared
+        embeddings = self._model.encode([u["code"] for u in valid_units])
+        query_emb = self._model.encode([query or "main logic"])
+        return self._search(full_source, valid_units, embeddings, query_emb, start_time)
 
+    def optimize_batch(
+        self,
+        contexts: List[str],
+        queries: Optional[List[Optional[str]]] = None,
+        file_paths: Optional[List[Optional[str]]] = None,
+        return_exceptions: bool = False,
+        **kwargs
+    ) -> List[OptimizedContext]:
+        """
+        Optimize several files with one embedding call for all of their code
+        units and one for all queries.
+
+        If the batched embedding fails, items are embedded one by one, so a
+        failure only affects its own item (returned with
+        ``return_exceptions=True``, raised otherwise).
+        """
+        start_time = time.time()
+        n = len(contexts)
+        queries = queries or [None] * n
+        file_paths = file_paths or [None] * n
+        if not len(queries) == len(file_paths) == n:
+            raise ValueError("queries and file_paths must have one entry per context.")
+
+        prepared = []
+        for context, file_path in zip(contexts, file_paths):
+            try:
+                prepared.append(self._prepare(context, file_path, start_time))
+            except Exception as e:
+                if not return_exceptions:
+                    raise
+                prepared.append(e)
+
+        pending = [i for i, p in enumerate(prepared) if isinstance(p, tuple)]
+        if not pending:
+            return prepared
+
+        codes = [u["code"] for i in pending for u in prepared[i][1]]
+        try:
+            embeddings = self._model.encode(codes)
+            query_embs = self._model.encode([queries[i] or "main logic" for i in pending])
+        except Exception as e:
+            logger.warning(f"Batched embedding failed, embedding items one by one: {e}")
+            embeddings = query_embs = None
+
+        results = list(prepared)
+        offset = 0
+        for row, i in enumerate(pending):
+            full_source, valid_units = prepared[i]
+            try:
+                if embeddings is None:
+                    item_embeddings = self._model.encode([u["code"] for u in valid_units])
+                    query_emb = self._model.encode([queries[i] or "main logic"])
+                else:
+                    item_embeddings = embeddings[offset:offset + len(valid_units)]
+                    query_emb = query_embs[row:row + 1]
+                results[i] = self._search(full_source, valid_units, item_embeddings, query_emb, start_time)
+            except Exception as e:
+                if not return_exceptions:
+                    raise
+                results[i] = e
+            offset += len(valid_units)
+        return results
+
+    def _prepare(self, context, file_path, start_time):
+        """Return a fallback result, or (full_source, code units to embed)."""
         if not file_path:
             logger.warning("SemanticOptimizer requires 'file_path'. Returning original.")
             orig_tokens = count_tokens(str(context), model=self.target_model)
@@ -113,34 +195,32 @@ class SemanticOptimizer(BaseOptimizer):
         # Extract Chunks
         units = self._extract_semantic_units(file_path)
         full_source = units[0]["code"] if units and units[0]["type"] == "file" else ""
-        orig_tokens = count_tokens(full_source, model=self.target_model)
 
         # whether model fails to load
         if self.model_load_failed:
+            orig_tokens = count_tokens(full_source, model=self.target_model)
             return self._create_fallback_context(full_source, orig_tokens, start_time, "model_load_failed")
         
         if not units:
-             return self._create_fallback_context("", orig_tokens, start_time, "no_units")
+             return self._create_fallback_context("", 0, start_time, "no_units")
 
         # Embed Chunks
         valid_units = [u for u in units if u.get("code") and u.get("type") != "file"]
         
         if not valid_units:
+             orig_tokens = count_tokens(full_source, model=self.target_model)
              return self._create_fallback_context("", orig_tokens, start_time, "no_valid_chunks")
 
-        codes = [u["code"] for u in valid_units]
-        embeddings = self._model.encode(codes)
+        return full_source, valid_units
 
+    def _search(self, full_source, valid_units, embeddings, query_emb, start_time) -> OptimizedContext:
+        """Index the unit embeddings and keep the units nearest to the query."""
         # Build Index
         d = embeddings.shape[1]
         index = self._faiss.IndexFlatL2(d)
         index.add(self._numpy.array(embeddings, dtype=self._numpy.float32))
 
-        # Embed Query & Search
-        if not query:
-             query = "main logic"
-
-        query_emb = self._model.encode([query])
+        # Search
         k_search = min(self.top_k, len(valid_units))
         
         distances, indices = index.search(
@@ -157,7 +237,7 @@ class SemanticOptimizer(BaseOptimizer):
         final_content = "\n\n# ... [Semantic Context Search Result] ...\n\n".join(results)
         
         # Metrics Calculation
-        opt_tokens = count_tokens(final_content, model=self.target_model)
+        orig_tokens, opt_tokens = count_tokens_many([full_source, final_content], model=self.target_model)
         latency = (time.time() - start_time) * 1000
         ratio = opt_tokens / orig_tokens if orig_tokens > 0 else 0.0
 
@@ -170,7 +250,8 @@ class SemanticOptimizer(BaseOptimizer):
                 compression_ratio=ratio,           
                 latency_ms=latency,                
                 retrieval_mode="semantic_search",  
-                ast_fidelity=1.0
+                ast_fidelity=1.0,
+                token_count_mode=current_metrics_mode()
             )
         )
 
@@ -185,6 +266,7 @@ class SemanticOptimizer(BaseOptimizer):
                 compression_ratio=1.0,
                 latency_ms=(time.time() - start_time) * 1000,
                 retrieval_mode=f"fallback_{reason}",
-                ast_fidelity=1.0
+                ast_fidelity=1.0,
+                token_count_mode=current_metrics_mode()
             )
         )
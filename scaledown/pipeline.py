@@ -1,9 +1,28 @@
-from typing import List, Tuple, Union, Optional
+import asyncio
+import contextvars
+import dataclasses
+import functools
+import hashlib
+import inspect
+import logging
+import os
+import time
+import types
+import uuid
+from concurrent.futures import Future, ThreadPoolExecutor
+from contextlib import nullcontext
+from typing import Collection, Dict, Iterable, Iterator, List, Tuple, Union, Optional
 from scaledown.optimizer.base import BaseOptimizer
 from scaledown.compressor.base import BaseCompressor
 from scaledown.types import OptimizedContext, CompressedPrompt
 from scaledown.types import PipelineResult, StepMetadata
-from scaledown.types.metrics import count_tokens
+from scaledown.types.metrics import count_tokens, count_tokens_many, current_metrics_mode, get_encoding, metrics_mode, token_count_scope
+from scaledown.exceptions import DeadlineExceededError
+from scaledown.config import _validate_metrics_mode
+from scaledown.cache import hash_key
+from scaledown.tracing import Tracer
+
+logger = logging.getLogger(__name__)
 
 class Pipeline:
     """
@@ -23,17 +42,66 @@ class Pipeline:
     >>> result = pipe.run(context=code, query="Add type hints", prompt="Explain changes")
     """
     
-    def __init__(self, steps: List[Tuple[str, Union[BaseOptimizer, BaseCompressor]]]):
+    def __init__(self, steps: List[Tuple[str, Union[BaseOptimizer, BaseCompressor]]],
+                 metrics_mode: Optional[str] = None, cache=None,
+                 cache_steps: Optional[Collection[str]] = None,
+                 target_tokens: Optional[int] = None, tracer: Optional[Tracer] = None,
+                 warmup: Union[bool, str] = False):
         """
         Initialize pipeline with ordered steps.
         
         Parameters
         ----------
         steps : List[Tuple[str, Union[BaseOptimizer, BaseCompressor]]]
-            List of (name, transformer) tuples
+            List of (name, transformer) tuples. A step may carry a third
+            element, a dict of skip conditions checked against its input:
+            ``min_tokens`` skips the step when the input has fewer tokens,
+            ``skip_if`` is a callable ``(text, tokens) -> bool``.
+        metrics_mode : {'exact', 'estimate', 'off'}, optional
+            How token metrics are computed during runs of this pipeline.
+            Defaults to the global setting (``scaledown.set_metrics_mode``).
+        cache : LRUCache, SQLiteCache or TieredCache, optional
+            Memoize step results, keyed on the step's class and configuration,
+            its input and the run's keyword arguments. A re-run only executes
+            the steps whose inputs changed; hits are recorded in
+            ``StepMetadata.details["cache_hit"]``. Functions are identified
+            by their code, defaults and closure, partials by their arguments
+            and bound methods by their instance. Steps that cannot be
+            described this way (e.g. public attributes holding locks or
+            clients) are not cached unless they define a ``cache_key()``
+            method returning plain data.
+        cache_steps : collection of str, optional
+            Names of the steps to cache. Defaults to all steps.
+        target_tokens : int, optional
+            Token budget of the run. Once the current text fits within it,
+            the remaining steps are skipped.
+        tracer : scaledown.tracing.Tracer, optional
+            Record a span per run and per step (wall and CPU time, peak
+            memory, bytes sent and received, cache hits).
+        warmup : bool or 'background', default=False
+            Call ``warmup()`` at construction; ``'background'`` does so in
+            a background thread (see ``warmup_future``).
+
+        Skipped steps pass their input through unchanged and appear in the
+        history with zero latency and ``details["skipped"]`` set. Skip
+        checks count tokens in the pipeline's metrics mode, or with the
+        estimator when metrics are 'off'.
         """
-        self.steps = steps
+        self.steps = [tuple(step[:2]) for step in steps]
+        self.step_options = {step[0]: _validate_step_options(step[0], step[2])
+                             for step in steps if len(step) > 2}
+        self.target_tokens = target_tokens
+        self.tracer = tracer
+        self.metrics_mode = _validate_metrics_mode(metrics_mode) if metrics_mode else None
+        self.cache = cache
+        self.cache_steps = set(cache_steps) if cache_steps is not None else None
+        self.warmup_times: Optional[Dict[str, float]] = None
+        self.warmup_future: Optional[Future] = None
         self._validate_steps()
+        if warmup not in (False, True, "background"):
+            raise ValueError("warmup must be True, False or 'background'")
+        if warmup:
+            self.warmup(background=warmup == "background")
     
     def _validate_steps(self):
         """Validate pipeline structure."""
@@ -50,58 +118,436 @@ class Pipeline:
                     f"Optimizer '{name}' cannot come after a compressor. "
                     "Pipeline order must be: optimizers -> compressors"
                 )
-    def run(self, context: str, **kwargs) -> PipelineResult:
-        current_context = context
-        original_context = context
-        history: List[StepMetadata] = []
-
-        for name, component in self.steps:
-            step_type = "custom"
-            inp, out, lat = 0, 0, 0.0
-            
-            # OPTIMIZER
-            if isinstance(component, BaseOptimizer):
-                step_type = "optimization"
-                result = component.optimize(
-                    context=current_context,
-                    **kwargs
+    def run(self, context: str, timeout: Optional[float] = None, **kwargs) -> PipelineResult:
+        """
+        Run every step in order on ``context``.
+
+        ``timeout`` (seconds) bounds the whole run: the remaining time is
+        passed to each optimizer and compressor as ``deadline``, and
+        ``DeadlineExceededError`` is raised once it has passed.
+
+        With a ``tracer``, each step's measured wall time, CPU time, peak
+        memory and network bytes are added to its ``details`` and the span
+        tree is returned in ``PipelineResult.trace``.
+        """
+        # Each text is tokenized at most once per run; later steps reuse the counts
+        with metrics_mode(self.metrics_mode), token_count_scope(), self._span("pipeline.run") as trace:
+            current_context = context
+            original_context = context
+            history: List[StepMetadata] = []
+            deadline = time.monotonic() + timeout if timeout is not None else None
+
+            for name, component in self.steps:
+                reason = self._skip_reason(name, current_context)
+                if reason:
+                    history.append(self._skipped_metadata(name, component, current_context, reason))
+                    continue
+                with self._step_span(name, component) as span:
+                    step_kwargs = _with_deadline(name, component, deadline, kwargs)
+                    key, result = self._cache_lookup(name, component, current_context, kwargs)
+                    cache_hit = result is not None
+                    if not cache_hit:
+                        result = self._call_step(component, current_context, step_kwargs, kwargs)
+                        self._cache_store(key, result)
+
+                current_context, metadata = self._step_metadata(
+                    name, component, current_context, result, cache_hit=cache_hit if key else None
                 )
-                inp = getattr(result.metrics, 'original_tokens', 0)
-                out = getattr(result.metrics, 'optimized_tokens', 0)
-                lat = getattr(result.metrics, 'latency_ms', 0.0)
-                current_context = result.content
-            
-            # COMPRESSOR
-            elif isinstance(component, BaseCompressor):
-                step_type = "compression"
-                result = component.compress(
-                    context=current_context,
-                    **kwargs
+                _add_trace_details(metadata, span)
+                history.append(metadata)
+
+            pipeline_result = PipelineResult(
+                final_content=current_context,
+                original_content=original_context,
+                history=history,
+                metrics_mode=current_metrics_mode()
+            )
+        pipeline_result.trace = trace
+        return pipeline_result
+
+    async def arun(self, context: str, timeout: Optional[float] = None, **kwargs) -> PipelineResult:
+        """
+        Asynchronous version of ``run``.
+
+        Compressors are awaited through ``acompress``; optimizers and plain
+        callables are CPU-bound and run in a worker thread. Coroutine
+        functions used as custom steps are awaited directly.
+        """
+        # Each text is tokenized at most once per run; later steps reuse the counts
+        with metrics_mode(self.metrics_mode), token_count_scope(), self._span("pipeline.arun") as trace:
+            current_context = context
+            original_context = context
+            history: List[StepMetadata] = []
+            deadline = time.monotonic() + timeout if timeout is not None else None
+
+            for name, component in self.steps:
+                reason = self._skip_reason(name, current_context)
+                if reason:
+                    history.append(self._skipped_metadata(name, component, current_context, reason))
+                    continue
+                with self._step_span(name, component) as span:
+                    step_kwargs = _with_deadline(name, component, deadline, kwargs)
+                    key, result = self._cache_lookup(name, component, current_context, kwargs)
+                    cache_hit = result is not None
+                    if not cache_hit:
+                        result = await self._acall_step(component, current_context, step_kwargs, kwargs)
+                        self._cache_store(key, result)
+
+                current_context, metadata = self._step_metadata(
+                    name, component, current_context, result, cache_hit=cache_hit if key else None
+                )
+                _add_trace_details(metadata, span)
+                history.append(metadata)
+
+            pipeline_result = PipelineResult(
+                final_content=current_context,
+                original_content=original_context,
+                history=history,
+                metrics_mode=current_metrics_mode()
+            )
+        pipeline_result.trace = trace
+        return pipeline_result
+
+    def run_batch(self, contexts: List[str], prompts=None, queries=None, file_paths=None,
+                  timeout: Optional[float] = None, **kwargs) -> List[PipelineResult]:
+        """
+        Run the pipeline on many contexts, with one batched call per step.
+
+        Optimizers receive a single ``optimize_batch`` call and compressors a
+        single ``compress_batch`` call for all items still in flight; custom
+        callables are called per item. ``prompts``, ``queries`` and
+        ``file_paths`` are lists (one entry per context) or a single value
+        for all contexts.
+
+        Results are returned in input order. An item that fails keeps the
+        output of its last successful step, has its exception in
+        ``PipelineResult.error`` and skips the remaining steps; the other
+        items are unaffected.
+        """
+        n = len(contexts)
+        item_args = {
+            "prompt": _broadcast(prompts, n, "prompts"),
+            "query": _broadcast(queries, n, "queries"),
+            "file_path": _broadcast(file_paths, n, "file_paths"),
+        }
+
+        with metrics_mode(self.metrics_mode), token_count_scope(), self._span("pipeline.run_batch", items=n) as trace:
+            current = list(contexts)
+            histories: List[List[StepMetadata]] = [[] for _ in range(n)]
+            errors: List[Optional[Exception]] = [None] * n
+            deadline = time.monotonic() + timeout if timeout is not None else None
+
+            for name, component in self.steps:
+                active = []
+                for i in range(n):
+                    if errors[i] is not None:
+                        continue
+                    reason = self._skip_reason(name, current[i])
+                    if reason:
+                        histories[i].append(self._skipped_metadata(name, component, current[i], reason))
+                    else:
+                        active.append(i)
+                if not active:
+                    continue
+                keys, results = {}, {}
+                for i in active:
+                    item_kwargs = dict(kwargs, **{k: v[i] for k, v in item_args.items() if v[i] is not None})
+                    keys[i], cached = self._cache_lookup(name, component, current[i], item_kwargs)
+                    if cached is not None:
+                        results[i] = cached
+                misses = [i for i in active if i not in results]
+
+                if misses:
+                    try:
+                        step_kwargs = _with_deadline(name, component, deadline, kwargs)
+                        with self._step_span(name, component, items=len(misses)):
+                            computed = self._run_batch_step(component, misses, current, item_args, step_kwargs)
+                    except Exception as e:
+                        computed = [e] * len(misses)
+                    for i, result in zip(misses, computed):
+                        results[i] = result
+                        if not isinstance(result, Exception):
+                            self._cache_store(keys[i], result)
+
+                for i in active:
+                    result = results[i]
+                    if isinstance(result, Exception):
+                        errors[i] = result
+                    else:
+                        cache_hit = i not in misses if keys[i] else None
+                        current[i], metadata = self._step_metadata(
+                            name, component, current[i], result, cache_hit=cache_hit
+                        )
+                        histories[i].append(metadata)
+
+            results = [
+                PipelineResult(
+                    final_content=current[i],
+                    original_content=contexts[i],
+                    history=histories[i],
+                    metrics_mode=current_metrics_mode(),
+                    error=errors[i]
                 )
-                inp = result.tokens[0]
-                out = result.tokens[1]
-                lat = result.latency
-                current_context = result.content
-            
-            # UNKNOWN
-            else:
-                output = component(current_context, **kwargs)
-                inp = count_tokens(current_context)
-                out = count_tokens(output)
-                current_context = output
-            
-            history.append(StepMetadata(
-                step_name=name,
-                input_tokens=inp,
-                output_tokens=out,
-                latency_ms=lat,
-                details={"type": step_type, "component": component.__class__.__name__}
-            ))
-
-        return PipelineResult(
-            final_content=current_context,
-            original_content=original_context,
-            history=history
+                for i in range(n)
+            ]
+        # Batched steps are traced once for all items, so every result shares the trace
+        for result in results:
+            result.trace = trace
+        return results
+
+    def stream(self, items: Iterable[Union[str, dict]], workers=None, executors=None,
+               queue_size: int = 32, ordered: bool = True, **kwargs) -> Iterator[PipelineResult]:
+        """
+        Run the pipeline over a (possibly unbounded) stream of inputs.
+
+        Each step runs as a stage with its own workers, connected to the next
+        by a bounded queue, so results are yielded as they are ready and
+        memory stays flat however long the stream is. Give CPU-bound steps
+        (HASTE parsing, AST extraction) ``executors={name: 'process'}`` to
+        spread them across cores.
+
+        Parameters
+        ----------
+        items : iterable of str or dict
+            Contexts, or dicts with a ``context`` key and per-item run
+            arguments such as ``prompt``, ``query`` or ``file_path``.
+        workers : int or dict, optional
+            Workers per stage, for all stages or as ``{step_name: n}``.
+        executors : dict, optional
+            ``{step_name: 'thread' | 'process'}``; defaults to threads.
+        queue_size : int, default=32
+            Capacity of each inter-stage queue.
+        ordered : bool, default=True
+            Yield in input order; otherwise in completion order, with
+            ``PipelineResult.index`` set to the input position.
+        **kwargs
+            Run arguments shared by all items.
+
+        Step caching and skip conditions apply as in ``run``; tracing and
+        timeouts do not. Failed items carry their exception in
+        ``PipelineResult.error``.
+        """
+        from scaledown.streaming import StreamExecutor
+
+        executor = StreamExecutor(self, workers=workers, executors=executors,
+                                  queue_size=queue_size, ordered=ordered)
+        return executor.run(items, **kwargs)
+
+    def warmup(self, background: bool = False):
+        """
+        Initialize every step's heavy resources before the first run.
+
+        Loads embedding models, parsers and tokenizers and opens API
+        connections by calling each component's ``warmup()``; custom steps
+        only load the tokenizer used for metrics. Steps warm up concurrently.
+
+        Parameters
+        ----------
+        background : bool, default=False
+            Return immediately with a ``concurrent.futures.Future`` (also
+            stored in ``warmup_future``) that resolves to the timings.
+
+        Returns
+        -------
+        dict or Future
+            Warmup time per step in milliseconds, also kept in
+            ``warmup_times``. Errors raised by a component's warmup propagate.
+        """
+        if background:
+            executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="scaledown-warmup")
+            self.warmup_future = executor.submit(self.warmup)
+            executor.shutdown(wait=False)
+            return self.warmup_future
+
+        with metrics_mode(self.metrics_mode):
+            with ThreadPoolExecutor(max_workers=len(self.steps), thread_name_prefix="scaledown-warmup") as pool:
+                futures = {
+                    name: pool.submit(contextvars.copy_context().run, _warm_step, component)
+                    for name, component in self.steps
+                }
+            self.warmup_times = {name: future.result() for name, future in futures.items()}
+        return self.warmup_times
+
+    def _run_batch_step(self, component, active, current, item_args, step_kwargs) -> list:
+        """Run one step on the active items; failed items yield their exception."""
+        contexts = [current[i] for i in active]
+        per_item = {key: [values[i] for i in active] for key, values in item_args.items()}
+
+        # OPTIMIZER
+        if isinstance(component, BaseOptimizer):
+            return component.optimize_batch(
+                contexts,
+                queries=per_item["query"],
+                file_paths=per_item["file_path"],
+                return_exceptions=True,
+                **step_kwargs
+            )
+
+        # COMPRESSOR
+        if isinstance(component, BaseCompressor):
+            return component.compress_batch(
+                contexts,
+                per_item["prompt"],
+                return_exceptions=True,
+                **step_kwargs
+            )
+
+        # UNKNOWN
+        results = []
+        for row, context in enumerate(contexts):
+            item_kwargs = dict(step_kwargs)
+            item_kwargs.update({k: v[row] for k, v in per_item.items() if v[row] is not None})
+            try:
+                results.append(component(context, **item_kwargs))
+            except Exception as e:
+                results.append(e)
+        return results
+
+    @staticmethod
+    def _call_step(component, context, step_kwargs, kwargs):
+        """Run one step on ``context`` and return its raw result."""
+        # OPTIMIZER
+        if isinstance(component, BaseOptimizer):
+            return component.optimize(
+                context=context,
+                **step_kwargs
+            )
+
+        # COMPRESSOR
+        if isinstance(component, BaseCompressor):
+            return component.compress(
+                context=context,
+                **step_kwargs
+            )
+
+        # UNKNOWN
+        return component(context, **kwargs)
+
+    async def _acall_step(self, component, context, step_kwargs, kwargs):
+        if isinstance(component, BaseOptimizer):
+            return await asyncio.to_thread(
+                component.optimize, context=context, **step_kwargs
+            )
+        if isinstance(component, BaseCompressor):
+            return await component.acompress(
+                context=context,
+                **step_kwargs
+            )
+        if inspect.iscoroutinefunction(component):
+            return await component(context, **kwargs)
+        return await asyncio.to_thread(component, context, **kwargs)
+
+    def _cache_lookup(self, name, component, step_input, kwargs):
+        """Return (key, cached result) for a step; the key is None when the step is not cached."""
+        if self.cache is None or (self.cache_steps is not None and name not in self.cache_steps):
+            return None, None
+        fingerprint = _step_fingerprint(component)
+        if fingerprint is None:
+            return None, None
+        key = hash_key(
+            "pipeline-step",
+            fingerprint,
+            step_input,
+            _relevant_kwargs(component, kwargs),
+            _file_signature(kwargs.get("file_path")),
+            current_metrics_mode(),
+        )
+        result = self.cache.get(key)
+        if isinstance(result, CompressedPrompt):
+            result = dataclasses.replace(result, cached=True)
+        return key, result
+
+    def _cache_store(self, key, result) -> None:
+        # Degraded pass-through results are not worth reusing
+        if key is not None and not getattr(result, "passthrough", False):
+            self.cache.set(key, result)
+
+    def _span(self, name, **attributes):
+        if self.tracer is None:
+            return nullcontext()
+        return self.tracer.span(name, **attributes)
+
+    def _step_span(self, name, component, **attributes):
+        return self._span(f"step:{name}", step=name, type=_step_type(component),
+                          component=component.__class__.__name__, **attributes)
+
+    def _skip_reason(self, name, context) -> Optional[str]:
+        """Why step ``name`` should be skipped for ``context``, or None to run it."""
+        options = self.step_options.get(name)
+        if self.target_tokens is None and not options:
+            return None
+        tokens = _budget_tokens(context)
+        if self.target_tokens is not None and tokens <= self.target_tokens:
+            return "target_met"
+        if options:
+            if tokens < options.get("min_tokens", 0):
+                return "min_tokens"
+            skip_if = options.get("skip_if")
+            if skip_if is not None and skip_if(context, tokens):
+                return "skip_if"
+        return None
+
+    def _skipped_metadata(self, name, component, context, reason) -> StepMetadata:
+        tokens = count_tokens(context)
+        return StepMetadata(
+            step_name=name,
+            input_tokens=tokens,
+            output_tokens=tokens,
+            latency_ms=0.0,
+            details={
+                "type": _step_type(component),
+                "component": component.__class__.__name__,
+                "token_count_mode": current_metrics_mode(),
+                "skipped": True,
+                "skip_reason": reason,
+            }
+        )
+
+    def _step_metadata(self, name, component, step_input, result,
+                       cache_hit: Optional[bool] = None) -> Tuple[str, StepMetadata]:
+        """Extract the step output and its metrics from a component result."""
+        step_type = "custom"
+        inp, out, lat = 0, 0, 0.0
+        count_mode = current_metrics_mode()
+
+        # OPTIMIZER
+        if isinstance(component, BaseOptimizer):
+            step_type = "optimization"
+            inp = getattr(result.metrics, 'original_tokens', 0)
+            out = getattr(result.metrics, 'optimized_tokens', 0)
+            lat = getattr(result.metrics, 'latency_ms', 0.0)
+            count_mode = getattr(result.metrics, 'token_count_mode', count_mode)
+            output = result.content
+
+        # COMPRESSOR
+        elif isinstance(component, BaseCompressor):
+            step_type = "compression"
+            inp = result.tokens[0]
+            out = result.tokens[1]
+            lat = result.latency
+            # Compressors report their own exact counts
+            count_mode = "exact"
+            output = result.content
+
+        # UNKNOWN
+        else:
+            output = result
+            inp, out = count_tokens_many([step_input, output])
+
+        details = {
+            "type": step_type,
+            "component": component.__class__.__name__,
+            "token_count_mode": count_mode,
+        }
+        if cache_hit is not None:
+            details["cache_hit"] = cache_hit
+
+        return output, StepMetadata(
+            step_name=name,
+            input_tokens=inp,
+            output_tokens=out,
+            latency_ms=lat,
+            details=details
         )
     
     def get_step(self, name: str) -> Union[BaseOptimizer, BaseCompressor]:
@@ -116,6 +562,218 @@ class Pipeline:
         return f"Pipeline(steps={step_names})"
 
 
+# Run controls that do not affect a step's output
+_UNCACHED_KWARGS = {"deadline", "timeout"}
+# Attributes that identify a client, hold its resources and runtime state, or size them,
+# rather than configure a step
+_UNCACHED_ATTRS = {"api_key", "workers", "max_workers", "session", "async_session",
+                   "throttle", "breaker", "cache"}
+_PLAIN_TYPES = (str, int, float, bool, type(None))
+
+
+def _relevant_kwargs(component, kwargs) -> dict:
+    """Run keyword arguments that can change a step's output."""
+    ignored = _UNCACHED_KWARGS
+    if isinstance(component, BaseOptimizer):
+        # Optimizers select context by query; the compression prompt does not reach them
+        ignored = ignored | {"prompt"}
+    return {k: v for k, v in kwargs.items() if k not in ignored}
+
+
+def _step_fingerprint(component) -> Optional[dict]:
+    """
+    Stable description of a step, or None when it cannot be described
+    (the step is then not cached).
+
+    A ``cache_key()`` method takes precedence. Otherwise functions are
+    described by their code, defaults and closure cells, partials by their
+    function and arguments, bound methods by their function and instance,
+    and other objects by their class and public attributes, recursively.
+    Mutable containers captured by a closure (typically shared state such
+    as an accumulator) are identified by identity, valid in this process
+    only, rather than by their contents.
+    """
+    try:
+        return _fingerprint(component, ())
+    except _Unfingerprintable as e:
+        name = f"{type(component).__module__}.{type(component).__qualname__}"
+        if name not in _warned_uncacheable:
+            _warned_uncacheable.add(name)
+            logger.warning("Step %s is not cached: cannot fingerprint %s; define cache_key() to cache it",
+                           name, e)
+        return None
+
+
+class _Unfingerprintable(Exception):
+    pass
+
+
+# Distinguishes identity-based fingerprints of different processes sharing a persistent cache
+_PROCESS_TOKEN = uuid.uuid4().hex
+_warned_uncacheable: set = set()
+
+
+def _fingerprint(value, seen: tuple):
+    if isinstance(value, _PLAIN_TYPES):
+        return value
+    if isinstance(value, (list, tuple)):
+        return [_fingerprint(v, seen) for v in value]
+    if isinstance(value, dict):
+        if not all(isinstance(k, str) for k in value):
+            raise _Unfingerprintable("dict with non-string keys")
+        return {k: _fingerprint(v, seen) for k, v in value.items()}
+    if isinstance(value, (set, frozenset)):
+        return sorted(repr(_fingerprint(v, seen)) for v in value)
+
+    if id(value) in seen:
+        return {"cycle": _qualname(type(value))}
+    seen = seen + (id(value),)
+
+    cache_key = getattr(value, "cache_key", None)
+    if callable(cache_key) and not isinstance(value, type):
+        return {"class": _qualname(type(value)), "cache_key": _fingerprint(cache_key(), seen)}
+    if isinstance(value, functools.partial):
+        return {"partial": _fingerprint(value.func, seen), "args": _fingerprint(value.args, seen),
+                "keywords": _fingerprint(value.keywords, seen)}
+    if inspect.ismethod(value):
+        return {"method": _fingerprint(value.__func__, seen), "self": _fingerprint(value.__self__, seen)}
+    if inspect.isfunction(value):
+        return {
+            "function": f"{value.__module__}.{value.__qualname__}",
+            "code": _code_digest(value.__code__),
+            "defaults": _fingerprint(value.__defaults__ or (), seen),
+            "kwdefaults": _fingerprint(value.__kwdefaults__ or {}, seen),
+            "closure": [_cell_fingerprint(cell, seen) for cell in value.__closure__ or ()],
+        }
+    if isinstance(value, types.BuiltinFunctionType):
+        owner = value.__self__
+        if owner is not None and not isinstance(owner, types.ModuleType):
+            # Builtin method bound to an instance, e.g. "abc".upper
+            return {"builtin": value.__qualname__, "self": _fingerprint(owner, seen)}
+        return {"ref": value.__module__ or "", "name": value.__qualname__}
+    if isinstance(value, (type, types.ModuleType)):
+        # Classes and modules are identified by name
+        return {"ref": getattr(value, "__module__", ""), "name": getattr(value, "__qualname__", value.__name__)}
+    if hasattr(value, "__dict__"):
+        config = {
+            k: _fingerprint(v, seen) for k, v in sorted(vars(value).items())
+            if not k.startswith("_") and k not in _UNCACHED_ATTRS
+        }
+        return {"class": _qualname(type(value)), "config": config}
+    raise _Unfingerprintable(_qualname(type(value)))
+
+
+def _cell_fingerprint(cell, seen: tuple):
+    try:
+        contents = cell.cell_contents
+    except ValueError:
+        return {"empty_cell": True}
+    if isinstance(contents, (list, dict, set, bytearray)):
+        return {"identity": f"{_PROCESS_TOKEN}:{id(contents)}"}
+    return _fingerprint(contents, seen)
+
+
+def _code_digest(code) -> str:
+    """Hash of a code object's bytecode, names and constants, nested code included."""
+    digest = hashlib.sha256(code.co_code)
+    digest.update(repr(code.co_names).encode("utf-8"))
+    for const in code.co_consts:
+        if isinstance(const, types.CodeType):
+            digest.update(_code_digest(const).encode("utf-8"))
+        else:
+            digest.update(repr(const).encode("utf-8"))
+    return digest.hexdigest()
+
+
+def _qualname(cls) -> str:
+    return f"{cls.__module__}.{cls.__qualname__}"
+
+
+def _file_signature(path) -> Optional[Tuple[int, int]]:
+    """(mtime_ns, size) of a ``file_path`` argument, so edits to the file invalidate cached steps."""
+    if not isinstance(path, str) or not os.path.exists(path):
+        return None
+    stat = os.stat(path)
+    return stat.st_mtime_ns, stat.st_size
+
+
+def _broadcast(values, n: int, name: str) -> list:
+    """Expand a per-item argument (list, single value or None) to ``n`` entries."""
+    if values is None or isinstance(values, str):
+        return [values] * n
+    values = list(values)
+    if len(values) != n:
+        raise ValueError(f"{name} must have one entry per context.")
+    return values
+
+
+_STEP_OPTIONS = {"min_tokens", "skip_if"}
+
+
+def _validate_step_options(name, options) -> dict:
+    if not isinstance(options, dict):
+        raise ValueError(f"Options of step '{name}' must be a dict")
+    unknown = set(options) - _STEP_OPTIONS
+    if unknown:
+        raise ValueError(f"Unknown options for step '{name}': {sorted(unknown)}")
+    if options.get("skip_if") is not None and not callable(options["skip_if"]):
+        raise ValueError(f"skip_if of step '{name}' must be callable")
+    return options
+
+
+def _budget_tokens(text: str) -> int:
+    """Token count used for skip decisions; estimated when metrics are off."""
+    mode = current_metrics_mode()
+    return count_tokens(text, mode="estimate" if mode == "off" else mode)
+
+
+def _step_type(component) -> str:
+    if isinstance(component, BaseOptimizer):
+        return "optimization"
+    if isinstance(component, BaseCompressor):
+        return "compression"
+    return "custom"
+
+
+def _warm_step(component) -> float:
+    """Warm one step up and return the time it took in milliseconds."""
+    start = time.perf_counter()
+    warmup = getattr(component, "warmup", None)
+    if callable(warmup):
+        warmup()
+    elif current_metrics_mode() == "exact":
+        # Custom steps are measured with the default metrics tokenizer
+        get_encoding()
+    return (time.perf_counter() - start) * 1000
+
+
+def _add_trace_details(metadata: StepMetadata, span) -> None:
+    """Copy a step span's measurements into its StepMetadata."""
+    if span is None:
+        return
+    if "cache_hit" in metadata.details:
+        span.set_attribute("cache_hit", metadata.details["cache_hit"])
+    metadata.details.update(
+        wall_ms=span.wall_ms,
+        cpu_ms=span.cpu_ms,
+        peak_memory_bytes=span.peak_memory_bytes,
+        bytes_sent=span.bytes_sent,
+        bytes_received=span.bytes_received,
+    )
+
+
+def _with_deadline(name, component, deadline, kwargs) -> dict:
+    """Check the run deadline before a step and add it to the step's kwargs."""
+    if deadline is None:
+        return kwargs
+    if time.monotonic() >= deadline:
+        raise DeadlineExceededError(f"Pipeline deadline exceeded before step '{name}'")
+    if isinstance(component, (BaseOptimizer, BaseCompressor)):
+        # Custom callables keep their original signature
+        return dict(kwargs, deadline=deadline)
+    return kwargs
+
+
 def make_pipeline(steps) -> Pipeline:
     """
     Helper function to create a pipeline.
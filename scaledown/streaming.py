@@ -0,0 +1,298 @@
+"""
+Streaming execution of a pipeline over an iterable of documents.
+
+Every pipeline step runs as a stage with its own workers, and stages are
+connected by bounded queues. A slow stage therefore blocks its producers
+instead of letting work pile up in memory, and at most ``max_in_flight``
+documents are held at any time. CPU-bound steps can run in a process
+pool so they scale across cores despite the GIL; I/O-bound steps (the
+ScaleDown API) run on threads.
+"""
+import contextvars
+import itertools
+import multiprocessing
+import os
+import queue
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Union
+
+from scaledown.config import _default_start_method
+from scaledown.types import PipelineResult, StepMetadata
+from scaledown.types.metrics import _token_memo, current_metrics_mode, metrics_mode
+
+_DONE = object()
+_POLL = 0.1  # seconds between checks of the stop flag while blocked
+
+# Components of process stages, installed once per worker process
+_WORKER_COMPONENTS: Dict[int, Any] = {}
+_stage_ids = itertools.count()
+
+
+@dataclass
+class _Item:
+    index: int
+    original: str
+    context: str
+    kwargs: Dict[str, Any]
+    history: List[StepMetadata] = field(default_factory=list)
+    error: Optional[Exception] = None
+    memo: dict = field(default_factory=dict)
+
+
+class StreamExecutor:
+    """
+    Run a linear ``Pipeline`` over a stream of inputs, one stage per step.
+
+    Usually created through ``Pipeline.stream``.
+
+    Parameters
+    ----------
+    pipeline : Pipeline
+    workers : int or dict, optional
+        Workers per stage, as one number for every stage or a
+        ``{step_name: n}`` mapping. Defaults to ``os.cpu_count()`` for
+        process stages and 4 for thread stages.
+    executors : dict, optional
+        ``{step_name: 'thread' | 'process'}``; stages default to threads.
+        Components of process stages must be picklable; they are sent to
+        each worker process once.
+    queue_size : int, default=32
+        Capacity of the queue in front of each stage.
+    ordered : bool, default=True
+        Yield results in input order. Otherwise results are yielded as they
+        finish; ``PipelineResult.index`` gives their input position.
+    max_in_flight : int, optional
+        Documents admitted but not yet yielded. Defaults to
+        ``queue_size * (number of steps + 1)``.
+    """
+
+    def __init__(self, pipeline, workers: Union[int, Dict[str, int], None] = None,
+                 executors: Optional[Dict[str, str]] = None, queue_size: int = 32,
+                 ordered: bool = True, max_in_flight: Optional[int] = None):
+        executors = executors or {}
+        names = [name for name, _ in pipeline.steps]
+        unknown = (set(executors) | (set(workers) if isinstance(workers, dict) else set())) - set(names)
+        if unknown:
+            raise ValueError(f"Unknown steps: {sorted(unknown)}")
+        for name, kind in executors.items():
+            if kind not in ("thread", "process"):
+                raise ValueError(f"Executor of step '{name}' must be 'thread' or 'process'")
+
+        self.pipeline = pipeline
+        self.executors = {name: executors.get(name, "thread") for name in names}
+        self.workers = {}
+        for name in names:
+            n = workers.get(name) if isinstance(workers, dict) else workers
+            if n is None:
+                n = (os.cpu_count() or 1) if self.executors[name] == "process" else 4
+            if n < 1:
+                raise ValueError(f"Step '{name}' needs at least one worker")
+            self.workers[name] = n
+        self.queue_size = queue_size
+        self.ordered = ordered
+        self.max_in_flight = max_in_flight or queue_size * (len(names) + 1)
+
+    def run(self, items: Iterable[Union[str, dict]], **kwargs) -> Iterator[PipelineResult]:
+        """
+        Yield one PipelineResult per input.
+
+        Items are contexts, or dicts with a ``context`` key and per-item run
+        arguments (``prompt``, ``query``, ``file_path``, ...) that override
+        ``kwargs``. A failing item keeps the output of its last successful
+        step and has its exception in ``PipelineResult.error``.
+        """
+        stop = threading.Event()
+        admitted = threading.Semaphore(self.max_in_flight)
+        queues = [queue.Queue(maxsize=self.queue_size) for _ in range(len(self.pipeline.steps) + 1)]
+        source_error: List[BaseException] = []
+        pools = []
+        threads = []
+
+        def feed():
+            try:
+                for index, item in enumerate(items):
+                    while not admitted.acquire(timeout=_POLL):
+                        if stop.is_set():
+                            return
+                    if not _put(queues[0], _make_item(index, item, kwargs), stop):
+                        return
+            except BaseException as e:
+                source_error.append(e)
+            finally:
+                _put(queues[0], _DONE, stop)
+
+        # Stage threads run in a copy of the caller's context with the pipeline's metrics mode
+        with metrics_mode(self.pipeline.metrics_mode):
+            parent_context = contextvars.copy_context()
+            mode = current_metrics_mode()
+        feeder = threading.Thread(target=feed, name="scaledown-stream-feed", daemon=True)
+
+        for position, (name, component) in enumerate(self.pipeline.steps):
+            if self.executors[name] == "process":
+                stage_id = next(_stage_ids)
+                pool = ProcessPoolExecutor(max_workers=self.workers[name],
+                                           mp_context=multiprocessing.get_context(_default_start_method()),
+                                           initializer=_install_component, initargs=(stage_id, component))
+                pools.append(pool)
+                call = _process_call(pool, stage_id, mode)
+            else:
+                call = lambda context, step_kwargs, run_kwargs, component=component: \
+                    self.pipeline._call_step(component, context, step_kwargs, run_kwargs)
+            stage = _Stage(self.pipeline, name, component, call, queues[position],
+                           queues[position + 1], self.workers[name], stop)
+            for i in range(self.workers[name]):
+                threads.append(threading.Thread(
+                    target=parent_context.copy().run, args=(stage.work,),
+                    name=f"scaledown-stream-{name}-{i}", daemon=True
+                ))
+
+        feeder.start()
+        for thread in threads:
+            thread.start()
+
+        try:
+            yield from self._collect(queues[-1], admitted, mode)
+            if source_error:
+                raise source_error[0]
+        finally:
+            stop.set()
+            # The feeder may be blocked inside the source iterator; it exits on its own
+            for thread in threads:
+                thread.join()
+            for pool in pools:
+                pool.shutdown(cancel_futures=True)
+
+    def _collect(self, results: queue.Queue, admitted: threading.Semaphore,
+                 mode: str) -> Iterator[PipelineResult]:
+        finished: Dict[int, _Item] = {}
+        next_index = 0
+        while True:
+            item = results.get()
+            if item is _DONE:
+                break
+            if not self.ordered:
+                admitted.release()
+                yield _result(item, mode)
+                continue
+            finished[item.index] = item
+            while next_index in finished:
+                admitted.release()
+                yield _result(finished.pop(next_index), mode)
+                next_index += 1
+
+
+class _Stage:
+    """Workers of one step: take items from ``inbox``, run the step, pass them on."""
+
+    def __init__(self, pipeline, name, component, call, inbox, outbox, workers, stop):
+        self.pipeline = pipeline
+        self.name = name
+        self.component = component
+        self.call = call
+        self.inbox = inbox
+        self.outbox = outbox
+        self.stop = stop
+        self._remaining = workers
+        self._lock = threading.Lock()
+
+    def work(self) -> None:
+        while True:
+            item = _get(self.inbox, self.stop)
+            if item is None:
+                return
+            if item is _DONE:
+                # Let sibling workers see the end too; the last one forwards it
+                _put(self.inbox, _DONE, self.stop)
+                with self._lock:
+                    self._remaining -= 1
+                    last = self._remaining == 0
+                if last:
+                    _put(self.outbox, _DONE, self.stop)
+                return
+            if item.error is None:
+                self._process(item)
+            if not _put(self.outbox, item, self.stop):
+                return
+
+    def _process(self, item: _Item) -> None:
+        pipeline, name, component = self.pipeline, self.name, self.component
+        # Reuse the item's token counts across stages
+        token = _token_memo.set(item.memo)
+        try:
+            reason = pipeline._skip_reason(name, item.context)
+            if reason:
+                item.history.append(pipeline._skipped_metadata(name, component, item.context, reason))
+                return
+            key, result = pipeline._cache_lookup(name, component, item.context, item.kwargs)
+            cache_hit = result is not None
+            if not cache_hit:
+                result = self.call(item.context, item.kwargs, item.kwargs)
+                pipeline._cache_store(key, result)
+            item.context, metadata = pipeline._step_metadata(
+                name, component, item.context, result, cache_hit=cache_hit if key else None
+            )
+            item.history.append(metadata)
+        except Exception as e:
+            item.error = e
+        finally:
+            _token_memo.reset(token)
+
+
+def _make_item(index: int, item: Union[str, dict], kwargs: dict) -> _Item:
+    if isinstance(item, dict):
+        item = dict(item)
+        context = item.pop("context")
+        item_kwargs = dict(kwargs, **item)
+    else:
+        context, item_kwargs = item, kwargs
+    return _Item(index=index, original=context, context=context, kwargs=item_kwargs)
+
+
+def _result(item: _Item, mode: str) -> PipelineResult:
+    return PipelineResult(
+        final_content=item.context,
+        original_content=item.original,
+        history=item.history,
+        metrics_mode=mode,
+        error=item.error,
+        index=item.index,
+    )
+
+
+def _put(q: queue.Queue, item, stop: threading.Event) -> bool:
+    """Put with backpressure; give up (return False) once the stream is stopped."""
+    while not stop.is_set():
+        try:
+            q.put(item, timeout=_POLL)
+            return True
+        except queue.Full:
+            continue
+    return False
+
+
+def _get(q: queue.Queue, stop: threading.Event):
+    while not stop.is_set():
+        try:
+            return q.get(timeout=_POLL)
+        except queue.Empty:
+            continue
+    return None
+
+
+def _process_call(pool: ProcessPoolExecutor, stage_id: int, mode: str):
+    def call(context, step_kwargs, run_kwargs):
+        return pool.submit(_call_in_worker, stage_id, mode, context, step_kwargs, run_kwargs).result()
+    return call
+
+
+def _install_component(stage_id: int, component) -> None:
+    _WORKER_COMPONENTS[stage_id] = component
+
+
+def _call_in_worker(stage_id, mode, context, step_kwargs, run_kwargs):
+    from scaledown.pipeline import Pipeline
+    # Count tokens in the pipeline's metrics mode, as thread stages do
+    with metrics_mode(mode):
+        return Pipeline._call_step(_WORKER_COMPONENTS[stage_id], context, step_kwargs, run_kwargs)
@@ -0,0 +1,276 @@
+"""
+Lightweight tracing of pipeline runs.
+
+A ``Tracer`` records a tree of ``Span`` objects: one root span per
+pipeline run and one child span per step. Each span measures wall time,
+CPU time of the thread that ran it, peak traced memory (``tracemalloc``)
+and the bytes sent to and received from the ScaleDown API. Slow runs can
+be captured with ``cProfile``.
+
+Spans use OpenTelemetry's vocabulary (names, attributes, epoch
+nanosecond timestamps) without depending on it; ``OpenTelemetryExporter``
+replays finished traces into an OpenTelemetry tracer when the SDK is
+installed.
+"""
+import contextvars
+import cProfile
+import io
+import logging
+import pstats
+import threading
+import time
+import tracemalloc
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+logger = logging.getLogger(__name__)
+
+_current_span: contextvars.ContextVar[Optional["Span"]] = contextvars.ContextVar(
+    "scaledown_current_span", default=None
+)
+_io_lock = threading.Lock()
+
+
+@dataclass
+class Span:
+    """
+    One timed operation in a trace.
+
+    ``cpu_ms`` is the CPU time of the thread that entered the span.
+    ``peak_memory_bytes`` is the peak of memory traced by ``tracemalloc``
+    above the level at entry; it is process-wide, so spans that overlap in
+    time (concurrent DAG nodes) see each other's allocations. Network byte
+    counts include those of child spans.
+    """
+    name: str
+    attributes: Dict[str, Any] = field(default_factory=dict)
+    parent: Optional["Span"] = field(default=None, repr=False)
+    children: List["Span"] = field(default_factory=list, repr=False)
+    start_ns: int = 0
+    end_ns: int = 0
+    wall_ms: float = 0.0
+    cpu_ms: float = 0.0
+    peak_memory_bytes: Optional[int] = None
+    bytes_sent: int = 0
+    bytes_received: int = 0
+    profile: Optional[str] = field(default=None, repr=False)
+    tracer: Optional["Tracer"] = field(default=None, repr=False, compare=False)
+
+    def set_attribute(self, key: str, value: Any) -> None:
+        self.attributes[key] = value
+
+    def __enter__(self) -> "Span":
+        tracer = self.tracer
+        self._token = _current_span.set(self)
+        if tracer is not None and tracer.memory:
+            _start_tracemalloc()
+            current, peak = tracemalloc.get_traced_memory()
+            if self.parent is not None:
+                self.parent._peak = max(getattr(self.parent, "_peak", 0), peak)
+            tracemalloc.reset_peak()
+            self._memory_start = self._peak = current
+
+        self._profiler = None
+        if tracer is not None and tracer.profile_threshold_ms is not None and self.parent is None:
+            profiler = cProfile.Profile()
+            try:
+                profiler.enable()
+                self._profiler = profiler
+            except ValueError:
+                # Another profiler is already active on this thread
+                pass
+
+        self.start_ns = time.time_ns()
+        self._wall_start = time.perf_counter()
+        self._cpu_start = time.thread_time()
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        self.wall_ms = (time.perf_counter() - self._wall_start) * 1000
+        self.cpu_ms = (time.thread_time() - self._cpu_start) * 1000
+        self.end_ns = time.time_ns()
+        _current_span.reset(self._token)
+        if exc is not None:
+            self.attributes["error"] = type(exc).__name__
+
+        if self._profiler is not None:
+            self._profiler.disable()
+            if self.wall_ms >= self.tracer.profile_threshold_ms:
+                stream = io.StringIO()
+                stats = pstats.Stats(self._profiler, stream=stream)
+                stats.sort_stats("cumulative").print_stats(self.tracer.profile_limit)
+                self.profile = stream.getvalue()
+
+        if hasattr(self, "_memory_start"):
+            self._peak = max(self._peak, tracemalloc.get_traced_memory()[1])
+            self.peak_memory_bytes = max(self._peak - self._memory_start, 0)
+            if self.parent is not None:
+                self.parent._peak = max(getattr(self.parent, "_peak", 0), self._peak)
+            _stop_tracemalloc()
+
+        if self.parent is None and self.tracer is not None:
+            self.tracer._finish(self)
+
+    def walk(self) -> Iterable["Span"]:
+        """This span and all its descendants, depth first."""
+        yield self
+        for child in self.children:
+            yield from child.walk()
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "name": self.name,
+            "attributes": dict(self.attributes),
+            "start_ns": self.start_ns,
+            "end_ns": self.end_ns,
+            "wall_ms": self.wall_ms,
+            "cpu_ms": self.cpu_ms,
+            "peak_memory_bytes": self.peak_memory_bytes,
+            "bytes_sent": self.bytes_sent,
+            "bytes_received": self.bytes_received,
+            "children": [child.to_dict() for child in self.children],
+        }
+
+
+class Tracer:
+    """
+    Creates spans and hands finished traces to exporters.
+
+    Parameters
+    ----------
+    memory : bool, default=True
+        Measure peak memory with ``tracemalloc``. Tracing allocations slows
+        allocation-heavy code noticeably; disable it for low-overhead
+        production tracing.
+    profile_threshold_ms : float, optional
+        Profile root spans with ``cProfile`` and keep the report in
+        ``Span.profile`` when the span takes at least this long. Only the
+        thread that opened the root span is profiled.
+    profile_limit : int, default=30
+        Number of functions in a profile report.
+    exporters : list of callables, optional
+        Called with each finished root span, e.g. ``OpenTelemetryExporter()``.
+
+    Example
+    -------
+    >>> tracer = Tracer(profile_threshold_ms=500)
+    >>> pipe = Pipeline([...], tracer=tracer)
+    >>> result = pipe.run(code, prompt="Explain")
+    >>> for span in result.trace.children:
+    ...     print(span.name, span.wall_ms, span.cpu_ms, span.bytes_sent)
+    """
+
+    def __init__(self, memory: bool = True, profile_threshold_ms: Optional[float] = None,
+                 profile_limit: int = 30,
+                 exporters: Optional[List[Callable[[Span], None]]] = None):
+        self.memory = memory
+        self.profile_threshold_ms = profile_threshold_ms
+        self.profile_limit = profile_limit
+        self.exporters = list(exporters or [])
+
+    def span(self, name: str, parent: Optional[Span] = None, **attributes) -> Span:
+        """
+        Create a span; enter it (``with``) to start timing.
+
+        The parent defaults to the span active in the current context.
+        """
+        parent = parent if parent is not None else _current_span.get()
+        span = Span(name=name, attributes=attributes, parent=parent, tracer=self)
+        if parent is not None:
+            with _io_lock:
+                parent.children.append(span)
+        return span
+
+    def _finish(self, span: Span) -> None:
+        for exporter in self.exporters:
+            try:
+                exporter(span)
+            except Exception:
+                logger.exception("Trace exporter %r failed", exporter)
+
+
+_tracemalloc_users = 0
+_tracemalloc_owned = False
+
+
+def _start_tracemalloc() -> None:
+    # Reference-counted so overlapping traces do not stop each other's tracing;
+    # tracing started by the application is left running
+    global _tracemalloc_users, _tracemalloc_owned
+    with _io_lock:
+        if _tracemalloc_users == 0 and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            _tracemalloc_owned = True
+        _tracemalloc_users += 1
+
+
+def _stop_tracemalloc() -> None:
+    global _tracemalloc_users, _tracemalloc_owned
+    with _io_lock:
+        _tracemalloc_users -= 1
+        if _tracemalloc_users == 0 and _tracemalloc_owned:
+            tracemalloc.stop()
+            _tracemalloc_owned = False
+
+
+def current_span() -> Optional[Span]:
+    """The span active in the current context, if any."""
+    return _current_span.get()
+
+
+def record_bytes(sent: int = 0, received: int = 0) -> None:
+    """Add network traffic to the current span and its ancestors; no-op outside a trace."""
+    span = _current_span.get()
+    if span is None:
+        return
+    with _io_lock:
+        while span is not None:
+            span.bytes_sent += sent
+            span.bytes_received += received
+            span = span.parent
+
+
+class OpenTelemetryExporter:
+    """
+    Replay finished traces into an OpenTelemetry tracer.
+
+    Requires ``opentelemetry-api`` (``pip install scaledown[otel]``); spans
+    go to whatever tracer provider the application has configured.
+    """
+
+    def __init__(self, tracer_name: str = "scaledown"):
+        try:
+            from opentelemetry import trace
+        except ImportError:
+            raise ImportError(
+                "OpenTelemetryExporter requires opentelemetry-api. "
+                "Install with `pip install scaledown[otel]`"
+            )
+        self._trace = trace
+        self._tracer = trace.get_tracer(tracer_name)
+
+    def __call__(self, span: Span, parent=None) -> None:
+        context = self._trace.set_span_in_context(parent) if parent is not None else None
+        otel_span = self._tracer.start_span(
+            span.name, context=context, start_time=span.start_ns,
+            attributes=_otel_attributes(span)
+        )
+        for child in span.children:
+            self(child, parent=otel_span)
+        otel_span.end(end_time=span.end_ns)
+
+
+def _otel_attributes(span: Span) -> Dict[str, Any]:
+    attributes = {
+        f"scaledown.{key}": value for key, value in span.attributes.items()
+        if isinstance(value, (str, bool, int, float))
+    }
+    attributes.update({
+        "scaledown.wall_ms": span.wall_ms,
+        "scaledown.cpu_ms": span.cpu_ms,
+        "scaledown.bytes_sent": span.bytes_sent,
+        "scaledown.bytes_received": span.bytes_received,
+    })
+    if span.peak_memory_bytes is not None:
+        attributes["scaledown.peak_memory_bytes"] = span.peak_memory_bytes
+    return attributes
@@ -1,5 +1,5 @@
 from dataclasses import dataclass
-from typing import Tuple, Dict, Any
+from typing import Tuple, Dict, Any, Optional
 
 @dataclass
 class CompressedPrompt:
@@ -8,6 +8,9 @@ class CompressedPrompt:
     tokens: Tuple[int, int]  # (original, compressed)
     latency: float
     model: str
+    cached: bool = False
+    passthrough: bool = False  # uncompressed context returned while the API was unavailable
+    index: Optional[int] = None  # position in the input stream (compress_iter)
     
     @property
     def compression_ratio(self) -> float:
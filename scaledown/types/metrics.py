@@ -1,4 +1,8 @@
+from contextlib import contextmanager
+from contextvars import ContextVar
 from dataclasses import dataclass
+from functools import lru_cache
+from typing import Iterable, List, Optional
 import logging
 logger = logging.getLogger(__name__)
 try:
@@ -7,30 +11,141 @@ try:
 except ImportError:
     tiktoken = None
 
-def count_tokens(text: str, model: str = "gpt-4o") -> int:
+from ..config import get_metrics_mode, _validate_metrics_mode
+from .estimator import estimate_tokens
+
+# Below this many characters in total, a thread pool costs more than it saves
+_BATCH_MIN_CHARS = 20_000
+
+# Per-context override of the global metrics mode (set by Pipeline)
+_mode_override: ContextVar[Optional[str]] = ContextVar("scaledown_metrics_mode", default=None)
+
+def current_metrics_mode() -> str:
+    """Metrics mode in effect: the innermost ``metrics_mode`` scope, else the global setting."""
+    return _mode_override.get() or get_metrics_mode()
+
+@contextmanager
+def metrics_mode(mode: Optional[str]):
+    """Use ``mode`` for token metrics inside the block (``None`` keeps the current one)."""
+    if mode is None:
+        yield
+        return
+    token = _mode_override.set(_validate_metrics_mode(mode))
+    try:
+        yield
+    finally:
+        _mode_override.reset(token)
+
+# Token counts memoized for the duration of a pipeline run: (model, mode, text) -> count
+_token_memo: ContextVar[Optional[dict]] = ContextVar("scaledown_token_memo", default=None)
+
+@contextmanager
+def token_count_scope():
     """
-    Count tokens using tiktoken. 
-    
-    If the provided model is not compatible with tiktoken (e.g., Claude, Llama),
-    it falls back to 'cl100k_base' (GPT-4) encoding to ensure a standard metric.
+    Memoize token counts inside the block, so each text is tokenized at most
+    once per model and mode. Nested scopes share the outermost memo.
+    """
+    if _token_memo.get() is not None:
+        yield
+        return
+    token = _token_memo.set({})
+    try:
+        yield
+    finally:
+        _token_memo.reset(token)
+
+@lru_cache(maxsize=None)
+def get_encoding(model: str = "gpt-4o"):
+    """
+    Return the tiktoken encoding for ``model``, resolved once per model.
+
+    Models unknown to tiktoken (e.g., Claude, Llama) fall back to
+    'cl100k_base' (GPT-4) encoding to ensure a standard metric.
     """
-    if not text:
-        return 0
-        
     if tiktoken is None:
         raise ImportError(
             "tiktoken is required for accurate metrics. "
             "Install it with: pip install tiktoken"
         )
-            
+
     try:
-        encoding = tiktoken.encoding_for_model(model)
+        return tiktoken.encoding_for_model(model)
     except KeyError:
         # Fallback for non-OpenAI models to a standard encoding
         logger.debug(f"Model '{model}' not found in tiktoken. Defaulting to cl100k_base.")
-        encoding = tiktoken.get_encoding("cl100k_base")
-        
-    return len(encoding.encode(text))
+        return tiktoken.get_encoding("cl100k_base")
+
+def count_tokens(text: str, model: str = "gpt-4o", mode: Optional[str] = None) -> int:
+    """
+    Count tokens using tiktoken. 
+    
+    If the provided model is not compatible with tiktoken (e.g., Claude, Llama),
+    it falls back to 'cl100k_base' (GPT-4) encoding to ensure a standard metric.
+
+    ``mode`` ('exact', 'estimate' or 'off') defaults to ``current_metrics_mode()``.
+    'estimate' uses the fast estimator and does not need tiktoken; 'off' returns 0.
+    """
+    if not text:
+        return 0
+
+    mode = mode or current_metrics_mode()
+    if mode == "off":
+        return 0
+    memo = _token_memo.get()
+    if memo is not None:
+        count = memo.get((model, mode, text))
+        if count is not None:
+            return count
+    if mode == "estimate":
+        count = estimate_tokens(text, model)
+    else:
+        count = len(get_encoding(model).encode(text))
+    if memo is not None:
+        memo[(model, mode, text)] = count
+    return count
+
+def count_tokens_many(texts: Iterable[str], model: str = "gpt-4o", num_threads: int = 8,
+                      mode: Optional[str] = None) -> List[int]:
+    """
+    Count tokens of several texts at once.
+
+    Uses tiktoken's batch encoder, which spreads large batches over
+    ``num_threads`` threads. Returns one count per text, in order.
+    ``mode`` works as in ``count_tokens``.
+    """
+    texts = list(texts)
+    counts = [0] * len(texts)
+    mode = mode or current_metrics_mode()
+    if mode == "off":
+        return counts
+
+    memo = _token_memo.get()
+    todo = []
+    for i, text in enumerate(texts):
+        if not text:
+            continue
+        cached = memo.get((model, mode, text)) if memo is not None else None
+        if cached is None:
+            todo.append(i)
+        else:
+            counts[i] = cached
+    if not todo:
+        return counts
+
+    batch = [texts[i] for i in todo]
+    if mode == "estimate":
+        batch_counts = [estimate_tokens(text, model) for text in batch]
+    else:
+        encoding = get_encoding(model)
+        if len(batch) > 1 and num_threads > 1 and sum(map(len, batch)) >= _BATCH_MIN_CHARS:
+            batch_counts = [len(ids) for ids in encoding.encode_batch(batch, num_threads=num_threads)]
+        else:
+            batch_counts = [len(encoding.encode(text)) for text in batch]
+    for i, count in zip(todo, batch_counts):
+        counts[i] = count
+        if memo is not None:
+            memo[(model, mode, texts[i])] = count
+    return counts
 
 @dataclass
 class OptimizerMetrics:
@@ -41,6 +156,10 @@ class OptimizerMetrics:
     latency_ms: float
     retrieval_mode: str
     ast_fidelity: float
+    token_count_mode: str = "exact"  # metrics mode that produced the token counts
+    # Process-wide hit rates of HASTE's parse and result caches, when they were used
+    parse_cache_hit_rate: Optional[float] = None
+    result_cache_hit_rate: Optional[float] = None
 
 @dataclass
 class CompressorMetrics:
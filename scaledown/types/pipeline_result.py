@@ -1,5 +1,5 @@
 from dataclasses import dataclass, field
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional
 
 @dataclass
 class StepMetadata:
@@ -21,6 +21,10 @@ class PipelineResult:
     final_content: str
     original_content: str
     history: List[StepMetadata] = field(default_factory=list)
+    metrics_mode: str = "exact"  # how token counts of optimizer and custom steps were computed
+    error: Optional[Exception] = None  # set by Pipeline.run_batch when this item failed
+    trace: Optional[Any] = field(default=None, repr=False)  # root tracing Span when the pipeline has a tracer
+    index: Optional[int] = None  # input position, set by Pipeline.stream
 
     @property
     def original_tokens(self) -> int:
@@ -35,6 +39,11 @@ class PipelineResult:
         if self.final_tokens == 0: return 0.0
         return self.original_tokens / self.final_tokens
 
+    @property
+    def skipped_steps(self) -> List[str]:
+        """Names of the steps that were skipped by a skip condition or the token target."""
+        return [step.step_name for step in self.history if step.details.get("skipped")]
+
     @property
     def savings_percent(self) -> float:
         if self.original_tokens == 0: return 0.0
@@ -0,0 +1,122 @@
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+
+class _StubAPIHandler(BaseHTTPRequestHandler):
+    """Minimal stand-in for the ScaleDown /compress/raw endpoint."""
+    protocol_version = "HTTP/1.1"
+
+    def do_HEAD(self):
+        # Used by compressor warmup to open a connection
+        self.send_response(405)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length", 0))
+        payload = json.loads(self.rfile.read(length) or b"{}")
+        self.server.requests_seen.append(payload)
+        delay = self.server.delays.pop(0) if self.server.delays else self.server.delay
+        if delay:
+            time.sleep(delay)
+
+        if self.server.fail_next:
+            status, headers = self.server.fail_next.pop(0)
+            self.send_response(status)
+            for name, value in headers.items():
+                self.send_header(name, value)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+
+        if self.server.bodies:
+            self._send_body(self.server.bodies.pop(0))
+            return
+
+        context = payload.get("context", "")
+        body = json.dumps({
+            "results": {
+                "compressed_prompt": context[: max(len(context) // 2, 1)],
+                "original_prompt_tokens": len(context.split()),
+                "compressed_prompt_tokens": max(len(context.split()) // 2, 1),
+            },
+            "latency_ms": 1,
+            "model_used": payload.get("model"),
+        }).encode("utf-8")
+
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _send_body(self, body):
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture
+def stub_api(monkeypatch):
+    """Run a local HTTP server and point SCALEDOWN_API_URL at it."""
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _StubAPIHandler)
+    server.requests_seen = []
+    server.fail_next = []  # (status, headers) responses to send before succeeding
+    server.delay = 0.0
+    server.delays = []  # per-request delays, used before falling back to ``delay``
+    server.bodies = []  # raw 200 response bodies to send before the normal ones
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+
+    url = f"http://127.0.0.1:{server.server_address[1]}"
+    monkeypatch.setenv("SCALEDOWN_API_URL", url)
+    yield server
+
+    server.shutdown()
+    server.server_close()
+
+
+class _CharEncoding:
+    """Offline stand-in for a tiktoken encoding: one token per character."""
+    name = "char"
+
+    def encode(self, text, **kwargs):
+        return [ord(c) for c in text]
+
+    def decode(self, ids):
+        return "".join(chr(i) for i in ids)
+
+    def decode_bytes(self, ids):
+        return self.decode(ids).encode("utf-8")
+
+    def encode_batch(self, texts, num_threads=8, **kwargs):
+        return [self.encode(text) for text in texts]
+
+
+class _FakeTiktoken:
+    @staticmethod
+    def encoding_for_model(model):
+        return _CharEncoding()
+
+    @staticmethod
+    def get_encoding(name):
+        return _CharEncoding()
+
+
+@pytest.fixture
+def char_tokens(monkeypatch):
+    """Replace tiktoken with a character-level tokenizer (no BPE download needed)."""
+    from scaledown.types import metrics
+    monkeypatch.setattr(metrics, "tiktoken", _FakeTiktoken)
+    metrics.get_encoding.cache_clear()
+    yield
+    metrics.get_encoding.cache_clear()
@@ -0,0 +1,79 @@
+import time
+import pytest
+import scaledown as sd
+from scaledown.compressor import CircuitBreaker
+from scaledown.compressor.throttle import Throttle, RetryPolicy
+
+def test_breaker_opens_and_recovers():
+    breaker = CircuitBreaker(min_calls=4, failure_rate_threshold=0.5, reset_timeout=0.1)
+    changes = []
+    breaker.add_listener(lambda old, new: changes.append((old, new)))
+
+    for failed in (False, True, False, True):
+        assert breaker.allow()
+        breaker.record(failed)
+    assert breaker.state == "open"
+    assert not breaker.allow()
+
+    time.sleep(0.15)
+    assert breaker.allow()       # probe
+    assert not breaker.allow()   # only one probe at a time
+    breaker.record(False)
+    assert breaker.state == "closed"
+    assert changes == [("closed", "open"), ("open", "half_open"), ("half_open", "closed")]
+    assert breaker.stats().rejected == 2
+
+def test_breaker_opens_on_slow_calls():
+    breaker = CircuitBreaker(min_calls=2, slow_call_threshold=0.5, slow_call_rate_threshold=1.0)
+    breaker.record(False, latency=1.0)
+    breaker.record(False, latency=2.0)
+    assert breaker.state == "open"
+
+def test_open_circuit_fails_fast(stub_api):
+    comp = sd.ScaleDownCompressor(
+        api_key="test_key", breaker=CircuitBreaker(min_calls=2),
+        throttle=Throttle(retry=RetryPolicy(max_retries=0)),
+    )
+    stub_api.fail_next = [(503, {}), (503, {})]
+    for _ in range(2):
+        with pytest.raises(sd.APIError):
+            comp.compress("one two", "p")
+
+    with pytest.raises(sd.CircuitOpenError):
+        comp.compress("one two", "p")
+    assert len(stub_api.requests_seen) == 2
+    assert comp.breaker_stats().state == "open"
+
+def test_passthrough_fallback(stub_api, char_tokens):
+    breaker = CircuitBreaker(min_calls=1)
+    breaker.record(failed=True)
+    comp = sd.ScaleDownCompressor(api_key="test_key", breaker=breaker, fallback="passthrough")
+
+    result = comp.compress("one two three", "p")
+    assert result.content == "one two three"
+    assert result.passthrough
+    assert result.tokens == (13, 13)
+    assert stub_api.requests_seen == []
+
+def test_passthrough_on_api_error(stub_api, caplog):
+    from scaledown.types.metrics import metrics_mode
+    stub_api.fail_next = [(500, {})] * 10
+    comp = sd.ScaleDownCompressor(api_key="test_key", breaker=False, fallback="passthrough")
+
+    with metrics_mode("off"):
+        result = comp.compress("one two three", "p")
+    assert result.content == "one two three"
+    assert result.passthrough
+    assert result.tokens == (0, 0)
+    assert "passing the context through" in caplog.text
+
+@pytest.mark.parametrize("body", [b"not json", b"[1, 2]"])
+def test_passthrough_on_malformed_body(stub_api, body):
+    import asyncio
+    pytest.importorskip("httpx")
+    comp = sd.ScaleDownCompressor(api_key="test_key", breaker=False, fallback="passthrough")
+
+    stub_api.bodies = [body]
+    assert comp.compress("one two three", "p").passthrough
+    stub_api.bodies = [body]
+    assert asyncio.run(comp.acompress("one two three", "p")).passthrough
@@ -0,0 +1,93 @@
+import time
+import pytest
+import scaledown as sd
+from scaledown.cache import LRUCache, SQLiteCache, TieredCache, hash_key
+
+def test_hash_key_is_stable():
+    assert hash_key("a", {"x": 1, "y": 2}) == hash_key("a", {"y": 2, "x": 1})
+    assert hash_key("a", 1) != hash_key("a", 2)
+
+def test_lru_eviction_and_stats():
+    cache = LRUCache(max_entries=2)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    assert cache.get("a") == 1  # "b" is now least recently used
+    cache.set("c", 3)
+
+    assert cache.get("b") is None
+    assert cache.get("c") == 3
+
+    stats = cache.stats()
+    assert (stats.hits, stats.misses, stats.evictions) == (2, 1, 1)
+
+def test_ttl_expiry(tmp_path):
+    for cache in (LRUCache(ttl=0.01), SQLiteCache(str(tmp_path / "c.db"), ttl=0.01)):
+        cache.set("k", "v")
+        time.sleep(0.02)
+        assert cache.get("k") is None
+        assert cache.stats().expirations == 1
+
+def test_sqlite_cache_is_shared_between_instances(tmp_path):
+    path = str(tmp_path / "cache.db")
+    SQLiteCache(path).set("k", {"value": 42})
+
+    assert SQLiteCache(path).get("k") == {"value": 42}
+
+def test_sqlite_max_entries(tmp_path):
+    cache = SQLiteCache(str(tmp_path / "c.db"), max_entries=2)
+    for i in range(4):
+        cache.set(str(i), i)
+
+    assert len(cache) == 2
+    assert cache.stats().evictions == 2
+
+def test_tiered_cache_promotes_disk_hits(tmp_path):
+    path = str(tmp_path / "cache.db")
+    TieredCache(path).set("k", "v")
+
+    cache = TieredCache(path, max_entries=4)
+    assert cache.get("k") == "v"
+    assert cache.get("k") == "v"
+
+    assert cache.disk.stats().hits == 1
+    assert cache.memory.stats().hits == 1
+    assert cache.stats().hits == 2
+
+def test_tiered_cache_promotion_keeps_expiry(tmp_path, monkeypatch):
+    from types import SimpleNamespace
+    from scaledown import cache as cache_module
+    now = [1000.0]
+    monkeypatch.setattr(cache_module, "time", SimpleNamespace(time=lambda: now[0]))
+    cache = TieredCache(str(tmp_path / "cache.db"), ttl=3600)
+    cache.set("k", "v", ttl=5)
+    cache.memory.clear()
+
+    assert cache.get("k") == "v"
+    assert cache.disk.stats().hits == 1
+    now[0] += 6
+    assert cache.get("k") is None
+
+def test_compressor_cache_hit(stub_api, tmp_path):
+    comp = sd.ScaleDownCompressor(api_key="test_key", cache=TieredCache(str(tmp_path / "c.db")))
+
+    first = comp.compress("one two three four", "p")
+    second = comp.compress("one two three four", "p")
+    other = comp.compress("one two three four", "p", max_tokens=10)
+
+    assert len(stub_api.requests_seen) == 2
+    assert not first.cached and not other.cached
+    assert second.cached
+    assert second.content == first.content
+    assert comp.cache_stats().hits == 1
+
+def test_lru_max_bytes():
+    cache = LRUCache(max_entries=10, max_bytes=10, sizeof=len)
+    cache.set("a", "xxxx")
+    cache.set("b", "yyyy")
+    cache.set("c", "zzzz")  # 12 bytes: "a" is evicted
+
+    assert cache.get("a") is None
+    assert cache.size_bytes == 8
+    cache.set("b", "y")
+    assert cache.size_bytes == 5
+    assert cache.stats().evictions == 1
@@ -1,7 +1,9 @@
 import pytest
+import asyncio
 import os
 from unittest.mock import patch, MagicMock
 import scaledown as sd
+from scaledown.compressor import SessionPool
 
 @pytest.fixture
 def compressor():
@@ -17,7 +19,7 @@ def test_missing_api_key(monkeypatch):
     with pytest.raises(sd.AuthenticationError):
         comp.compress("context", "prompt")
 
-@patch('requests.post')
+@patch('requests.Session.post')
 def test_successful_compression(mock_post, compressor):
     mock_response = MagicMock()
     mock_response.status_code = 200
@@ -39,7 +41,7 @@ def test_successful_compression(mock_post, compressor):
     assert result.tokens == (100, 50)
     assert result.savings_percent == 50.0
 
-@patch('requests.post')
+@patch('requests.Session.post')
 def test_batch_compression(mock_post, compressor):
     mock_response = MagicMock()
     mock_response.status_code = 200
@@ -78,3 +80,142 @@ def test_live_api_call():
         assert len(result.content) > 0
     except Exception as e:
         pytest.fail(f"Live API call failed: {e}")
+
+def test_connections_are_reused(stub_api):
+    comp = sd.ScaleDownCompressor(api_key="test_key", max_workers=2)
+
+    results = comp.compress(context=["one two", "three four", "five six", "seven"], prompt="p")
+
+    assert len(results) == 4
+    stats = comp.pool_stats()
+    assert stats.requests == 4
+    assert stats.connections <= 2
+    assert stats.hits >= 2
+
+def test_shared_session_pool(stub_api):
+    pool = SessionPool(pool_size=1)
+    first = sd.ScaleDownCompressor(api_key="test_key", session=pool)
+    second = sd.ScaleDownCompressor(api_key="test_key", session=pool)
+
+    first.compress("alpha beta", "p")
+    second.compress("gamma delta", "p")
+
+    assert first.session is second.session
+    assert pool.stats().connections == 1
+    assert pool.stats().hits == 1
+
+def test_async_compression(stub_api):
+    comp = sd.ScaleDownCompressor(api_key="test_key")
+
+    async def run():
+        single = await comp.acompress("one two three four", "p")
+        batch = await comp.acompress(["a b", "c d", "e f"], "p", max_concurrency=2)
+        return single, batch
+
+    single, batch = asyncio.run(run())
+
+    assert isinstance(single, sd.CompressedPrompt)
+    assert single.tokens == (4, 2)
+    assert len(batch) == 3
+    assert [r.content for r in batch] == ["a", "c", "e"]
+
+def test_async_client_closed_with_compressor(stub_api):
+    comp = sd.ScaleDownCompressor(api_key="test_key")
+
+    async def run():
+        async with comp:
+            await comp.acompress("one two", "p")
+            client = comp.async_session._client()
+        return client
+
+    client = asyncio.run(run())
+    assert client.is_closed
+    assert len(comp.async_session._clients) == 0
+
+def test_compress_iter_streams_lazily(stub_api):
+    comp = sd.ScaleDownCompressor(api_key="test_key", max_workers=2)
+    pulled = []
+
+    def contexts():
+        for i in range(20):
+            pulled.append(i)
+            yield f"doc {i} body"
+
+    stream = comp.compress_iter(contexts(), prompt="p", window=3, ordered=True)
+    first = next(stream)
+    assert first.index == 0
+    assert len(pulled) <= 4
+
+    rest = list(stream)
+    assert [r.index for r in rest] == list(range(1, 20))
+    assert rest[-1].content == "doc 19 body"[:5]
+
+def test_acompress_iter_completion_order(stub_api):
+    comp = sd.ScaleDownCompressor(api_key="test_key")
+    pairs = [(f"doc {i} body", "p") for i in range(10)]
+
+    async def collect():
+        return [r async for r in comp.acompress_iter(pairs, window=4)]
+
+    results = asyncio.run(collect())
+
+    assert sorted(r.index for r in results) == list(range(10))
+    for r in results:
+        assert r.content == pairs[r.index][0][:5]
+
+def test_identical_requests_are_coalesced(stub_api):
+    stub_api.delay = 0.2
+    comp = sd.ScaleDownCompressor(api_key="test_key", max_workers=4)
+    before = comp.coalesce_stats().coalesced
+
+    results = comp.compress(context=["shared document body"] * 4, prompt="p")
+
+    async def run():
+        return await asyncio.gather(*(comp.acompress("another shared body", "p") for _ in range(3)))
+    async_results = asyncio.run(run())
+
+    assert len(stub_api.requests_seen) == 2
+    assert comp.coalesce_stats().coalesced - before == 5
+    assert len({id(r) for r in results}) == 4
+    assert all(r.content == results[0].content for r in results)
+    assert all(r.content == async_results[0].content for r in async_results)
+
+def test_singleflight_follower_deadline():
+    import threading
+    import time
+    from scaledown.compressor.singleflight import SingleFlight
+
+    group = SingleFlight()
+    release = threading.Event()
+    leader = threading.Thread(target=group.do, args=("k", lambda: release.wait(5)))
+    leader.start()
+    time.sleep(0.05)
+    start = time.monotonic()
+    with pytest.raises(sd.DeadlineExceededError):
+        group.do("k", lambda: "unused", deadline=start + 0.1)
+    assert time.monotonic() - start < 1
+    release.set()
+    leader.join()
+
+def test_singleflight_cancelled_leader_hands_over():
+    from scaledown.compressor.singleflight import SingleFlight
+
+    group = SingleFlight()
+
+    async def run():
+        async def slow():
+            await asyncio.sleep(5)
+            return "leader"
+
+        async def own():
+            return "follower"
+
+        leader = asyncio.create_task(group.ado("k", slow))
+        await asyncio.sleep(0.01)
+        follower = asyncio.create_task(group.ado("k", own))
+        await asyncio.sleep(0.01)
+        leader.cancel()
+        return await follower
+
+    assert asyncio.run(run()) == ("follower", False)
+    assert group.stats().executions == 2
@@ -0,0 +1,110 @@
+import asyncio
+import time
+import pytest
+import scaledown as sd
+from scaledown.dag import DAGPipeline, MergeStep, Node
+
+
+def _sleepy(suffix, delay=0.3):
+    def step(text, **kwargs):
+        time.sleep(delay)
+        return f"{text}\n\n{suffix}"
+    return step
+
+
+def test_branches_run_concurrently(char_tokens):
+    pipe = DAGPipeline([
+        ("left", _sleepy("left block")),
+        ("right", _sleepy("right block")),
+        ("merge", MergeStep(), ["left", "right"]),
+    ])
+    start = time.perf_counter()
+    result = pipe.run("shared")
+    elapsed = time.perf_counter() - start
+    pipe.close()
+
+    # Critical path is one branch (0.3s), not both (0.6s)
+    assert elapsed < 0.5
+    assert result.final_content == "shared\n\nleft block\n\nright block"
+    assert [s.step_name for s in result.history] == ["left", "right", "merge"]
+    merge = result.history[2].details
+    assert merge["inputs"] == ["left", "right"]
+    assert merge["start_ms"] >= max(s.details["end_ms"] for s in result.history[:2]) - 1
+
+
+def test_dag_async_with_compressor(stub_api, char_tokens):
+    pipe = DAGPipeline([
+        Node("upper", lambda text, **kwargs: text.upper()),
+        Node("lower", lambda text, **kwargs: text.lower()),
+        Node("merge", MergeStep(), ("upper", "lower")),
+        Node("compress", sd.ScaleDownCompressor(api_key="test_key"), ("merge",)),
+    ])
+    result = asyncio.run(pipe.arun("Alpha Beta", prompt="p"))
+    pipe.close()
+
+    assert stub_api.requests_seen[0]["context"] == "ALPHA BETA\n\nalpha beta"
+    assert result.history[-1].details["type"] == "compression"
+    assert result.history[-1].details["inputs"] == ["merge"]
+
+
+def test_merge_step_dedupes_blocks():
+    merge = MergeStep()
+    assert merge(["a\n\nb", "b\n\nc", "a"]) == "a\n\nb\n\nc"
+    assert merge(["def f():\n    pass", "    pass"]) == "def f():\n    pass"
+    assert MergeStep(dedupe=False)(["a", "a"]) == "a\n\na"
+
+
+def test_dag_validation(char_tokens):
+    upper = lambda text, **kwargs: text.upper()
+    with pytest.raises(ValueError, match="unknown node"):
+        DAGPipeline([("a", upper, ["missing"])])
+    with pytest.raises(ValueError, match="cycle"):
+        DAGPipeline([("a", upper, ["b"]), ("b", upper, ["a"])])
+    with pytest.raises(ValueError, match="output="):
+        DAGPipeline([("a", upper), ("b", upper)])
+    with pytest.raises(ValueError, match="merge step"):
+        DAGPipeline([("a", upper), ("b", upper),
+                     ("c", sd.ScaleDownCompressor(api_key="k"), ["a", "b"])])
+
+    pipe = DAGPipeline([("a", upper), ("b", upper)], output="b")
+    assert pipe.run("x").final_content == "X"
+
+
+def test_dag_stream(char_tokens):
+    def fail_on_bad(text, **kwargs):
+        if text.startswith("bad"):
+            raise RuntimeError("boom")
+        return text
+    pipe = DAGPipeline([
+        ("check", fail_on_bad),
+        ("left", _sleepy("L", delay=0.05), ["check"]),
+        ("right", _sleepy("R", delay=0.05), ["check"]),
+        ("merge", MergeStep(), ["left", "right"]),
+    ])
+    items = ["a", {"context": "bad"}, "c", "d"]
+    results = list(pipe.stream(iter(items), workers=2, queue_size=2))
+    pipe.close()
+
+    assert [r.index for r in results] == [0, 1, 2, 3]
+    assert results[0].final_content == "a\n\nL\n\nR"
+    assert isinstance(results[1].error, RuntimeError)
+    assert all(r.error is None for r in results[2:])
+
+
+def _tag_pid(text, **kwargs):
+    import os
+    return f"{text}@{os.getpid()}"
+
+
+def test_dag_process_executor_avoids_fork(char_tokens):
+    import os
+    pipe = DAGPipeline([("tag", _tag_pid)], executor="process", max_workers=1)
+    try:
+        result = pipe.run("doc")
+        start_method = pipe._pool._mp_context.get_start_method()
+    finally:
+        pipe.close()
+
+    assert result.final_content.startswith("doc@")
+    assert result.final_content != f"doc@{os.getpid()}"
+    assert start_method in ("forkserver", "spawn")
@@ -0,0 +1,43 @@
+import pytest
+import scaledown as sd
+from scaledown.compressor import ExtractiveCompressor
+
+TEXT = (
+    "The weather was pleasant all week. "
+    "Our training loop uses gradient clipping to stay stable. "
+    "Lunch was served at noon. "
+    "The learning rate schedule warms up for the first thousand steps. "
+    "Nobody noticed the cat."
+)
+
+def test_keeps_relevant_sentences(char_tokens):
+    comp = ExtractiveCompressor()
+    result = comp.compress(TEXT, "How is the training loop and learning rate configured?", max_tokens=130)
+
+    assert "training loop" in result.content
+    assert "learning rate" in result.content
+    assert "cat" not in result.content
+    assert result.tokens == (len(TEXT), len(result.content))
+    assert result.tokens[1] <= 130
+    # Selected sentences keep their original order
+    assert result.content.index("training") < result.content.index("learning")
+
+def test_rate_budget_and_short_input(char_tokens):
+    result = ExtractiveCompressor(rate=0.3).compress(TEXT, "weather")
+    assert result.tokens[1] <= 0.3 * len(TEXT) + 1
+    assert result.content.startswith("The weather")
+
+    short = ExtractiveCompressor().compress("Tiny.", "anything", max_tokens=100)
+    assert short.content == "Tiny."
+
+def test_code_is_split_by_lines(char_tokens):
+    code = "def load(path):\n    return open(path).read()\n\ndef train(model):\n    model.fit()\n    return model\n"
+    result = ExtractiveCompressor().compress(code, "train model", max_tokens=40)
+    assert "model.fit()" in result.content
+    assert "open(path)" not in result.content
+
+def test_drop_in_pipeline(char_tokens):
+    pipe = sd.Pipeline([("compress", ExtractiveCompressor())])
+    result = pipe.run(TEXT, prompt="gradient clipping", max_tokens=80)
+    assert "gradient clipping" in result.final_content
+    assert result.history[0].details["type"] == "compression"
@@ -20,6 +20,24 @@ class UnusedClass:
     pass
 """
 
+# HASTE internals scaledown imports; HasteContext is pinned to 0.2.x for them
+HASTE_PRIVATE_API = {
+    "haste.api": ["_build_call_edges", "_build_line_starts", "_byte_to_line", "_to_doc_list"],
+    "haste.index_py": ["_collect_decorators", "_collect_module_variables", "_gather_calls",
+                       "_gather_identifiers", "_is_wrapper_function", "_maybe_docstring",
+                       "_node_text", "_symbol_signature"],
+}
+
+def test_haste_private_api():
+    import importlib
+    from scaledown.optimizer import haste_source
+    pytest.importorskip("haste")
+
+    missing = [f"{module}.{name}" for module, names in HASTE_PRIVATE_API.items()
+               for name in names if not hasattr(importlib.import_module(module), name)]
+    assert not missing, f"HasteContext no longer provides {missing}; update haste_source and the pin"
+    assert haste_source.HASTE_AVAILABLE
+
 @pytest.fixture
 def temp_python_file():
     with tempfile.NamedTemporaryFile(mode='w', suffix='.py', delete=False, encoding='utf-8') as f:
@@ -47,3 +65,274 @@ def test_optimization_with_file(temp_python_file):
     assert "def target_function" in result.content
     # Metrics should be populated
     assert result.metrics.original_tokens > 0
+
+@pytest.fixture
+def offline_haste(char_tokens, monkeypatch):
+    """Let HASTE's chunker count tokens without downloading BPE files."""
+    import haste.cast_chunker
+    from scaledown.types import metrics
+    monkeypatch.setattr(haste.cast_chunker, "tiktoken", metrics.tiktoken)
+
+def test_select_from_source_matches_select_from_file(offline_haste, temp_python_file):
+    from haste import select_from_file
+    from scaledown.optimizer.haste_source import select_from_source
+
+    from_file = select_from_file(temp_python_file, "target_function", top_k=2)
+    from_source = select_from_source(TEST_CODE, "target_function", path=temp_python_file, top_k=2)
+    assert from_source == from_file
+
+def test_string_context_never_touches_disk(offline_haste, monkeypatch):
+    import builtins
+    import tempfile as tempfile_module
+
+    def forbidden(*args, **kwargs):
+        raise AssertionError("filesystem access")
+    monkeypatch.setattr(tempfile_module, "NamedTemporaryFile", forbidden)
+    monkeypatch.setattr(builtins, "open", forbidden)
+
+    result = HasteOptimizer(top_k=2).optimize(TEST_CODE, query="target_function")
+    assert "def target_function" in result.content
+    assert result.metrics.original_tokens == len(TEST_CODE)
+
+@pytest.fixture
+def repo_tree(tmp_path):
+    pkg = tmp_path / "pkg"
+    pkg.mkdir()
+    (pkg / "__init__.py").write_text("")
+    (pkg / "loader.py").write_text(
+        "from pkg.parsing import parse_header\n\n"
+        "def load_dataset(path):\n"
+        "    \"\"\"Load a dataset file.\"\"\"\n"
+        "    return parse_header(open(path).read())\n"
+    )
+    (pkg / "parsing.py").write_text(
+        "def parse_header(text):\n"
+        "    return text.splitlines()[0]\n\n"
+        "def unrelated_helper():\n"
+        "    return 42\n"
+    )
+    return tmp_path
+
+def test_index_bfs_crosses_files(offline_haste, repo_tree):
+    from scaledown.optimizer.haste_index import HasteIndex
+
+    index = HasteIndex.build(str(repo_tree))
+    assert index.files == ["pkg/__init__.py", "pkg/loader.py", "pkg/parsing.py"]
+
+    result = index.select("load dataset", top_k=1)
+    assert result["selected"]["roots"] == ["pkg.loader::load_dataset", "pkg.parsing::parse_header"]
+    assert result["files"] == ["pkg/loader.py", "pkg/parsing.py"]
+    assert "def parse_header" in result["code"]
+    assert "unrelated_helper" not in result["code"]
+
+def test_index_scores_match_bm25(offline_haste, repo_tree):
+    from haste.api import _to_doc_list
+    from haste.retriever import build_bm25_corpus, normalize_query
+    from scaledown.optimizer.haste_index import HasteIndex
+
+    index = HasteIndex.build(str(repo_tree))
+    bm25, _ = build_bm25_corpus(_to_doc_list([s for f in index._snapshot.files.values() for s in f.symbols]))
+    expected = bm25.get_scores(normalize_query("parse header text"))
+    scores = {d.idx: d.score for d in index.search("parse header text", k=10, prefilter=10)}
+    assert [scores[i] for i in range(len(expected))] == pytest.approx(list(expected))
+
+def test_index_save_load_and_refresh(offline_haste, repo_tree, tmp_path):
+    from scaledown.optimizer.haste_index import HasteIndex
+
+    index = HasteIndex.build(str(repo_tree))
+    path = str(tmp_path / "repo.idx")
+    index.save(path)
+    loaded = HasteIndex.load(path)
+    assert loaded.select("load dataset") == index.select("load dataset")
+
+    (repo_tree / "pkg" / "extra.py").write_text("def export_report():\n    return 1\n")
+    assert loaded.refresh() == 1
+    assert "pkg.extra::export_report" in loaded.select("export report", top_k=1)["selected"]["roots"]
+
+def test_index_queries_during_refresh(offline_haste, repo_tree):
+    import threading
+    from scaledown.optimizer.haste_index import HasteIndex
+
+    index = HasteIndex.build(str(repo_tree))
+    key = index.cache_key()
+    errors = []
+    stop = threading.Event()
+
+    def query():
+        while not stop.is_set():
+            try:
+                index.select("load dataset parse header", top_k=2)
+            except Exception as e:  # pragma: no cover - reported below
+                errors.append(e)
+
+    threads = [threading.Thread(target=query) for _ in range(4)]
+    for t in threads:
+        t.start()
+    for i in range(20):
+        (repo_tree / "pkg" / f"gen{i % 3}.py").write_text(f"def generated_{i}():\n    return {i}\n")
+        index.refresh()
+    stop.set()
+    for t in threads:
+        t.join()
+    assert errors == []
+    assert index.cache_key() != key
+
+def test_index_select_falls_back_to_lexical(offline_haste, repo_tree):
+    from scaledown.optimizer.haste_index import HasteIndex
+
+    class EmptyReranker:
+        def rerank(self, prelim, query, src_by_path=None):
+            return []
+
+    index = HasteIndex.build(str(repo_tree))
+    result = index.select("load dataset", top_k=1, semantic=True, reranker=EmptyReranker())
+    assert result["selected"]["roots"][0] == "pkg.loader::load_dataset"
+
+def test_optimizer_uses_index(offline_haste, repo_tree):
+    from scaledown.optimizer.haste_index import HasteIndex
+
+    index = HasteIndex.build(str(repo_tree))
+    opt = HasteOptimizer(top_k=1, index=index)
+    result = opt.optimize("", query="load dataset")
+    assert "def parse_header" in result.content
+    total = sum(len(index.source(p)) for p in index.files)
+    assert result.metrics.original_tokens == total
+    assert result.metrics.optimized_tokens == len(result.content)
+
+def test_parse_and_result_caches(offline_haste, monkeypatch):
+    from scaledown.cache import LRUCache
+    from scaledown.optimizer import haste_source
+
+    monkeypatch.setattr(haste_source, "parse_cache", LRUCache())
+    monkeypatch.setattr(haste_source, "result_cache", LRUCache())
+    parses = []
+    parse_source = haste_source.parse_source
+    monkeypatch.setattr(haste_source, "parse_source", lambda *a: parses.append(a) or parse_source(*a))
+
+    opt = HasteOptimizer(top_k=2)
+    first = opt.optimize(TEST_CODE, query="target_function")
+    second = opt.optimize(TEST_CODE, query="target_function")
+    third = opt.optimize(TEST_CODE, query="other function")
+
+    assert len(parses) == 1
+    assert second.content == first.content
+    assert first.metrics.result_cache_hit_rate == 0.0
+    assert second.metrics.result_cache_hit_rate == 0.5
+    assert third.metrics.parse_cache_hit_rate == 0.5
+    assert HasteOptimizer(cache=False).optimize(TEST_CODE, query="x").metrics.parse_cache_hit_rate is None
+
+def test_optimize_batch_groups_by_file(offline_haste, temp_python_file, monkeypatch):
+    from scaledown.optimizer import haste
+
+    calls = []
+    select_group = haste._select_group
+    monkeypatch.setattr(haste, "_select_group", lambda *a: calls.append(a[2]) or select_group(*a))
+
+    opt = HasteOptimizer(top_k=1, workers=1)
+    results = opt.optimize_batch(
+        ["", TEST_CODE, "", "   "],
+        queries=["target_function", "UnusedClass", "UnusedClass", "x"],
+        file_paths=[temp_python_file, None, temp_python_file, None],
+        return_exceptions=True,
+    )
+    assert calls == [["target_function", "UnusedClass"], ["UnusedClass"]]
+    assert "def target_function" in results[0].content
+    assert "class UnusedClass" in results[1].content
+    assert results[2].content == results[1].content
+    assert isinstance(results[3], ValueError)
+
+def test_optimize_batch_on_process_pool(offline_haste, temp_python_file):
+    other = TEST_CODE.replace("target_function", "renamed_function")
+    # fork, so workers inherit the offline tokenizer patch
+    opt = HasteOptimizer(top_k=1, workers=2, mp_context="fork")
+    try:
+        opt.warmup()
+        pooled = opt.optimize_batch(
+            ["", other],
+            queries=["target_function", "renamed_function"],
+            file_paths=[temp_python_file, None],
+        )
+        assert opt._pool is not None
+    finally:
+        opt.close()
+    single = HasteOptimizer(top_k=1).optimize(other, query="renamed_function")
+    assert "def target_function" in pooled[0].content
+    assert pooled[1].content == single.content
+    assert pooled[1].metrics.original_tokens == single.metrics.original_tokens
+
+class FakeEmbedder:
+    """Bag-of-letters embeddings; records every encode batch."""
+    def __init__(self, name=None):
+        self.batches = []
+
+    def encode(self, texts, normalize_embeddings=False, convert_to_numpy=True):
+        import numpy as np
+        self.batches.append(list(texts))
+        vectors = np.zeros((len(texts), 26))
+        for row, text in enumerate(texts):
+            for ch in text.lower():
+                if "a" <= ch <= "z":
+                    vectors[row, ord(ch) - 97] += 1
+        return vectors / np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+
+def test_local_reranker_batches_and_caches(offline_haste, monkeypatch):
+    from scaledown.optimizer import LocalReranker, embeddings
+
+    model = FakeEmbedder()
+    monkeypatch.setattr(embeddings, "load_sentence_transformer", lambda name: model)
+    opt = HasteOptimizer(top_k=2, semantic=True, reranker=LocalReranker(), cache=False)
+
+    first = opt.optimize(TEST_CODE, query="target_function")
+    assert "def target_function" in first.content
+    assert first.metrics.retrieval_mode == "hybrid"
+    # One batch: the query plus every candidate
+    assert len(model.batches) == 1 and model.batches[0][0] == "target_function"
+    candidates = len(model.batches[0]) - 1
+
+    opt.optimize(TEST_CODE, query="dependency")
+    assert model.batches[1] == ["dependency"]
+    assert opt.reranker.cache_stats().hits == candidates
+
+def test_sentence_transformer_is_loaded_once(monkeypatch):
+    import sentence_transformers
+    from scaledown.optimizer.embeddings import load_sentence_transformer
+
+    class Model(FakeEmbedder):
+        loads = 0
+        def __init__(self, name):
+            super().__init__(name)
+            Model.loads += 1
+    monkeypatch.setattr(sentence_transformers, "SentenceTransformer", Model)
+
+    assert load_sentence_transformer("m") is load_sentence_transformer("m")
+    assert Model.loads == 1
+
+def test_batch_pool_avoids_fork_by_default(offline_haste, monkeypatch):
+    from scaledown.optimizer import haste
+
+    contexts = []
+    monkeypatch.setattr(haste, "ProcessPoolExecutor", lambda **kw: contexts.append(kw["mp_context"]))
+    HasteOptimizer(workers=2)._get_pool()
+    assert contexts[0].get_start_method() in ("forkserver", "spawn")
+
+def test_optimize_batch_reranks_in_calling_process(offline_haste, monkeypatch):
+    from scaledown.optimizer import haste
+
+    class Reranker:
+        def __init__(self):
+            self.pids = []
+
+        def rerank(self, prelim, query, src_bytes=None, src_by_path=None):
+            self.pids.append(os.getpid())
+            return prelim
+
+    def no_pool():
+        raise AssertionError("process pool used")
+
+    reranker = Reranker()
+    opt = HasteOptimizer(top_k=1, workers=4, semantic=True, reranker=reranker, cache=False)
+    monkeypatch.setattr(opt, "_get_pool", no_pool)
+    other = TEST_CODE.replace("target_function", "renamed_function")
+    results = opt.optimize_batch([TEST_CODE, other], queries=["target_function", "renamed_function"])
+    assert "def renamed_function" in results[1].content
+    assert reranker.pids == [os.getpid()] * 2
@@ -0,0 +1,87 @@
+import asyncio
+import time
+import pytest
+import scaledown as sd
+from scaledown.compressor.hedging import LatencyTracker, hedged_call, ahedged_call
+from scaledown.compressor.throttle import Throttle, RetryPolicy
+
+def test_latency_tracker_quantile():
+    tracker = LatencyTracker(window=100)
+    assert tracker.quantile(0.95) is None
+    for i in range(1, 101):
+        tracker.record(i / 100)
+    assert tracker.quantile(0.95) == 0.95
+    assert tracker.quantile(0.5) == 0.5
+
+def test_hedged_call_returns_faster_duplicate():
+    delays = [0.5, 0.0]
+    result, hedged = hedged_call(lambda: time.sleep(delays.pop(0)) or "ok", hedge_after=0.05)
+    assert (result, hedged) == ("ok", True)
+
+def test_ahedged_call_skips_hedge_when_fast():
+    async def fast():
+        return "ok"
+    assert asyncio.run(ahedged_call(fast, hedge_after=1.0)) == ("ok", False)
+
+def test_read_timeout(stub_api):
+    comp = sd.ScaleDownCompressor(api_key="test_key", read_timeout=0.1,
+                                  throttle=Throttle(retry=RetryPolicy(max_retries=0)))
+    stub_api.delay = 0.5
+    with pytest.raises(sd.APIError, match="timed out"):
+        comp.compress("one two", "p")
+
+def test_deadline_stops_retries(stub_api):
+    comp = sd.ScaleDownCompressor(api_key="test_key", throttle=Throttle(retry=RetryPolicy(max_retries=3)))
+    stub_api.fail_next = [(503, {"Retry-After": "5"})]
+
+    start = time.monotonic()
+    with pytest.raises(sd.DeadlineExceededError):
+        comp.compress("one two", "p", deadline=time.monotonic() + 1.0)
+    assert time.monotonic() - start < 1.0
+    assert "deadline" not in stub_api.requests_seen[0]["scaledown"]
+
+def test_hedged_request_beats_slow_primary(stub_api):
+    comp = sd.ScaleDownCompressor(api_key="test_key", hedge=True, hedge_min_samples=3, coalesce=False)
+    for _ in range(3):
+        comp.compress("one two", "p")
+    stub_api.delays = [1.0]
+
+    start = time.monotonic()
+    result = comp.compress("one two", "p")
+    assert time.monotonic() - start < 0.9
+    assert result.tokens == (2, 1)
+    assert len(stub_api.requests_seen) == 5
+
+def test_hedged_call_skips_duplicate_when_not_admitted():
+    calls = []
+    def slow():
+        calls.append(1)
+        time.sleep(0.2)
+        return "ok"
+    assert hedged_call(slow, hedge_after=0.02, admit=lambda: None) == ("ok", False)
+    assert len(calls) == 1
+
+def test_hedge_respects_throttle_headroom(stub_api):
+    throttle = Throttle(initial_concurrency=1, adaptive=False)
+    comp = sd.ScaleDownCompressor(api_key="test_key", hedge=True, hedge_min_samples=3,
+                                  coalesce=False, throttle=throttle)
+    for _ in range(3):
+        comp.compress("one two", "p")
+    stub_api.delays = [0.3]
+
+    comp.compress("one two", "p")
+    assert len(stub_api.requests_seen) == 4
+
+def test_hedge_slot_held_until_loser_finishes(stub_api):
+    throttle = Throttle(initial_concurrency=4, adaptive=False)
+    comp = sd.ScaleDownCompressor(api_key="test_key", hedge=True, hedge_min_samples=3,
+                                  coalesce=False, throttle=throttle)
+    for _ in range(3):
+        comp.compress("one two", "p")
+    stub_api.delays = [0.6]
+
+    comp.compress("one two", "p")
+    assert len(stub_api.requests_seen) == 5
+    assert throttle.stats().in_flight == 1
+    time.sleep(0.8)
+    assert throttle.stats().in_flight == 0
@@ -0,0 +1,102 @@
+import pytest
+from scaledown.types import metrics
+from scaledown.types.metrics import count_tokens, count_tokens_many, get_encoding
+
+def test_encoding_is_resolved_once(char_tokens):
+    assert get_encoding("gpt-4o") is get_encoding("gpt-4o")
+    assert get_encoding.cache_info().misses == 1
+
+def test_count_tokens_many(char_tokens, monkeypatch):
+    texts = ["abc", "", "hello world"]
+    assert count_tokens_many(texts) == [count_tokens(t) for t in texts] == [3, 0, 11]
+    assert count_tokens_many([]) == []
+
+    # Large batches go through the threaded batch encoder
+    monkeypatch.setattr(metrics, "_BATCH_MIN_CHARS", 1)
+    assert count_tokens_many(texts, num_threads=4) == [3, 0, 11]
+
+def test_estimator_without_tiktoken(monkeypatch):
+    monkeypatch.setattr(metrics, "tiktoken", None)
+    text = "The quick brown fox jumps over the lazy dog."
+    estimate = count_tokens(text, mode="estimate")
+    # cl100k/o200k both encode this sentence as 10 tokens
+    assert 8 <= estimate <= 13
+    assert count_tokens(text, mode="off") == 0
+    assert count_tokens_many([text, ""], mode="estimate") == [estimate, 0]
+
+def test_metrics_mode_scope_and_global(monkeypatch):
+    import scaledown as sd
+    monkeypatch.setattr(metrics, "tiktoken", None)
+    assert metrics.current_metrics_mode() == "exact"
+    with metrics.metrics_mode("estimate"):
+        assert count_tokens("hello world") > 0
+    sd.set_metrics_mode("off")
+    try:
+        assert count_tokens("hello world") == 0
+    finally:
+        sd.set_metrics_mode("exact")
+
+def test_calibrate_estimator(char_tokens):
+    from scaledown.types.estimator import calibrate_estimator, get_calibration, _CALIBRATIONS
+    samples = ["alpha beta gamma.", "def f(x):\n    return x + 1\n", "1234 5678, 90!", "one two three four"]
+    saved = dict(_CALIBRATIONS)
+    try:
+        calibration = calibrate_estimator(samples, model="gpt-4o")
+        assert calibration.samples == 4
+        assert all(c >= 0 for c in calibration.coefficients)
+        assert calibration.mean_abs_error < 0.25
+        assert get_calibration("gpt-4o") is calibration
+    finally:
+        _CALIBRATIONS.clear()
+        _CALIBRATIONS.update(saved)
+
+def _estimator_corpus():
+    """Fixed corpus the built-in estimator calibrations were fitted on."""
+    import json
+    import pathlib
+    path = pathlib.Path(__file__).resolve().parent / "data" / "estimator_corpus.json"
+    return json.loads(path.read_text(encoding="utf-8"))
+
+def test_default_calibrations_are_fitted():
+    from scaledown.types.estimator import FEATURES, _DEFAULTS
+    for name, calibration in _DEFAULTS.items():
+        assert calibration.encoding == name
+        assert len(calibration.coefficients) == len(FEATURES)
+        assert calibration.samples == len(_estimator_corpus())
+        assert 0 < calibration.mean_abs_error <= calibration.max_abs_error
+
+@pytest.mark.parametrize("model", ["gpt-4", "gpt-4o"])
+def test_default_calibrations_hold(model):
+    import numpy as np
+    from scaledown.types.estimator import _DEFAULTS, encoding_name, features
+    try:
+        metrics.get_encoding(model).encode("warmup")
+    except Exception as e:
+        pytest.skip(f"tiktoken encoding unavailable: {e}")
+
+    calibration = _DEFAULTS[encoding_name(model)]
+    corpus = _estimator_corpus()
+    exact = np.array(count_tokens_many(corpus, model=model, mode="exact"), dtype=float)
+    estimate = np.array([features(t) for t in corpus], dtype=float) @ np.array(calibration.coefficients)
+    errors = np.abs(estimate - exact) / np.maximum(exact, 1)
+    # Bounds are rounded up to 4 decimals
+    assert errors.mean() <= calibration.mean_abs_error
+    assert errors.max() <= calibration.max_abs_error
+    assert errors.mean() > calibration.mean_abs_error - 1e-3
+
+
+def test_token_count_scope_memoizes(char_tokens, monkeypatch):
+    from scaledown.types import metrics
+    encoding_cls = type(metrics.get_encoding("gpt-4o"))
+    calls = []
+    original = encoding_cls.encode
+    monkeypatch.setattr(encoding_cls, "encode", lambda self, text, **kw: calls.append(text) or original(self, text))
+
+    with metrics.token_count_scope():
+        assert count_tokens("hello") == 5
+        assert count_tokens_many(["hello", "world"]) == [5, 5]
+        assert count_tokens("hello", model="gpt-4") == 5
+    assert calls == ["hello", "world", "hello"]
+
+    count_tokens("hello")
+    assert len(calls) == 4
@@ -1,3 +1,4 @@
+import asyncio
 import pytest
 import tempfile
 import os
@@ -57,7 +58,7 @@ def complex_pipeline():
     ])
 
 @pytest.mark.skipif(not DEPS_AVAILABLE, reason="Optimizers not installed")
-@patch("requests.post")
+@patch("requests.Session.post")
 def test_multi_step_pipeline(mock_post, complex_pipeline, temp_python_file):
     """Test flow: Haste -> Semantic -> Compressor"""
     
@@ -93,3 +94,250 @@ def test_multi_step_pipeline(mock_post, complex_pipeline, temp_python_file):
     assert result.history[2].step_name == "compressor"
     
     # Verify semantic step received input from haste (implicit check via flow) and passed output to compressor
+
+def test_async_pipeline(stub_api, char_tokens):
+    pipe = sd.Pipeline([
+        ("upper", lambda ctx, **kwargs: ctx.upper()),
+        ("compressor", sd.ScaleDownCompressor(api_key="test_key")),
+    ])
+
+    result = asyncio.run(pipe.arun(context="alpha beta gamma delta", prompt="p"))
+
+    assert result.final_content == "ALPHA BETA "
+    assert [step.step_name for step in result.history] == ["upper", "compressor"]
+    assert (result.history[0].input_tokens, result.history[0].output_tokens) == (22, 22)
+    assert stub_api.requests_seen[0]["context"] == "ALPHA BETA GAMMA DELTA"
+
+def test_pipeline_timeout(stub_api):
+    stub_api.delay = 0.5
+    pipe = sd.Pipeline([
+        ("compress", sd.ScaleDownCompressor(api_key="test_key")),
+        ("upper", lambda text, **kwargs: text.upper()),
+    ])
+    with pytest.raises(sd.DeadlineExceededError):
+        pipe.run("one two three four", prompt="p", timeout=0.2)
+
+def test_pipeline_metrics_mode(monkeypatch):
+    from scaledown.types import metrics
+    monkeypatch.setattr(metrics, "tiktoken", None)
+    pipe = sd.Pipeline([("upper", lambda text, **kwargs: text.upper())], metrics_mode="estimate")
+
+    result = pipe.run("alpha beta gamma")
+    assert result.metrics_mode == "estimate"
+    assert result.history[0].details["token_count_mode"] == "estimate"
+    assert result.history[0].input_tokens > 0
+    with pytest.raises(ValueError):
+        sd.Pipeline([("upper", str.upper)], metrics_mode="fast")
+
+def test_pipeline_tokenizes_each_text_once(char_tokens, monkeypatch):
+    from scaledown.types import metrics
+    encoding_cls = type(metrics.get_encoding("gpt-4o"))
+    calls = []
+    original = encoding_cls.encode
+    monkeypatch.setattr(encoding_cls, "encode", lambda self, text, **kw: calls.append(text) or original(self, text))
+
+    pipe = sd.Pipeline([
+        ("strip", lambda text, **kwargs: text.strip()),
+        ("upper", lambda text, **kwargs: text.upper()),
+    ])
+    result = pipe.run("  alpha beta  ")
+
+    assert calls == ["  alpha beta  ", "alpha beta", "ALPHA BETA"]
+    assert result.history[1].input_tokens == result.history[0].output_tokens == 10
+
+def test_run_batch_preserves_order_and_errors(stub_api, char_tokens):
+    def check(text, **kwargs):
+        if "bad" in text:
+            raise ValueError("rejected")
+        return text.upper()
+
+    pipe = sd.Pipeline([
+        ("check", check),
+        ("compressor", sd.ScaleDownCompressor(api_key="test_key")),
+    ])
+    results = pipe.run_batch(["alpha beta", "bad input", "gamma delta"], prompts="p")
+
+    assert [r.final_content for r in results] == ["ALPHA", "bad input", "GAMMA"]
+    assert isinstance(results[1].error, ValueError)
+    assert results[0].error is None and len(results[0].history) == 2
+    assert len(results[1].history) == 0
+    assert sorted(p["context"] for p in stub_api.requests_seen) == ["ALPHA BETA", "GAMMA DELTA"]
+
+def test_run_batch_uses_batch_methods(char_tokens):
+    from scaledown.optimizer.base import BaseOptimizer
+    from scaledown.compressor.base import BaseCompressor
+    from scaledown.types import OptimizedContext, CompressedPrompt
+    from scaledown.types.metrics import OptimizerMetrics
+    calls = []
+
+    class Reverse(BaseOptimizer):
+        def optimize(self, context, query=None, max_tokens=None, **kwargs):
+            return OptimizedContext(context[::-1], OptimizerMetrics(0, 0, 0, 1.0, 0.0, "test", 1.0))
+
+        def optimize_batch(self, contexts, queries=None, file_paths=None, **kwargs):
+            calls.append(("optimize", list(queries)))
+            return super().optimize_batch(contexts, queries, file_paths, **kwargs)
+
+    class Head(BaseCompressor):
+        def compress(self, context, prompt, max_tokens=None, **kwargs):
+            return CompressedPrompt(context[:2], prompt, (0, 0), 0.0, "test")
+
+        def compress_batch(self, contexts, prompts, **kwargs):
+            calls.append(("compress", list(prompts)))
+            return super().compress_batch(contexts, prompts, **kwargs)
+
+    pipe = sd.Pipeline([("reverse", Reverse()), ("head", Head(rate="auto", api_key="k"))])
+    results = pipe.run_batch(["abc", "xyz"], prompts=["p1", "p2"], queries="q")
+
+    assert [r.final_content for r in results] == ["cb", "zy"]
+    assert calls == [("optimize", ["q", "q"]), ("compress", ["p1", "p2"])]
+
+def test_step_cache_reruns_only_changed_steps(stub_api, char_tokens):
+    from scaledown.optimizer.base import BaseOptimizer
+    from scaledown.types import OptimizedContext
+    from scaledown.types.metrics import OptimizerMetrics
+    calls = []
+
+    class Retrieve(BaseOptimizer):
+        def optimize(self, context, query=None, max_tokens=None, **kwargs):
+            calls.append(query)
+            return OptimizedContext(context + " " + query, OptimizerMetrics(0, 0, 1, 1.0, 0.0, "test", 1.0))
+
+    pipe = sd.Pipeline([
+        ("retrieve", Retrieve()),
+        ("compress", sd.ScaleDownCompressor(api_key="test_key")),
+    ], cache=sd.LRUCache())
+
+    first = pipe.run("alpha beta", query="gamma", prompt="p1")
+    second = pipe.run("alpha beta", query="gamma", prompt="p2")
+    third = pipe.run("alpha beta", query="gamma", prompt="p2")
+
+    assert calls == ["gamma"]
+    assert [s.details["cache_hit"] for s in first.history] == [False, False]
+    assert [s.details["cache_hit"] for s in second.history] == [True, False]
+    assert [s.details["cache_hit"] for s in third.history] == [True, True]
+    assert third.final_content == second.final_content
+    assert len(stub_api.requests_seen) == 2
+
+def test_step_cache_with_run_batch(char_tokens):
+    calls = []
+    def upper(text, **kwargs):
+        calls.append(text)
+        return text.upper()
+
+    pipe = sd.Pipeline([("upper", upper)], cache=sd.LRUCache())
+    pipe.run_batch(["a", "b"])
+    results = pipe.run_batch(["b", "c"])
+
+    assert calls == ["a", "b", "c"]
+    assert [r.history[0].details["cache_hit"] for r in results] == [True, False]
+    assert [r.final_content for r in results] == ["B", "C"]
+
+def test_pipeline_skips_steps_under_budget(stub_api, char_tokens):
+    calls = []
+    def upper(text, **kwargs):
+        calls.append(text)
+        return text.upper()
+
+    pipe = sd.Pipeline([
+        ("upper", upper, {"min_tokens": 10}),
+        ("compress", sd.ScaleDownCompressor(api_key="test_key")),
+    ], target_tokens=12)
+
+    short = pipe.run("tiny", prompt="p")
+    assert short.final_content == "tiny"
+    assert short.skipped_steps == ["upper", "compress"]
+    assert [s.details["skip_reason"] for s in short.history] == ["target_met", "target_met"]
+    assert all(s.latency_ms == 0.0 and s.input_tokens == 4 for s in short.history)
+    assert calls == [] and stub_api.requests_seen == []
+
+    pipe.target_tokens = None
+    medium = pipe.run("alpha", prompt="p")
+    assert medium.history[0].details["skip_reason"] == "min_tokens"
+    assert medium.skipped_steps == ["upper"]
+    assert len(stub_api.requests_seen) == 1
+
+def test_pipeline_skip_if_and_batch(char_tokens):
+    pipe = sd.Pipeline([
+        ("upper", lambda text, **kwargs: text.upper(), {"skip_if": lambda text, tokens: text.startswith("#")}),
+        ("strip", lambda text, **kwargs: text.strip()),
+    ])
+    results = pipe.run_batch(["# keep ", " shout "])
+    assert [r.final_content for r in results] == ["# keep", "SHOUT"]
+    assert [r.skipped_steps for r in results] == [["upper"], []]
+    with pytest.raises(ValueError):
+        sd.Pipeline([("upper", str.upper, {"max": 3})])
+
+def test_pipeline_warmup(stub_api, char_tokens):
+    import time
+    warmed = []
+
+    class Slow:
+        def __init__(self, name):
+            self.name = name
+
+        def warmup(self):
+            time.sleep(0.2)
+            warmed.append(self.name)
+
+        def __call__(self, text, **kwargs):
+            return text
+
+    compressor = sd.ScaleDownCompressor(api_key="test_key")
+    pipe = sd.Pipeline([("a", Slow("a")), ("b", Slow("b")), ("compress", compressor)])
+
+    start = time.perf_counter()
+    times = pipe.warmup()
+    assert time.perf_counter() - start < 0.35  # steps warm up concurrently
+    assert sorted(warmed) == ["a", "b"]
+    assert set(times) == {"a", "b", "compress"} and times["a"] >= 200
+    assert pipe.warmup_times == times
+    assert compressor.session.stats().connections == 1
+
+    pipe.run("alpha beta", prompt="p")
+    # The request reused the connection opened by warmup
+    assert compressor.session.stats().connections == 1
+
+    background = sd.Pipeline([("a", Slow("c"))], warmup="background")
+    assert set(background.warmup_future.result(timeout=5)) == {"a"}
+    assert "c" in warmed
+
+def test_step_cache_keys_capture_callable_state(char_tokens):
+    import functools
+    import threading
+
+    def make(suffix):
+        def step(text, **kwargs):
+            return text + suffix
+        return step
+
+    def add(text, suffix, **kwargs):
+        return text + suffix
+
+    class Suffix:
+        def __init__(self, suffix):
+            self.suffix = suffix
+        def apply(self, text, **kwargs):
+            return text + self.suffix
+
+    cache = sd.LRUCache()
+    for first, second in [
+        (make("-A"), make("-B")),
+        (functools.partial(add, suffix="-A"), functools.partial(add, suffix="-B")),
+        (Suffix("-A").apply, Suffix("-B").apply),
+    ]:
+        sd.Pipeline([("s", first)], cache=cache).run("x")
+        result = sd.Pipeline([("s", second)], cache=cache).run("x")
+        assert result.final_content == "x-B"
+        assert result.history[0].details["cache_hit"] is False
+        assert sd.Pipeline([("s", second)], cache=cache).run("x").history[0].details["cache_hit"] is True
+
+    class Locked:
+        def __init__(self):
+            self.lock = threading.Lock()
+        def __call__(self, text, **kwargs):
+            return text
+
+    locked = sd.Pipeline([("s", Locked())], cache=cache)
+    locked.run("x")
+    assert locked.run("x").history[0].details.get("cache_hit") is None
@@ -101,3 +101,46 @@ def test_missing_file_path():
     
     assert result.content == "some context"
     assert result.metrics.retrieval_mode.startswith("fallback")
+
+@pytest.mark.skipif(not SEMANTIC_DEPS_AVAILABLE, reason="Semantic deps not installed")
+def test_optimize_batch_embeds_once(temp_python_file, char_tokens):
+    with patch("sentence_transformers.SentenceTransformer") as MockModel:
+        mock_instance = MockModel.return_value
+        mock_instance.encode.side_effect = lambda texts: np.array([[0.1, 0.2] for _ in texts], dtype=np.float32)
+
+        opt = SemanticOptimizer(top_k=1)
+        results = opt.optimize_batch(
+            ["", "", "ctx"],
+            queries=["process data", "load", None],
+            file_paths=[temp_python_file, temp_python_file, None],
+        )
+
+    assert [r.metrics.retrieval_mode for r in results] == ["semantic_search", "semantic_search", "fallback_missing_filepath"]
+    # One call for all code units, one for all queries
+    assert mock_instance.encode.call_count == 2
+
+@pytest.mark.skipif(not SEMANTIC_DEPS_AVAILABLE, reason="Semantic deps not installed")
+def test_optimize_batch_isolates_failures(temp_python_file, char_tokens, tmp_path):
+    bad_file = tmp_path / "bad.py"
+    bad_file.write_text("def boom():\n    return 1\n")
+
+    def encode(texts):
+        if any("boom" in t for t in texts):
+            raise RuntimeError("encode failed")
+        return np.array([[0.1, 0.2] for _ in texts], dtype=np.float32)
+
+    with patch("sentence_transformers.SentenceTransformer") as MockModel:
+        MockModel.return_value.encode.side_effect = encode
+        opt = SemanticOptimizer(top_k=1)
+        with pytest.raises(ValueError):
+            opt.optimize_batch(["", ""], queries=["load"], file_paths=[temp_python_file, temp_python_file])
+
+        results = opt.optimize_batch(
+            ["", ""], queries=["load", "load"], file_paths=[temp_python_file, str(bad_file)],
+            return_exceptions=True,
+        )
+        with pytest.raises(RuntimeError):
+            opt.optimize_batch(["", ""], queries=["load", "load"], file_paths=[temp_python_file, str(bad_file)])
+
+    assert results[0].metrics.retrieval_mode == "semantic_search"
+    assert isinstance(results[1], RuntimeError)
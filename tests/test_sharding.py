@@ -0,0 +1,69 @@
+import pytest
+import scaledown as sd
+from scaledown.compressor.sharding import allocate_budgets, merge_shards, split_context
+
+DOC = (
+    "Intro paragraph about the system.\n"
+    "\n"
+    "```python\n"
+    "def f():\n"
+    "\n"
+    "    return 1\n"
+    "```\n"
+    "Second paragraph with more words in it.\n"
+    "\n"
+    + "x" * 70 + "\n"
+)
+
+def test_split_is_lossless_and_bounded(char_tokens):
+    shards = split_context(DOC, max_shard_tokens=40)
+
+    assert "".join(s.text for s in shards) == DOC
+    assert all(s.tokens <= 40 for s in shards)
+    assert sum(s.tokens for s in shards) == len(DOC)
+
+def test_split_keeps_code_blocks_together(char_tokens):
+    shards = split_context(DOC, max_shard_tokens=40)
+
+    fenced = [s.text for s in shards if "```python" in s.text]
+    assert len(fenced) == 1
+    assert "return 1\n```" in fenced[0]
+
+def test_allocate_budgets_sum_to_total():
+    assert allocate_budgets([10, 20, 30], 100) == [17, 33, 50]
+    assert sum(allocate_budgets([1, 1, 1], 10)) == 10
+    assert allocate_budgets([1000, 1, 1], 3) == [1, 1, 1]
+
+def test_allocate_budgets_smaller_than_shards():
+    with pytest.raises(ValueError):
+        allocate_budgets([10, 10, 10], 2)
+
+def test_merge_shards(char_tokens):
+    shards = split_context(DOC, max_shard_tokens=20)
+    merged = merge_shards(shards, 2)
+    assert len(shards) > 2 and len(merged) == 2
+    assert "".join(s.text for s in merged) == DOC
+    assert sum(s.tokens for s in merged) == sum(s.tokens for s in shards)
+    assert merge_shards(shards, len(shards)) is shards
+
+def test_sharded_compression(stub_api, char_tokens):
+    comp = sd.ScaleDownCompressor(api_key="test_key", shard_tokens=40)
+
+    result = comp.compress(DOC, "summarize", max_tokens=30)
+
+    budgets = [r["scaledown"]["max_tokens"] for r in stub_api.requests_seen]
+    assert len(stub_api.requests_seen) > 1
+    assert sum(budgets) == 30
+    sent = sorted(r["context"] for r in stub_api.requests_seen)
+    assert sent == sorted(s.text for s in split_context(DOC, max_shard_tokens=40))
+    assert result.tokens[0] == sum(len(r["context"].split()) for r in stub_api.requests_seen)
+
+def test_sharded_compression_budget_below_shard_count(stub_api, char_tokens):
+    comp = sd.ScaleDownCompressor(api_key="test_key", shard_tokens=20)
+    assert len(split_context(DOC, max_shard_tokens=20)) > 2
+
+    comp.compress(DOC, "summarize", max_tokens=2)
+
+    assert [r["scaledown"]["max_tokens"] for r in stub_api.requests_seen] == [1, 1]
+    sent = sorted((r["context"] for r in stub_api.requests_seen), key=DOC.index)
+    assert "".join(sent) == DOC
@@ -0,0 +1,92 @@
+import itertools
+import os
+import time
+import pytest
+import scaledown as sd
+from scaledown.optimizer.base import BaseOptimizer
+from scaledown.types import OptimizedContext
+from scaledown.types.metrics import OptimizerMetrics
+
+
+class PidTagger(BaseOptimizer):
+    """Picklable optimizer for process stages: tags the context with the worker pid."""
+
+    def optimize(self, context, query=None, max_tokens=None, **kwargs):
+        content = f"{context}@{os.getpid()}"
+        return OptimizedContext(content, OptimizerMetrics(0, 0, 1, 1.0, 0.0, "test", 1.0))
+
+
+class ModeTagger(BaseOptimizer):
+    """Picklable optimizer for process stages: tags the context with the metrics mode."""
+
+    def optimize(self, context, query=None, max_tokens=None, **kwargs):
+        from scaledown.types.metrics import current_metrics_mode
+        return OptimizedContext(f"{context}:{current_metrics_mode()}",
+                                OptimizerMetrics(0, 0, 1, 1.0, 0.0, "test", 1.0))
+
+
+def test_stream_yields_in_order_with_errors(char_tokens):
+    def check(text, **kwargs):
+        if "bad" in text:
+            raise ValueError("rejected")
+        return text + kwargs.get("suffix", "")
+
+    pipe = sd.Pipeline([("check", check), ("upper", lambda text, **kwargs: text.upper())])
+    items = ["a", {"context": "b", "suffix": "!"}, "bad", "c"]
+    results = list(pipe.stream(items, workers=3, suffix="?"))
+
+    assert [r.final_content for r in results] == ["A?", "B!", "bad", "C?"]
+    assert [r.index for r in results] == [0, 1, 2, 3]
+    assert isinstance(results[2].error, ValueError) and results[2].history == []
+    assert [s.step_name for s in results[0].history] == ["check", "upper"]
+
+
+def test_stream_stages_run_in_parallel(char_tokens):
+    def slow(text, **kwargs):
+        time.sleep(0.1)
+        return text
+
+    pipe = sd.Pipeline([("slow", slow)])
+    start = time.perf_counter()
+    results = list(pipe.stream([str(i) for i in range(8)], workers=4, ordered=False))
+
+    assert time.perf_counter() - start < 0.5
+    assert sorted(r.index for r in results) == list(range(8))
+
+
+def test_stream_applies_backpressure(char_tokens):
+    pulled = []
+
+    def source():
+        for i in itertools.count():
+            pulled.append(i)
+            yield str(i)
+
+    pipe = sd.Pipeline([("noop", lambda text, **kwargs: text)])
+    stream = pipe.stream(source(), workers=1, queue_size=2)
+    first = [next(stream).final_content for _ in range(5)]
+    time.sleep(0.2)
+    stream.close()
+
+    assert first == ["0", "1", "2", "3", "4"]
+    # At most max_in_flight (queue_size * (steps + 1)) items beyond those consumed
+    assert len(pulled) <= 5 + 4 + 1
+
+
+def test_stream_process_stage(char_tokens):
+    pipe = sd.Pipeline([("tag", PidTagger()), ("upper", lambda text, **kwargs: text.upper())])
+    results = list(pipe.stream(["x", "y", "z"], executors={"tag": "process"}, workers={"tag": 2}))
+
+    assert [r.final_content.split("@")[0] for r in results] == ["X", "Y", "Z"]
+    assert all(r.error is None for r in results)
+    assert {int(r.final_content.split("@")[1]) for r in results} - {os.getpid()}
+    with pytest.raises(ValueError):
+        next(pipe.stream(["x"], executors={"missing": "process"}))
+
+
+def test_stream_process_stage_uses_pipeline_metrics_mode():
+    pipe = sd.Pipeline([("tag", ModeTagger())], metrics_mode="off")
+    results = list(pipe.stream(["x"], executors={"tag": "process"}, workers={"tag": 1}))
+
+    assert results[0].final_content == "x:off"
+    assert results[0].metrics_mode == "off"
@@ -0,0 +1,72 @@
+import time
+import pytest
+import scaledown as sd
+from scaledown.compressor.throttle import (
+    AdaptiveConcurrencyLimiter, RetryPolicy, Throttle, TokenBucket, parse_retry_after
+)
+
+def test_token_bucket_delays_after_burst():
+    bucket = TokenBucket(rate=10, capacity=2)
+    assert bucket.reserve() == 0.0
+    assert bucket.reserve() == 0.0
+    assert bucket.reserve() == pytest.approx(0.1, abs=0.02)
+
+def test_limiter_aimd():
+    limiter = AdaptiveConcurrencyLimiter(initial_limit=4, max_limit=8, latency_tolerance=None)
+    for _ in range(8):
+        limiter.acquire()
+        limiter.release(time.monotonic())
+    assert limiter.limit == 5
+
+    limiter.acquire()
+    limiter.release(time.monotonic(), throttled=True)
+    assert limiter.limit == 2
+
+def test_limiter_blocks_at_limit():
+    limiter = AdaptiveConcurrencyLimiter(initial_limit=1, max_limit=1)
+    assert limiter.try_acquire()
+    assert not limiter.try_acquire()
+    limiter.release(time.monotonic())
+    assert limiter.try_acquire()
+
+def test_parse_retry_after():
+    assert parse_retry_after("3") == 3.0
+    assert parse_retry_after(None) is None
+    assert parse_retry_after("Wed, 21 Oct 2015 07:28:00 GMT") == 0.0
+
+def test_retry_honors_retry_after(stub_api):
+    throttle = Throttle(retry=RetryPolicy(max_retries=2, base_delay=0.0))
+    comp = sd.ScaleDownCompressor(api_key="test_key", throttle=throttle)
+    stub_api.fail_next = [(429, {"Retry-After": "0.2"}), (503, {})]
+
+    start = time.monotonic()
+    result = comp.compress("one two three four", "p")
+
+    assert result.tokens == (4, 2)
+    assert time.monotonic() - start >= 0.2
+    stats = throttle.stats()
+    assert (stats.retries, stats.throttled) == (2, 1)
+
+def test_retries_exhausted(stub_api):
+    throttle = Throttle(retry=RetryPolicy(max_retries=1, base_delay=0.0))
+    comp = sd.ScaleDownCompressor(api_key="test_key", throttle=throttle)
+    stub_api.fail_next = [(429, {}), (429, {"Retry-After": "7"})]
+
+    with pytest.raises(sd.RateLimitError) as excinfo:
+        comp.compress("one two", "p")
+    assert excinfo.value.retry_after == 7.0
+
+def test_cancelled_request_releases_slot(stub_api):
+    import asyncio
+    pytest.importorskip("httpx")
+    throttle = Throttle()
+    comp = sd.ScaleDownCompressor(api_key="test_key", throttle=throttle, coalesce=False)
+    stub_api.delay = 1.0
+
+    async def run():
+        with pytest.raises(asyncio.TimeoutError):
+            await asyncio.wait_for(comp.acompress("one two", "p"), timeout=0.1)
+        await comp.aclose()
+
+    asyncio.run(run())
+    assert throttle.stats().in_flight == 0
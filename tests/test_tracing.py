@@ -0,0 +1,78 @@
+import asyncio
+import time
+import scaledown as sd
+from scaledown.tracing import Tracer, record_bytes
+
+
+def test_pipeline_records_step_spans(stub_api, char_tokens):
+    exported = []
+    tracer = Tracer(exporters=[exported.append])
+
+    def build(text, **kwargs):
+        blob = [str(i) for i in range(20000)]
+        return text + " " + str(len(blob))
+
+    pipe = sd.Pipeline([
+        ("build", build),
+        ("compress", sd.ScaleDownCompressor(api_key="test_key")),
+    ], tracer=tracer, cache=sd.LRUCache())
+    result = pipe.run("alpha beta", prompt="p")
+
+    assert exported == [result.trace]
+    assert result.trace.name == "pipeline.run"
+    assert [s.name for s in result.trace.children] == ["step:build", "step:compress"]
+    build_step, compress_step = result.history
+    assert build_step.details["peak_memory_bytes"] > 100_000
+    assert build_step.details["cpu_ms"] > 0
+    assert build_step.details["bytes_sent"] == 0
+    assert compress_step.details["bytes_sent"] > len("alpha beta")
+    assert compress_step.details["bytes_received"] > 0
+    assert result.trace.bytes_sent == compress_step.details["bytes_sent"]
+    assert result.trace.wall_ms >= sum(s.wall_ms for s in result.trace.children)
+
+    again = pipe.run("alpha beta", prompt="p")
+    assert [s.attributes["cache_hit"] for s in again.trace.children] == [True, True]
+    assert again.trace.bytes_sent == 0
+
+
+def test_profile_kept_only_for_slow_runs(char_tokens):
+    tracer = Tracer(memory=False, profile_threshold_ms=50)
+    fast = sd.Pipeline([("noop", lambda text, **kwargs: text)], tracer=tracer).run("a")
+    slow = sd.Pipeline([("sleep", lambda text, **kwargs: time.sleep(0.08) or text)], tracer=tracer).run("a")
+
+    assert fast.trace.profile is None
+    assert "sleep" in slow.trace.profile
+    assert slow.history[0].details["peak_memory_bytes"] is None
+
+
+def test_spans_nest_and_count_bytes_across_tasks():
+    tracer = Tracer(memory=False)
+
+    async def child(name):
+        with tracer.span(name):
+            record_bytes(sent=10, received=1)
+
+    async def main():
+        with tracer.span("root") as root:
+            await asyncio.gather(child("a"), child("b"))
+        return root
+
+    root = asyncio.run(main())
+    assert sorted(s.name for s in root.children) == ["a", "b"]
+    assert (root.bytes_sent, root.bytes_received) == (20, 2)
+    assert [s.name for s in root.walk()][0] == "root"
+    assert root.to_dict()["children"][0]["bytes_sent"] == 10
+
+
+def test_dag_node_spans(char_tokens):
+    tracer = Tracer(memory=False)
+    pipe = sd.DAGPipeline([
+        ("left", lambda text, **kwargs: time.sleep(0.05) or text + "\n\nL"),
+        ("right", lambda text, **kwargs: text + "\n\nR"),
+        ("merge", sd.MergeStep(), ["left", "right"]),
+    ], tracer=tracer)
+    result = pipe.run("x")
+    pipe.close()
+
+    assert sorted(s.name for s in result.trace.children) == ["step:left", "step:merge", "step:right"]
+    assert result.history[0].details["wall_ms"] >= 50